@@ -0,0 +1,161 @@
+"""Persistent caches for compiled UFO and designspace sources, so reopening
+a project with unchanged sources doesn't need to recompile them.
+
+For UFOs, we use two levels of keys. The "stat key" is cheap to compute: it
+is based on the modification times of the .glif files, and on the contents
+of the font-level files that the compiler uses. If that doesn't match, we
+compute the "content key", which requires parsing all .glif files for their
+unicodes and anchors, but is still a lot cheaper than compiling the
+features. This way, touching files without changing anything relevant does
+not cause a recompile.
+
+Designspace variable fonts are keyed by the designspace document and the
+compiled masters, which in turn come from the UFO cache.
+"""
+
+import asyncio
+import functools
+import io
+import os
+import sys
+from types import SimpleNamespace
+from fontTools import version as fontToolsVersion
+from fontTools.ufoLib import (UFOReader, UFOFileStructure, FEATURES_FILENAME, GROUPS_FILENAME,
+                              KERNING_FILENAME, LIB_FILENAME)
+import ufo2ft
+from .compilerPool import compileDSToBytes, compileUFOToBytes
+from .ufoCompiler import fetchCharacterMappingAndAnchors
+from ..misc.diskCache import getDiskCache, hashData
+
+
+ufoCacheMaxSize = 512 * 1024 * 1024  # in bytes
+dsCacheMaxSize = 512 * 1024 * 1024  # in bytes
+
+# Bump this when the output of the compiler changes in an incompatible way
+cacheFormatVersion = 1
+
+_compilerFiles = [FEATURES_FILENAME, GROUPS_FILENAME, KERNING_FILENAME, LIB_FILENAME]
+
+
+async def compileUFOToBytesCached(ufoPath, ufoState, outputWriter):
+    """Compile the UFO at `ufoPath` like compileUFOToBytes() does, but reuse
+    the compiled font from a previous session if nothing relevant changed.
+    `ufoState` is the UFOState object for the default layer of the UFO. Any
+    compiler output is stored along with the font, and is written to
+    `outputWriter` again upon a cache hit.
+    """
+    if outputWriter is None:
+        outputWriter = sys.stderr.write
+    cache = getDiskCache("ufo", ufoCacheMaxSize)
+    if cache is None or ufoState.reader.fileStructure != UFOFileStructure.PACKAGE:
+        return await compileUFOToBytes(ufoPath, outputWriter)
+
+    fontLevelKey = getFontLevelKey(ufoState)
+    statKey = hashData(
+        fontLevelKey.encode("ascii"),
+        os.fsencode(os.path.abspath(ufoPath)),
+        repr((sorted(ufoState.glyphModTimes), ufoState.contentsModTime)).encode("utf-8"),
+    )
+    contentKey = cache.read(statKey + ".key")
+    if contentKey is not None:
+        fontData = _readCachedFont(cache, contentKey.decode("ascii"), outputWriter)
+        if fontData is not None:
+            return fontData
+
+    loop = asyncio.get_running_loop()
+    contentKey = await loop.run_in_executor(None, getContentKey, ufoPath, fontLevelKey)
+    fontData = await _readCachedFontOrCompile(
+        cache, contentKey, functools.partial(compileUFOToBytes, ufoPath), outputWriter)
+    if fontData is not None:
+        cache.write(statKey + ".key", contentKey.encode("ascii"))
+    return fontData
+
+
+async def compileDSToBytesCached(dsPath, ttFolder, outputWriter):
+    """Compile the designspace at `dsPath` like compileDSToBytes() does, but
+    reuse the compiled variable font from a previous session if neither the
+    designspace document nor any of the compiled masters in `ttFolder`
+    changed. (The masters themselves are typically cached, too: see
+    compileUFOToBytesCached().)
+    """
+    if outputWriter is None:
+        outputWriter = sys.stderr.write
+    cache = getDiskCache("designspace", dsCacheMaxSize)
+    if cache is None:
+        return await compileDSToBytes(dsPath, ttFolder, outputWriter)
+
+    chunks = [repr((cacheFormatVersion, fontToolsVersion)).encode("utf-8")]
+    with open(dsPath, "rb") as f:
+        chunks.append(hashData(f.read()).encode("ascii"))
+    for fileName in sorted(os.listdir(ttFolder)):
+        chunks.append(os.fsencode(fileName))
+        with open(os.path.join(ttFolder, fileName), "rb") as f:
+            chunks.append(hashData(f.read()).encode("ascii"))
+    return await _readCachedFontOrCompile(
+        cache, hashData(*chunks), functools.partial(compileDSToBytes, dsPath, ttFolder), outputWriter)
+
+
+async def _readCachedFontOrCompile(cache, key, compileFunc, outputWriter):
+    fontData = _readCachedFont(cache, key, outputWriter)
+    if fontData is None:
+        output = io.StringIO()
+
+        def teeOutputWriter(text):
+            output.write(text)
+            outputWriter(text)
+
+        fontData = await compileFunc(teeOutputWriter)
+        if fontData is None:
+            return None
+        cache.write(key + ".out", output.getvalue().encode("utf-8"))
+        cache.write(key + ".ttf", fontData)
+    return fontData
+
+
+def _readCachedFont(cache, key, outputWriter):
+    output = cache.read(key + ".out")
+    fontData = cache.read(key + ".ttf")
+    if output is None or fontData is None:
+        return None
+    output = output.decode("utf-8")
+    if output:
+        outputWriter(output)
+    return fontData
+
+
+def getFontLevelKey(ufoState):
+    """Return a hash of the font-level UFO data that the feature compiler
+    depends on: features.fea and its included files, groups, kerning, lib and
+    unitsPerEm.
+    """
+    reader = ufoState.reader
+    ufoFolder = reader.fs.getsyspath("/")
+    info = SimpleNamespace()
+    reader.readInfo(info)
+    chunks = [
+        repr((cacheFormatVersion, fontToolsVersion, ufo2ft.__version__,
+              getattr(info, "unitsPerEm", None))).encode("utf-8"),
+    ]
+    paths = [os.path.join(ufoFolder, fileName) for fileName in _compilerFiles]
+    paths += [os.fspath(p) for p in ufoState.includedFeatureFiles]
+    for path in paths:
+        chunks.append(os.fsencode(path))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        chunks.append(hashData(data).encode("ascii"))
+    return hashData(*chunks)
+
+
+def getContentKey(ufoPath, fontLevelKey):
+    """Return a hash of all UFO data the feature compiler depends on: the
+    font-level data as hashed by getFontLevelKey(), as well as the glyph
+    names, and the unicodes and anchors of all glyphs.
+    """
+    glyphSet = UFOReader(ufoPath, validate=False).getGlyphSet()
+    glyphNames = sorted(glyphSet.keys())
+    cmap, revCmap, anchors = fetchCharacterMappingAndAnchors(glyphSet, ufoPath, glyphNames)
+    glyphData = [(glyphName, revCmap.get(glyphName), anchors.get(glyphName)) for glyphName in glyphNames]
+    return hashData(fontLevelKey.encode("ascii"), repr(glyphData).encode("utf-8"))
@@ -1,18 +1,40 @@
+import threading
+import numpy
+from ..misc.hbShape import ShapedText, clusterMapping
+from ..misc.lruCache import LRUCache
 from ..misc.properties import cachedProperty
-from ..misc.hbShape import characterGlyphMapping
+from ..misc.textInfo import TextInfo
 from . import mergeScriptsAndLanguages
+from .glyphDrawing import GlyphDrawingCache
 
 
 class BaseFont:
 
+    shapeCacheSize = 2000  # max number of shaped segments to remember per font
+    incrementalShapingMinLength = 64  # shorter segments are always shaped from scratch
+    maxRecentlyShapedSegments = 4  # per set of segment properties, see self._shapeSegment()
+    glyphDrawingCacheLocations = 8  # max number of variation locations to cache glyph drawings for
+    glyphDrawingCacheMemoryBudget = 64 * 1024 * 1024  # in bytes, an estimate
+    loadResource = "parse"  # the LoadScheduler resource self.load() needs
+
     def __init__(self, fontPath, fontNumber, dataProvider=None):
         self.fontPath = fontPath
         self.fontNumber = fontNumber
+        # Fonts may be used from multiple threads (see misc/layoutPool.py).
+        # This lock protects the variation location, the shaper and the caches.
+        self.lock = threading.RLock()
+        # Set while the font is reloaded in place: layout threads must leave
+        # the font alone (see FontLoader.loadFont()).
+        self.isReloading = False
         self.resetCache()
 
     def resetCache(self):
-        self._glyphDrawings = [{}, {}]  # cache for (outline, colorLayers) objects
-        self._currentVarLocation = None  # used to determine whether to purge the outline cache
+        self._glyphDrawings = GlyphDrawingCache(self.glyphDrawingCacheLocations,
+                                                self.glyphDrawingCacheMemoryBudget)
+        self._currentVarLocation = None
+        self._glyphDrawingsLocationKey = ()
+        self.shapeCache = LRUCache(self.shapeCacheSize)  # see self._shapeSegments()
+        self._recentlyShaped = LRUCache(100)  # see self._shapeSegment()
         # Invalidate cached properties
         del self.unitsPerEm
         del self.colorPalettes
@@ -91,75 +113,194 @@ class BaseFont:
         return axes
 
     def getGlyphRunFromTextInfo(self, textInfo, colorPalettesIndex=0, **kwargs):
-        text = textInfo.text
-        direction = textInfo.directionOverride
-        script = textInfo.scriptOverride
-        language = textInfo.languageOverride
-
-        if not self.colorPalettes:
-            colorPalette = []
-        else:
-            colorPalette = self.colorPalettes[colorPalettesIndex]
+        segments, firstClusters = _segmentsFromTextInfo(textInfo)
+        with self.lock:
+            if not self.colorPalettes:
+                colorPalette = []
+            else:
+                colorPalette = self.colorPalettes[colorPalettesIndex]
+            glyphs = GlyphsRun(len(textInfo.text), self.unitsPerEm,
+                               textInfo.directionOverride in ("TTB", "BTT"), colorPalette)
+            self._fillGlyphsRun(glyphs, segments, firstClusters, **kwargs)
+        return glyphs
 
-        glyphs = GlyphsRun(len(text), self.unitsPerEm, direction in ("TTB", "BTT"), colorPalette)
+    def getGlyphRunsForLocations(self, textInfo, varLocations, colorPalettesIndex=0, *, features=None,
+                                 colorLayers=False):
+        """Lay out `textInfo` at each of the `varLocations`, for example for a
+        grid of instances or an animation. Return a list with a GlyphsRun for
+        each location.
 
-        for segmentText, segmentScript, segmentBiDiLevel, firstCluster in textInfo.segments:
-            if script is not None:
-                segmentScript = script
-            if direction is not None:
-                segmentDirection = direction
-            elif segmentBiDiLevel is None:
-                segmentDirection = None  # Let HarfBuzz figure it out
+        The text is segmented only once, and subclasses may compute the glyph
+        drawings for all locations at once, see _getGlyphDrawingsForLocations().
+        """
+        segments, firstClusters = _segmentsFromTextInfo(textInfo)
+        with self.lock:
+            if not self.colorPalettes:
+                colorPalette = []
             else:
-                segmentDirection = ["LTR", "RTL"][segmentBiDiLevel % 2]
-            run = self.getGlyphRun(segmentText,
-                                   direction=segmentDirection,
-                                   script=segmentScript,
-                                   language=language,
-                                   **kwargs)
-            for gi in run:
-                gi.cluster += firstCluster
-            glyphs.extend(run)
-
-        x = y = 0
-        for gi in glyphs:
-            gi.pos = x + gi.dx, y + gi.dy
-            x += gi.ax
-            y += gi.ay
-        glyphs.endPos = (x, y)
-        return glyphs
+                colorPalette = self.colorPalettes[colorPalettesIndex]
+            # We visit the locations one by one, but the font should be at
+            # its original location afterwards.
+            previousVarLocation = self._currentVarLocation
+            try:
+                shapedRuns = []
+                for varLocation in varLocations:
+                    self.setVarLocation(varLocation)
+                    runs = self._shapeSegments(segments, features=features, varLocation=varLocation)
+                    gids, clusters, positions = _concatenateRuns(runs, firstClusters)
+                    glyphOrder = self.shaper.glyphOrder
+                    glyphNames = [glyphOrder[gid] for gid in gids.tolist()]
+                    shapedRuns.append((gids, glyphNames, clusters, positions))
+                allGlyphDrawings = self._getGlyphDrawingsForLocations(
+                    [(varLocation, glyphNames) for varLocation, (gids, glyphNames, clusters, positions)
+                     in zip(varLocations, shapedRuns)], colorLayers)
+            finally:
+                self.setVarLocation(previousVarLocation)
+            unitsPerEm = self.unitsPerEm
+        vertical = textInfo.directionOverride in ("TTB", "BTT")
+        glyphsRuns = []
+        for (gids, glyphNames, clusters, positions), glyphDrawings in zip(shapedRuns, allGlyphDrawings):
+            glyphs = GlyphsRun(len(textInfo.text), unitsPerEm, vertical, colorPalette)
+            glyphs.setGlyphs(gids, glyphNames, clusters, positions, glyphDrawings)
+            glyphsRuns.append(glyphs)
+        return glyphsRuns
 
     def getGlyphRun(self, text, *, features=None, varLocation=None,
                     direction=None, language=None, script=None,
                     colorLayers=False):
-        self.setVarLocation(varLocation)
-        glyphInfo = self.shaper.shape(text, features=features, varLocation=varLocation,
-                                      direction=direction, language=language, script=script)
-        glyphNames = (gi.name for gi in glyphInfo)
-        for glyph, glyphDrawing in zip(glyphInfo, self.getGlyphDrawings(glyphNames, colorLayers)):
-            glyph.glyphDrawing = glyphDrawing
-        return glyphInfo
+        with self.lock:
+            glyphs = GlyphsRun(len(text), self.unitsPerEm, direction in ("TTB", "BTT"))
+            self._fillGlyphsRun(glyphs, [(text, direction, language, script)], [0],
+                                features=features, varLocation=varLocation, colorLayers=colorLayers)
+        return glyphs
+
+    def shapeLines(self, lines, textSettings):
+        """Shape many lines of text, for example all lines of a text file,
+        using the features, variation location and text options from
+        `textSettings`. This is a generator, yielding a GlyphsRun per line.
+
+        This bypasses the shape cache, and glyph drawings are not fetched:
+        the glyphDrawings list of each run contains only None values.
+
+        The lines can be strings or TextInfo objects. When shaping the same
+        lines with many fonts, pass TextInfo objects (see
+        TextInfo.fromTextSettings()), so the segmentation is done only once.
+        """
+        features = textSettings.features
+        varLocation = textSettings.varLocation
+        for textInfo in lines:
+            if not isinstance(textInfo, TextInfo):
+                textInfo = TextInfo.fromTextSettings(textInfo, textSettings)
+            segments, firstClusters = _segmentsFromTextInfo(textInfo)
+            with self.lock:
+                self.setVarLocation(varLocation)
+                runs = self.shaper.shapeManyToArrays(segments, features=features, varLocation=varLocation)
+                glyphOrder = self.shaper.glyphOrder
+                unitsPerEm = self.unitsPerEm
+            glyphs = GlyphsRun(len(textInfo.text), unitsPerEm,
+                               textInfo.directionOverride in ("TTB", "BTT"))
+            gids, clusters, positions = _concatenateRuns(runs, firstClusters)
+            glyphNames = [glyphOrder[gid] for gid in gids.tolist()]
+            glyphs.setGlyphs(gids, glyphNames, clusters, positions, [None] * len(gids))
+            yield glyphs
+
+    def _fillGlyphsRun(self, glyphs, segments, firstClusters, *, features=None, varLocation=None,
+                       colorLayers=False):
+        # `segments` is a sequence of (text, direction, language, script) tuples,
+        # see HBShape.shapeMany(). Their clusters will be offset by `firstClusters`.
+        with self.lock:
+            self.setVarLocation(varLocation)
+            runs = self._shapeSegments(segments, features=features, varLocation=varLocation)
+            gids, clusters, positions = _concatenateRuns(runs, firstClusters)
+            glyphOrder = self.shaper.glyphOrder
+            glyphNames = [glyphOrder[gid] for gid in gids.tolist()]
+            glyphDrawings = list(self.getGlyphDrawings(glyphNames, colorLayers))
+        glyphs.setGlyphs(gids, glyphNames, clusters, positions, glyphDrawings)
+
+    def _shapeSegments(self, segments, *, features, varLocation):
+        # Shaping results only depend on the arguments and on the (subsetted)
+        # location, so when a client reshapes the same text, which is common
+        # for all but the edited segment, we can skip HarfBuzz altogether.
+        frozenFeatures = _freezeDict(features)
+        frozenLocation = _freezeDict(self._currentVarLocation)
+        shapedSegments = []
+        for text, direction, language, script in segments:
+            text = str(text)
+            key = (text, frozenFeatures, frozenLocation, direction, script, language)
+            shaped = self.shapeCache.get(key)
+            if shaped is None:
+                shaped = self._shapeSegment(text, direction, language, script, key[1:],
+                                            features=features, varLocation=varLocation)
+                for a in shaped:
+                    a.flags.writeable = False  # shared by all clients of the cache
+                self.shapeCache[key] = shaped
+            shapedSegments.append(shaped)
+        return shapedSegments
+
+    def _shapeSegment(self, text, direction, language, script, propertiesKey, *, features, varLocation):
+        # When a long segment was edited, we try to only reshape the edited
+        # part, reusing the glyphs of a recently shaped version of the segment
+        # that has the same properties. See ShapedText.reshape().
+        if len(text) < self.incrementalShapingMinLength:
+            return self.shaper.shapeManyToArrays([(text, direction, language, script)],
+                                                 features=features, varLocation=varLocation)[0]
+        recentlyShaped = self._recentlyShaped.get(propertiesKey)
+        if recentlyShaped is None:
+            recentlyShaped = self._recentlyShaped[propertiesKey] = []
+        shapedText = None
+        if recentlyShaped:
+            mostSimilar = max(recentlyShaped, key=lambda shapedText: shapedText.getCommonLength(text))
+            shapedText = mostSimilar.reshape(self.shaper, text, features=features, varLocation=varLocation)
+            if shapedText is not None:
+                recentlyShaped.remove(mostSimilar)  # superseded by the edited version
+        if shapedText is None:
+            shapedText = ShapedText.fromShaper(self.shaper, text, features=features, varLocation=varLocation,
+                                               direction=direction, language=language, script=script)
+        recentlyShaped.insert(0, shapedText)
+        del recentlyShaped[self.maxRecentlyShapedSegments:]
+        return shapedText.gids, shapedText.clusters, shapedText.positions
 
     def setVarLocation(self, varLocation):
-        axes = self.axes
-        if varLocation:
-            # subset to our own axes
-            varLocation = {k: v for k, v in varLocation.items() if k in axes}
-        if self._currentVarLocation != varLocation:
-            self._purgeCaches()
-            self._currentVarLocation = varLocation
-            self.varLocationChanged(varLocation)
+        with self.lock:
+            axes = self.axes
+            if varLocation:
+                # subset to our own axes
+                varLocation = {k: v for k, v in varLocation.items() if k in axes}
+            if self._currentVarLocation != varLocation:
+                self._currentVarLocation = varLocation
+                # Glyph drawings for previously visited locations are kept
+                self._glyphDrawingsLocationKey = self._glyphDrawings.getLocationKey(varLocation)
+                self.varLocationChanged(varLocation)
 
     def getGlyphDrawings(self, glyphNames, colorLayers=False):
+        glyphNames = list(glyphNames)  # we iterate twice
+        locationKey = self._glyphDrawingsLocationKey
+        glyphDrawings = self._glyphDrawings.getDrawings(locationKey, colorLayers)
+        missingGlyphNames = [glyphName for glyphName in glyphNames if glyphName not in glyphDrawings]
+        if missingGlyphNames:
+            self._prepareGlyphDrawings(missingGlyphNames, colorLayers)
         for glyphName in glyphNames:
-            glyphDrawing = self._glyphDrawings[colorLayers].get(glyphName)
+            glyphDrawing = glyphDrawings.get(glyphName)
             if glyphDrawing is None:
                 glyphDrawing = self._getGlyphDrawing(glyphName, colorLayers)
-                self._glyphDrawings[colorLayers][glyphName] = glyphDrawing
+                self._glyphDrawings.addDrawing(locationKey, colorLayers, glyphName, glyphDrawing)
             yield glyphDrawing
 
-    def _purgeCaches(self):
-        self._glyphDrawings = [{}, {}]
+    def _getGlyphDrawingsForLocations(self, glyphNamesPerLocation, colorLayers):
+        # `glyphNamesPerLocation` is a list of (varLocation, glyphNames) tuples.
+        # Return a list with the glyph drawings for each location. Subclasses
+        # may override this to do the work for all locations at once.
+        allGlyphDrawings = []
+        for varLocation, glyphNames in glyphNamesPerLocation:
+            self.setVarLocation(varLocation)
+            allGlyphDrawings.append(list(self.getGlyphDrawings(glyphNames, colorLayers)))
+        return allGlyphDrawings
+
+    def _prepareGlyphDrawings(self, glyphNames, colorLayers):
+        # Optional override: called with the names of the glyphs that
+        # getGlyphDrawings() is about to call _getGlyphDrawing() for, so
+        # the work for all of them can be done at once.
+        pass
 
     def _getGlyphDrawing(self, glyphName, colorLayers):
         raise NotImplementedError()
@@ -169,33 +310,190 @@ class BaseFont:
         pass
 
 
-class GlyphsRun(list):
+def _segmentsFromTextInfo(textInfo):
+    direction = textInfo.directionOverride
+    script = textInfo.scriptOverride
+    language = textInfo.languageOverride
+    segments = []
+    firstClusters = []
+    for segmentText, segmentScript, segmentBiDiLevel, firstCluster in textInfo.segments:
+        if script is not None:
+            segmentScript = script
+        if direction is not None:
+            segmentDirection = direction
+        elif segmentBiDiLevel is None:
+            segmentDirection = None  # Let HarfBuzz figure it out
+        else:
+            segmentDirection = ["LTR", "RTL"][segmentBiDiLevel % 2]
+        segments.append((segmentText, segmentDirection, language, segmentScript))
+        firstClusters.append(firstCluster)
+    return segments, firstClusters
+
+
+def _concatenateRuns(runs, firstClusters):
+    if not runs:
+        return numpy.zeros(0, numpy.int32), numpy.zeros(0, numpy.int32), numpy.zeros((0, 4), numpy.int32)
+    gids = numpy.concatenate([gids for gids, clusters, positions in runs])
+    clusters = numpy.concatenate([clusters + firstCluster
+                                  for (gids, clusters, positions), firstCluster in zip(runs, firstClusters)])
+    positions = numpy.concatenate([positions for gids, clusters, positions in runs])
+    return gids, clusters, positions
+
+
+def _freezeDict(d):
+    if not d:
+        return ()
+    return tuple(sorted(d.items()))
+
+
+class GlyphsRun:
+
+    """A run of positioned glyphs. The glyph data is stored column-wise in
+    NumPy arrays: gids, clusters, dx, dy, ax, ay, posX, posY and bounds, the
+    latter being a (numGlyphs, 4) array containing NaN for glyphs that have
+    no bounding box (yet). The glyph names and glyph drawings are stored in
+    lists.
+
+    For compatibility, indexing or iterating a GlyphsRun yields GlyphInfoView
+    objects, which behave like the GlyphInfo objects we used to store.
+    """
 
     def __init__(self, numChars, unitsPerEm, vertical, colorPalette=None):
         self.numChars = numChars
         self.unitsPerEm = unitsPerEm
         self.vertical = vertical
-        self._glyphToChars = None
-        self._charToGlyphs = None
-        self.endPos = (0, 0)
         self.colorPalette = [] if colorPalette is None else colorPalette
+        self.setGlyphs(numpy.zeros(0, numpy.int32), [], numpy.zeros(0, numpy.int32),
+                       numpy.zeros((0, 4), numpy.int32), [])
 
-    def mapGlyphsToChars(self, glyphIndices):
-        if self._glyphToChars is None:
-            self._calcMappings()
-        glyphToChars = self._glyphToChars
-        return {ci for gi in glyphIndices for ci in glyphToChars[gi]}
+    def setGlyphs(self, gids, glyphNames, clusters, positions, glyphDrawings):
+        """Set the glyph data. `positions` is an array with shape
+        (numGlyphs, 4), containing dx, dy, ax and ay.
+        """
+        numGlyphs = len(gids)
+        assert len(glyphNames) == len(clusters) == len(positions) == len(glyphDrawings) == numGlyphs
+        self.gids = gids
+        self.glyphNames = glyphNames
+        self.clusters = clusters
+        self.dx, self.dy, self.ax, self.ay = positions.T
+        self.glyphDrawings = glyphDrawings
+        self.bounds = numpy.full((numGlyphs, 4), numpy.nan)
+        endX = numpy.cumsum(self.ax, dtype=numpy.int64)
+        endY = numpy.cumsum(self.ay, dtype=numpy.int64)
+        self.posX = endX - self.ax + self.dx
+        self.posY = endY - self.ay + self.dy
+        if numGlyphs:
+            self.endPos = (int(endX[-1]), int(endY[-1]))
+        else:
+            self.endPos = (0, 0)
+        self._clusterMapping = None
 
-    def mapCharsToGlyphs(self, charIndices):
-        if self._charToGlyphs is None:
-            self._calcMappings()
-        charToGlyphs = self._charToGlyphs
-        return {gi for ci in charIndices for gi in charToGlyphs[ci]}
+    def __len__(self):
+        return len(self.gids)
 
-    def _calcMappings(self):
-        clusters = [glyphInfo.cluster for glyphInfo in self]
-        self._glyphToChars, self._charToGlyphs = characterGlyphMapping(clusters, self.numChars)
+    def __getitem__(self, index):
+        numGlyphs = len(self.gids)
+        if index < 0:
+            index += numGlyphs
+        if not 0 <= index < numGlyphs:
+            raise IndexError("glyph index out of range")
+        return GlyphInfoView(self, index)
 
-    @cachedProperty
-    def glyphNames(self):
-        return [glyphInfo.name for glyphInfo in self]
+    def __iter__(self):
+        for index in range(len(self.gids)):
+            yield GlyphInfoView(self, index)
+
+    def mapGlyphsToChars(self, glyphIndices):
+        glyphIndices = numpy.fromiter(glyphIndices, numpy.intp)
+        if not len(glyphIndices):
+            return set()
+        clusterStarts, clusterEnds, glyphClusters = self._getClusterMapping()
+        selectedClusters = numpy.zeros(len(clusterStarts), bool)
+        selectedClusters[glyphClusters[glyphIndices]] = True
+        selectedChars = numpy.repeat(selectedClusters, clusterEnds - clusterStarts)
+        return set((numpy.flatnonzero(selectedChars) + clusterStarts[0]).tolist())
+
+    def mapCharsToGlyphs(self, charIndices):
+        clusterStarts, clusterEnds, glyphClusters = self._getClusterMapping()
+        if not len(clusterStarts):
+            return set()
+        charIndices = numpy.fromiter(charIndices, numpy.intp)
+        charIndices = charIndices[(charIndices >= clusterStarts[0]) & (charIndices < self.numChars)]
+        if not len(charIndices):
+            return set()
+        selectedClusters = numpy.zeros(len(clusterStarts), bool)
+        selectedClusters[numpy.searchsorted(clusterStarts, charIndices, "right") - 1] = True
+        return set(numpy.flatnonzero(selectedClusters[glyphClusters]).tolist())
+
+    def _getClusterMapping(self):
+        if self._clusterMapping is None:
+            self._clusterMapping = clusterMapping(self.clusters, self.numChars)
+        return self._clusterMapping
+
+
+class GlyphInfoView:
+
+    """A view on a single glyph in a GlyphsRun."""
+
+    __slots__ = ["_run", "_index"]
+
+    def __init__(self, run, index):
+        self._run = run
+        self._index = index
+
+    @property
+    def gid(self):
+        return int(self._run.gids[self._index])
+
+    @property
+    def name(self):
+        return self._run.glyphNames[self._index]
+
+    @property
+    def cluster(self):
+        return int(self._run.clusters[self._index])
+
+    @property
+    def dx(self):
+        return int(self._run.dx[self._index])
+
+    @property
+    def dy(self):
+        return int(self._run.dy[self._index])
+
+    @property
+    def ax(self):
+        return int(self._run.ax[self._index])
+
+    @property
+    def ay(self):
+        return int(self._run.ay[self._index])
+
+    @property
+    def pos(self):
+        return int(self._run.posX[self._index]), int(self._run.posY[self._index])
+
+    @property
+    def glyphDrawing(self):
+        return self._run.glyphDrawings[self._index]
+
+    @property
+    def bounds(self):
+        bounds = self._run.bounds[self._index]
+        if numpy.isnan(bounds[0]):
+            return None
+        return tuple(bounds.tolist())
+
+    @bounds.setter
+    def bounds(self, bounds):
+        if bounds is None:
+            bounds = (numpy.nan,) * 4
+        self._run.bounds[self._index] = bounds
+
+    def asDict(self):
+        return dict(gid=self.gid, name=self.name, cluster=self.cluster,
+                    dx=self.dx, dy=self.dy, ax=self.ax, ay=self.ay)
+
+    def __repr__(self):
+        args = (f"{k}={v!r}" for k, v in self.asDict().items())
+        return f"{self.__class__.__name__}({', '.join(args)})"
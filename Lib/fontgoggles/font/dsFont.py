@@ -9,8 +9,6 @@ import sys
 import tempfile
 from types import SimpleNamespace
 import numpy
-from fontTools.pens.basePen import BasePen
-from fontTools.pens.pointPen import PointToSegmentPen
 from fontTools.designspaceLib import DesignSpaceDocument
 from fontTools.ttLib import TTFont
 from fontTools.ufoLib import UFOReader
@@ -18,11 +16,13 @@ from fontTools.varLib.models import normalizeValue
 from .baseFont import BaseFont
 from .glyphDrawing import GlyphDrawing
 from .ufoFont import Glyph, NotDefGlyph, UFOState, extractIncludedFeatureFiles
-from ..compile.compilerPool import compileUFOToPath, compileDSToBytes, CompilerError
+from ..compile.compileCache import compileDSToBytesCached, compileUFOToBytesCached
+from ..compile.compilerPool import CompilerError
 from ..compile.dsCompiler import getTTPaths
 from ..misc.hbShape import HBShape
+from ..misc.lruCache import LRUCache
 from ..misc.properties import cachedProperty
-from ..mac.makePathFromOutline import makePathFromArrays
+from ..misc.arrayOutline import ArrayOutline, PointCollector, coordinateType
 
 
 class DesignSpaceSourceError(CompilerError):
@@ -31,10 +31,14 @@ class DesignSpaceSourceError(CompilerError):
 
 class DSFont(BaseFont):
 
+    loadResource = "compile"
+    stackedDeltasCacheSize = 32  # see interpolateVarGlyphs()
+
     def __init__(self, fontPath, fontNumber, dataProvider=None):
         super().__init__(fontPath, fontNumber)
         self.doc = None
         self._varGlyphs = {}
+        self._varGlyphMetrics = {}
         self._normalizedLocation = {}
         self._sourceFontData = {}
         self._ufos = {}
@@ -43,6 +47,9 @@ class DSFont(BaseFont):
     def resetCache(self):
         super().resetCache()
         self._varGlyphs = {}
+        self._varGlyphMetrics = {}
+        self._glyphDependants = defaultdict(set)  # base glyph name -> composite glyph names
+        self._stackedDeltas = LRUCache(self.stackedDeltasCacheSize)
         del self.defaultInfo
         del self.defaultVerticalAdvance
         del self.defaultVerticalOriginY
@@ -103,10 +110,11 @@ class DSFont(BaseFont):
                     ttPaths.append(ttPath)
                     output = io.StringIO()
                     outputs.append(output)
-                    coros.append(compileUFOToPath(source.path, ttPath, output.write))
+                    coros.append(compileUFOToBytesCached(source.path, ufoState, output.write))
 
             # print(f"compiling {len(coros)} fonts")
-            errors = await asyncio.gather(*coros, return_exceptions=True)
+            results = await asyncio.gather(*coros, return_exceptions=True)
+            errors = [result if isinstance(result, BaseException) else None for result in results]
 
             for sourcePath, exc, output in zip(ufosToCompile, errors, outputs):
                 output = output.getvalue()
@@ -122,23 +130,26 @@ class DSFont(BaseFont):
                     f"Could not build '{os.path.basename(self.fontPath)}': "
                     "some sources did not successfully compile"
                 )
-            for sourcePath, ttPath in zip(ufosToCompile, ttPaths):
+            for sourcePath, ttPath, fontData in zip(ufosToCompile, ttPaths, results):
+                fontData = fontData or b""
+                with open(ttPath, "wb") as f:
+                    f.write(fontData)
                 # Store compiled tt data so we can reuse it to rebuild ourselves
                 # without recompiling the source.
-                with open(ttPath, "rb") as f:
-                    self._sourceFontData[sourcePath] = f.read()
+                self._sourceFontData[sourcePath] = fontData
 
             if not ufosToCompile and not self._needsVFRebuild:
                 # self.ttFont and self.shaper are still up-to-date
                 return
 
-            vfFontData = await compileDSToBytes(self.fontPath, ttFolder, outputWriter)
+            vfFontData = await compileDSToBytesCached(self.fontPath, ttFolder, outputWriter)
 
         f = io.BytesIO(vfFontData)
         self.ttFont = TTFont(f, lazy=True)
         # Nice cookie for us from the worker
         self.masterModel = pickle.loads(self.ttFont["MPcl"].data)
         assert len(self.masterModel.deltaWeights) == len(self.doc.sources)
+        self._subModels = SubModelCache(self.masterModel)
 
         self.shaper = HBShape(vfFontData,
                               getHorizontalAdvance=self._getHorizontalAdvance,
@@ -147,11 +158,37 @@ class DSFont(BaseFont):
                               ttFont=self.ttFont)
         self._needsVFRebuild = False
 
+    def _invalidateGlyphs(self, glyphNames):
+        # Forget the changed glyphs, and the composites that (indirectly) use
+        # them, but keep all other glyphs and their drawings.
+        invalidGlyphNames = set()
+        glyphNamesToVisit = list(glyphNames)
+        while glyphNamesToVisit:
+            glyphName = glyphNamesToVisit.pop()
+            if glyphName in invalidGlyphNames:
+                continue
+            invalidGlyphNames.add(glyphName)
+            glyphNamesToVisit.extend(self._glyphDependants.get(glyphName, ()))
+        for glyphName in invalidGlyphNames:
+            self._varGlyphs.pop(glyphName, None)
+        for glyphName in glyphNames:
+            # The metrics of a composite glyph don't depend on its components
+            self._varGlyphMetrics.pop(glyphName, None)
+        self._glyphDrawings.discardGlyphs(invalidGlyphNames)
+        self._stackedDeltas.clear()
+        # The advances may have changed
+        self.shapeCache.clear()
+        self._recentlyShaped.clear()
+        return invalidGlyphNames
+
     def getExternalFiles(self):
         return sorted(self._sourceFiles) + sorted(self._includedFeatureFiles)
 
     def canReloadWithChange(self, externalFilePath):
         invalidateCaches = False
+        invalidateGlyphs = False
+        changedGlyphNames = set()
+        needsMetricsUpdate = False
         if not externalFilePath:
             # Our .designspace file itself changed, let's reload
             self.doc = None
@@ -173,8 +210,13 @@ class DSFont(BaseFont):
                 if needsFeaturesUpdate:
                     self._sourceFontData.pop(sourcePath, None)  # implies self._needsVFRebuild
                     invalidateCaches = True
-                if needsGlyphUpdate or needsInfoUpdate:
+                if needsInfoUpdate:
                     invalidateCaches = True
+                if needsGlyphUpdate:
+                    invalidateGlyphs = True
+                changedGlyphNames.update(self._ufos[sourceKey].changedGlyphNames)
+                if needsInfoUpdate:
+                    needsMetricsUpdate = True
                 if needsCmapUpdate:
                     # TODO: This could be done more efficiently like how UFOFont
                     # does it, if the changed source is the default source.
@@ -183,6 +225,13 @@ class DSFont(BaseFont):
                     invalidateCaches = True
         if invalidateCaches:
             self.resetCache()
+        elif invalidateGlyphs:
+            self._invalidateGlyphs(changedGlyphNames)
+        # In case we keep our shaper, its glyph metrics need to be updated
+        if needsMetricsUpdate:
+            self.shaper.clearGlyphMetrics()
+        else:
+            self.shaper.clearGlyphMetrics(changedGlyphNames)
         return True
 
     @cachedProperty
@@ -233,6 +282,7 @@ class DSFont(BaseFont):
         components = None
         getSubGlyph = None
         masterPoints = []
+        baseGlyphNames = set()
         for source in self.doc.sources:
             glyphSet = self._ufos[(source.path, source.layerName)].glyphSet
             if glyphName not in glyphSet:
@@ -252,6 +302,9 @@ class DSFont(BaseFont):
                       file=sys.stderr)
                 masterPoints.append(None)
             else:
+                # Decomposed components count, too, and they may differ
+                # between masters
+                baseGlyphNames.update(coll.baseGlyphNames)
                 hAdvance = glyph.width
                 vAdvance = glyph.height
                 if vAdvance is None or vAdvance == 0:  # XXX default vAdv == 0 -> bad UFO spec
@@ -277,23 +330,106 @@ class DSFont(BaseFont):
             print(f"Default master glyph '{glyphName}' could not be read", file=sys.stderr)
             varGlyph = NotDefGlyph(self.unitsPerEm)
         else:
-            varGlyph = VarGlyph(glyphName, self.masterModel, masterPoints, contours, tags,
+            varGlyph = VarGlyph(glyphName, self._subModels, masterPoints, contours, tags,
                                 components, getSubGlyph)
+        for baseGlyphName in baseGlyphNames:
+            self._glyphDependants[baseGlyphName].add(glyphName)
         return varGlyph
 
+    def _getVarGlyphMetrics(self, glyphName):
+        varGlyphMetrics = self._varGlyphMetrics.get(glyphName)
+        if varGlyphMetrics is None:
+            varGlyphMetrics = self._getVarGlyphMetricsRaw(glyphName)
+            self._varGlyphMetrics[glyphName] = varGlyphMetrics
+        varGlyphMetrics.setVarLocation(self._normalizedLocation)
+        return varGlyphMetrics
+
+    def _getVarGlyphMetricsRaw(self, glyphName):
+        # This reads the .glif files without their outlines, so it is a lot
+        # cheaper than building a VarGlyph. This matters, as it is called from
+        # within the shaper.
+        masterMetrics = []
+        for source in self.doc.sources:
+            glyphSet = self._ufos[(source.path, source.layerName)].glyphSet
+            if glyphName not in glyphSet:
+                masterMetrics.append(None)
+                continue
+            glyph = Glyph(glyphName, glyphSet)
+            try:
+                glyphSet.readGlyph(glyphName, glyph)
+            except Exception as e:
+                print(f"Glyph '{glyphName}' could not be read from '{os.path.basename(source.path)}': {e!r}",
+                      file=sys.stderr)
+                masterMetrics.append(None)
+                continue
+            vAdvance = glyph.height
+            if vAdvance is None or vAdvance == 0:  # XXX default vAdv == 0 -> bad UFO spec
+                vAdvance = self.defaultVerticalAdvance
+            vOrgY = getattr(glyph, "lib", {}).get("public.verticalOrigin")
+            if vOrgY is None:
+                vOrgY = self.defaultVerticalOriginY
+            masterMetrics.append((glyph.width, vAdvance, vOrgY))
+        if masterMetrics[self.doc.sources.index(self.doc.default)] is None:
+            return NotDefGlyph(self.unitsPerEm)
+        return VarGlyphMetrics(self._subModels, masterMetrics)
+
     def _getHorizontalAdvance(self, glyphName):
-        varGlyph = self._getVarGlyph(glyphName)
+        varGlyph = self._getVarGlyphMetrics(glyphName)
         return varGlyph.width
 
     def _getVerticalAdvance(self, glyphName):
-        varGlyph = self._getVarGlyph(glyphName)
+        varGlyph = self._getVarGlyphMetrics(glyphName)
         return -abs(varGlyph.height)
 
     def _getVerticalOrigin(self, glyphName):
-        varGlyph = self._getVarGlyph(glyphName)
+        varGlyph = self._getVarGlyphMetrics(glyphName)
         vOrgX, vOrgY = varGlyph.verticalOrigin
         return True, vOrgX, vOrgY
 
+    def _prepareGlyphDrawings(self, glyphNames, colorLayers):
+        # Interpolate the points of all glyphs we are about to draw, including
+        # the base glyphs of composites, in one go.
+        varGlyphs = {}
+        for glyphName in glyphNames:
+            self._collectVarGlyphs(glyphName, varGlyphs)
+        interpolateVarGlyphs(varGlyphs.values(), self._stackedDeltas)
+
+    def _getGlyphDrawingsForLocations(self, glyphNamesPerLocation, colorLayers):
+        # Interpolate the points of all glyphs for all locations in one go,
+        # then hand them to the glyphs one location at a time.
+        varGlyphs = {}
+        for varLocation, glyphNames in glyphNamesPerLocation:
+            for glyphName in glyphNames:
+                self._collectVarGlyphs(glyphName, varGlyphs)
+        varGlyphs = list(varGlyphs.values())
+        normalizedLocations = []
+        for varLocation, glyphNames in glyphNamesPerLocation:
+            self.setVarLocation(varLocation)
+            normalizedLocations.append(self._normalizedLocation)
+        allPoints = interpolateVarGlyphsForLocations(varGlyphs, normalizedLocations, self._stackedDeltas)
+        allGlyphDrawings = []
+        for locationIndex, (varLocation, glyphNames) in enumerate(glyphNamesPerLocation):
+            self.setVarLocation(varLocation)
+            for varGlyph, points in zip(varGlyphs, allPoints):
+                varGlyph.setVarLocation(self._normalizedLocation)
+                if varGlyph.needsInterpolation:
+                    varGlyph.setInterpolatedPoints(points[locationIndex])
+            allGlyphDrawings.append(list(self.getGlyphDrawings(glyphNames, colorLayers)))
+        return allGlyphDrawings
+
+    def _collectVarGlyphs(self, glyphName, varGlyphs):
+        if glyphName in varGlyphs:
+            return
+        try:
+            varGlyph = self._getVarGlyph(glyphName)
+        except Exception:
+            return  # _getGlyphDrawing() will report the error
+        if isinstance(varGlyph, NotDefGlyph):
+            return
+        varGlyphs[glyphName] = varGlyph
+        for baseGlyphName, transformation in varGlyph.components:
+            self._collectVarGlyphs(baseGlyphName, varGlyphs)
+
     def _getGlyphDrawing(self, glyphName, colorLayers):
         try:
             varGlyph = self._getVarGlyph(glyphName)
@@ -312,38 +448,132 @@ class DSFont(BaseFont):
         return unicodes, anchors
 
 
-# From FreeType:
-FT_CURVE_TAG_ON = 1
-FT_CURVE_TAG_CONIC = 0
-FT_CURVE_TAG_CUBIC = 2
-
-segmentTypes = {FT_CURVE_TAG_ON: "line", FT_CURVE_TAG_CONIC: "qcurve", FT_CURVE_TAG_CUBIC: "curve"}
-coordinateType = numpy.float
-
-
 def interpolateFromDeltas(model, varLocation, deltas):
-    # This is a numpy-specific reimplementation of model.interpolateFromDeltas()
-    # that avoids allocation of in-between results.
-    # However, so far this is achieving the speedup I had hoped...
-    # Perhaps there'll be a better improvement if there are many deltas
-    # and/or if the outlines are more complex.
-    deltas = deltas
-    temp = numpy.zeros(deltas[0].shape, coordinateType)
-    v = numpy.zeros(deltas[0].shape, coordinateType)
-    scalars = model.getScalars(varLocation)
-    for delta, scalar in zip(deltas, scalars):
-        if not scalar:
+    # This is a numpy-specific reimplementation of model.interpolateFromDeltas().
+    # `deltas` is an array with the deltas stacked along the first axis, so
+    # the interpolation is a single dot product.
+    return interpolateFromDeltasAndScalars(model.getScalars(varLocation), deltas)
+
+
+def interpolateFromDeltasAndScalars(scalars, deltas):
+    # There may be fewer deltas than scalars: see VarGlyph.__init__()
+    scalars = numpy.array(scalars[:len(deltas)], coordinateType)
+    return numpy.tensordot(scalars, deltas, 1)
+
+
+def interpolateVarGlyphs(varGlyphs, stackedDeltasCache=None):
+    """Interpolate the points of many VarGlyph objects at once. The glyphs are
+    grouped by model, and for each group the scalars are computed once, and
+    the stacked deltas of all glyphs are interpolated with a single dot
+    product. All glyphs must be set to the same location.
+
+    `stackedDeltasCache` is an optional dict-like object, to keep the stacked
+    deltas for when the same glyphs are interpolated again, at a different
+    location.
+    """
+    groups = defaultdict(list)
+    for varGlyph in varGlyphs:
+        if varGlyph.needsInterpolation:
+            groups[id(varGlyph.model), len(varGlyph.deltas)].append(varGlyph)
+    for group in groups.values():
+        if len(group) == 1:
+            group[0].getPoints()
             continue
-        if scalar == 1.0:
-            contribution = delta
+        stackedDeltas, splitIndices = _stackDeltas(group, stackedDeltasCache)
+        points = interpolateFromDeltas(group[0].model, group[0].varLocation, stackedDeltas)
+        for varGlyph, glyphPoints in zip(group, numpy.split(points, splitIndices)):
+            varGlyph.setInterpolatedPoints(glyphPoints)
+
+
+def interpolateVarGlyphsForLocations(varGlyphs, varLocations, stackedDeltasCache=None):
+    """Interpolate the points of many VarGlyph objects at many (normalized)
+    locations at once. Return a list with an array for each glyph, with
+    shape (numLocations, numPoints, 2). Per model, this is a single matrix
+    product of the scalars for all locations and the stacked deltas of all
+    glyphs.
+    """
+    groups = defaultdict(list)
+    for varGlyph in varGlyphs:
+        groups[id(varGlyph.model), len(varGlyph.deltas)].append(varGlyph)
+    results = {}
+    for group in groups.values():
+        model = group[0].model
+        numDeltas = len(group[0].deltas)
+        scalars = numpy.array([model.getScalars(varLocation)[:numDeltas] for varLocation in varLocations],
+                              coordinateType).reshape(len(varLocations), numDeltas)
+        if len(group) == 1:
+            stackedDeltas, splitIndices = group[0].deltas, []
         else:
-            numpy.multiply(delta, scalar, temp)
-            contribution = temp
-        numpy.add(v, contribution, v)
-    return v
-
-
-NUMPY_IN_PLACE = True  # dubious improvement
+            stackedDeltas, splitIndices = _stackDeltas(group, stackedDeltasCache)
+        points = numpy.tensordot(scalars, stackedDeltas, 1)
+        for varGlyph, glyphPoints in zip(group, numpy.split(points, splitIndices, axis=1)):
+            results[id(varGlyph)] = glyphPoints
+    return [results[id(varGlyph)] for varGlyph in varGlyphs]
+
+
+def _stackDeltas(group, stackedDeltasCache):
+    # The cached value holds on to the glyphs, so their ids remain valid
+    key = tuple(id(varGlyph) for varGlyph in group)
+    cached = stackedDeltasCache.get(key) if stackedDeltasCache is not None else None
+    if cached is not None:
+        return cached[1:]
+    stackedDeltas = numpy.concatenate([varGlyph.deltas for varGlyph in group], axis=1)
+    splitIndices = numpy.cumsum([varGlyph.deltas.shape[1] for varGlyph in group])[:-1]
+    if stackedDeltasCache is not None:
+        stackedDeltasCache[key] = (group, stackedDeltas, splitIndices)
+    return stackedDeltas, splitIndices
+
+
+class SubModelCache:
+
+    """Hands out the sub-models of `masterModel`, one per pattern of present
+    masters, so all glyphs that have the same masters share a single SubModel
+    object, and with it the scalars for each location.
+    """
+
+    def __init__(self, masterModel):
+        self.masterModel = masterModel
+        self._subModels = {}
+
+    def __len__(self):
+        return len(self._subModels)
+
+    def getSubModel(self, items):
+        """Return a (subModel, presentItems) tuple, like
+        VariationModel.getSubModel().
+        """
+        key = tuple(item is not None for item in items)
+        subModel = self._subModels.get(key)
+        if subModel is None:
+            model, _ = self.masterModel.getSubModel(items)
+            subModel = SubModel(model)
+            self._subModels[key] = subModel
+        return subModel, [item for item in items if item is not None]
+
+
+class SubModel:
+
+    """Wraps a VariationModel, and caches its scalars for the most recently
+    used locations.
+    """
+
+    scalarsCacheSize = 16
+
+    def __init__(self, model):
+        self.model = model
+        self.reverseMapping = model.reverseMapping
+        self._scalars = LRUCache(self.scalarsCacheSize)
+
+    def getDeltas(self, masterValues):
+        return self.model.getDeltas(masterValues)
+
+    def getScalars(self, varLocation):
+        key = tuple(sorted(varLocation.items()))
+        scalars = self._scalars.get(key)
+        if scalars is None:
+            scalars = self.model.getScalars(varLocation)
+            self._scalars[key] = scalars
+        return scalars
 
 
 class VarGlyph:
@@ -352,11 +582,11 @@ class VarGlyph:
         self.model, masterPoints = masterModel.getSubModel(masterPoints)
         masterPoints = [numpy.array(pts, coordinateType) for pts in masterPoints]
         try:
-            self.deltas = self.model.getDeltas(masterPoints)
+            self.deltas = numpy.array(self.model.getDeltas(masterPoints))
         except ValueError:
             # outlines are not compatible, fall back to the default master
             print(f"Glyph '{glyphName}' is not interpolatable", file=sys.stderr)
-            self.deltas = [masterPoints[self.model.reverseMapping[0]]]
+            self.deltas = numpy.array([masterPoints[self.model.reverseMapping[0]]])
         if components:
             self._contours = None
             self._tags = None
@@ -367,6 +597,7 @@ class VarGlyph:
         self._getSubGlyph = getSubGlyph
         self.varLocation = {}
         self._points = None
+        self._interpolatedPoints = None
 
     def setVarLocation(self, varLocation):
         if varLocation is None:
@@ -374,17 +605,47 @@ class VarGlyph:
         if self.varLocation == varLocation:
             return
         self._points = None
+        self._interpolatedPoints = None
         self.varLocation = varLocation
 
+    @property
+    def needsInterpolation(self):
+        return self._points is None and self._interpolatedPoints is None
+
+    def setInterpolatedPoints(self, points):
+        # Set the result of interpolating our deltas at the current location,
+        # see interpolateVarGlyphs()
+        self._interpolatedPoints = points
+
+    @cachedProperty
+    def componentGlyphs(self):
+        """A list of (subGlyph, twoByTwo) tuples for the components that
+        refer to existing glyphs, `twoByTwo` being None for the identity
+        transformation. The composite is invalidated when a base glyph
+        changes (see DSFont._invalidateGlyphs()), so we can hold on to the
+        sub glyphs.
+        """
+        componentGlyphs = []
+        for glyphName, transformation in self.components:
+            subGlyph = self._getSubGlyph(glyphName)
+            if isinstance(subGlyph, NotDefGlyph):
+                print(f"Composite base glyph '{glyphName}' not found", file=sys.stderr)
+                componentGlyphs.append(None)
+                continue
+            twoByTwo = transformation[:4]
+            if twoByTwo == (1, 0, 0, 1):  # identity
+                twoByTwo = None
+            else:
+                twoByTwo = numpy.array([twoByTwo[:2], twoByTwo[2:]], coordinateType)
+            componentGlyphs.append((subGlyph, twoByTwo))
+        return componentGlyphs
+
     @property
     def contours(self):
         if self._contours is None:
             firstPoint = 0
             allContours = []
-            for glyphName, transformation in self.components:
-                subGlyph = self._getSubGlyph(glyphName)
-                if isinstance(subGlyph, NotDefGlyph):
-                    continue
+            for subGlyph, twoByTwo in filter(None, self.componentGlyphs):
                 allContours.append(subGlyph.contours + firstPoint)
                 firstPoint = subGlyph.contours[-1] + firstPoint + 1
             self._contours = numpy.concatenate(allContours)
@@ -393,35 +654,27 @@ class VarGlyph:
     @property
     def tags(self):
         if self._tags is None:
-            allTags = []
-            for glyphName, transformation in self.components:
-                subGlyph = self._getSubGlyph(glyphName)
-                if isinstance(subGlyph, NotDefGlyph):
-                    continue
-                allTags.append(subGlyph.tags)
-            self._tags = numpy.concatenate(allTags)
+            self._tags = numpy.concatenate([subGlyph.tags for subGlyph, twoByTwo
+                                            in filter(None, self.componentGlyphs)])
         return self._tags
 
     def getPoints(self):
         if self._points is None:
-            if NUMPY_IN_PLACE:
+            self._points = self._interpolatedPoints
+            if self._points is None:
                 self._points = interpolateFromDeltas(self.model, self.varLocation, self.deltas)
-            else:
-                self._points = self.model.interpolateFromDeltas(self.varLocation, self.deltas)
 
             if self.components:
                 allPoints = []
-                for (glyphName, transformation), offset in zip(self.components, self._points):
-                    twoByTwo = transformation[:4]
-                    subGlyph = self._getSubGlyph(glyphName)
-                    if isinstance(subGlyph, NotDefGlyph):
-                        print(f"Composite base glyph '{glyphName}' not found", file=sys.stderr)
+                for componentGlyph, offset in zip(self.componentGlyphs, self._points):
+                    if componentGlyph is None:
                         continue
+                    subGlyph, twoByTwo = componentGlyph
+                    subGlyph.setVarLocation(self.varLocation)
                     subPoints = subGlyph.getPoints()[:-3]  # strip phantom points
-                    if twoByTwo != (1, 0, 0, 1):  # identity
-                        m = [twoByTwo[:2], twoByTwo[2:]]
-                        subPoints = subPoints @ m  # matrix multiply
-                    allPoints.append(subPoints + offset)  # skip phantom points
+                    if twoByTwo is not None:
+                        subPoints = subPoints @ twoByTwo  # matrix multiply
+                    allPoints.append(subPoints + offset)
                 allPoints.append(self._points[-3:])  # add phantom points
                 self._points = numpy.concatenate(allPoints)
 
@@ -441,81 +694,51 @@ class VarGlyph:
         return self.getPoints()[-2]
 
     def getOutline(self):
-        return makePathFromArrays(self.getPoints(), self.tags, self.contours)
+        return ArrayOutline(self.getPoints(), self.tags, self.contours)
 
     def draw(self, pen):
-        ppen = PointToSegmentPen(pen)
-        startIndex = 0
-        points = self.getPoints()
-        for endIndex in self.contours:
-            lastTag = self.tags[endIndex]
-            endIndex += 1
-            contourTags = self.tags[startIndex:endIndex]
-            contourPoints = points[startIndex:endIndex]
-            ppen.beginPath()
-            for tag, (x, y) in zip(contourTags, contourPoints):
-                if tag == FT_CURVE_TAG_ON:
-                    segmentType = segmentTypes[lastTag]
-                else:
-                    segmentType = None
-                ppen.addPoint((x, y), segmentType=segmentType)
-                lastTag = tag
-            ppen.endPath()
-            startIndex = endIndex
-
-
-class PointCollector(BasePen):
-
-    def __init__(self, glyphSet, decompose=False):
-        super().__init__(glyphSet)
-        self.decompose = decompose
-        self.points = []
-        self.tags = []
-        self.contours = []
-        self.components = []
-        self.contourStartPointIndex = None
-
-    def moveTo(self, pt):
-        self.contourStartPointIndex = len(self.points)
-        self.points.append(pt)
-        self.tags.append(FT_CURVE_TAG_ON)
-
-    def lineTo(self, pt):
-        self.points.append(pt)
-        self.tags.append(FT_CURVE_TAG_ON)
-
-    def curveTo(self, *pts):
-        self.tags.extend([FT_CURVE_TAG_CUBIC] * (len(pts) - 1))
-        self.tags.append(FT_CURVE_TAG_ON)
-        self.points.extend(pts)
-
-    def qCurveTo(self, *pts):
-        self.tags.extend([FT_CURVE_TAG_CONIC] * (len(pts) - 1))
-        if pts[-1] is None:
-            self.contourStartPointIndex = len(self.points)
-            pts = pts[:-1]
-        else:
-            self.tags.append(FT_CURVE_TAG_ON)
-        self.points.extend(pts)
-
-    def closePath(self):
-        assert self.contourStartPointIndex is not None
-        currentPointIndex = len(self.points) - 1
-        if (self.contourStartPointIndex != currentPointIndex and
-                self.points[self.contourStartPointIndex] == self.points[currentPointIndex] and
-                self.tags[self.contourStartPointIndex] == self.tags[currentPointIndex]):
-            self.points.pop()
-            self.tags.pop()
-        self.contours.append(len(self.points) - 1)
-        self.contourStartPointIndex = None
-
-    endPath = closePath
-
-    def addComponent(self, glyphName, transformation):
-        if self.decompose:
-            super().addComponent(glyphName, transformation)
-        else:
-            self.components.append((glyphName, transformation))
+        self.getOutline().draw(pen)
+
+
+class VarGlyphMetrics:
+
+    """The interpolatable metrics of a glyph: the advance width, the advance
+    height and the vertical origin. This has the same metrics API as VarGlyph,
+    but doesn't need the outlines.
+    """
+
+    def __init__(self, masterModel, masterMetrics):
+        self.model, masterMetrics = masterModel.getSubModel(masterMetrics)
+        masterMetrics = [numpy.array(metrics, coordinateType) for metrics in masterMetrics]
+        self.deltas = numpy.array(self.model.getDeltas(masterMetrics))
+        self.varLocation = {}
+        self._metrics = None
+
+    def setVarLocation(self, varLocation):
+        if varLocation is None:
+            varLocation = {}
+        if self.varLocation == varLocation:
+            return
+        self._metrics = None
+        self.varLocation = varLocation
+
+    def getMetrics(self):
+        if self._metrics is None:
+            self._metrics = interpolateFromDeltas(self.model, self.varLocation, self.deltas)
+        return self._metrics
+
+    @property
+    def width(self):
+        return self.getMetrics()[0]
+
+    @property
+    def height(self):
+        return -self.getMetrics()[1]
+
+    @property
+    def verticalOrigin(self):
+        hAdvance, vAdvance, vOrgY = self.getMetrics()
+        return hAdvance / 2, vOrgY
 
 
 def normalizeLocation(doc, location):
@@ -1,34 +1,130 @@
+from collections import OrderedDict
 from fontTools.misc.arrayTools import unionRect
-from ..mac.drawing import rectFromNSRect
 from ..misc.properties import cachedProperty
 
 
+def makeCocoaPath(outline):
+    from ..mac.makePathFromOutline import makePathFromArrays
+    return makePathFromArrays(outline.points, outline.tags, outline.contours)
+
+
 class GlyphDrawing:
 
+    """A list of (outline, colorID) layers. The outlines are platform neutral
+    ArrayOutline objects. The platform specific path objects needed for
+    drawing are only made when drawing, by the `makePath` backend function.
+    """
+
+    makePath = staticmethod(makeCocoaPath)
+
     def __init__(self, layers=None):
         self.layers = layers
 
-    def appendPath(self, path, colorID=None):
-        self.layers.append((path, colorID))
+    def appendPath(self, outline, colorID=None):
+        self.layers.append((outline, colorID))
+        del self.bounds
+        del self.paths
 
     @cachedProperty
     def bounds(self):
         bounds = None
-        for path, colorID in self.layers:
-            if not path.elementCount():
+        for outline, colorID in self.layers:
+            outlineBounds = outline.bounds
+            if outlineBounds is None:
                 continue
-            pathBounds = rectFromNSRect(path.controlPointBounds())
             if bounds is None:
-                bounds = pathBounds
+                bounds = outlineBounds
             else:
-                bounds = unionRect(bounds, pathBounds)
+                bounds = unionRect(bounds, outlineBounds)
         return bounds
 
+    @property
+    def nbytes(self):
+        """An estimate of the memory used by the outlines."""
+        return sum(outline.nbytes + _layerOverhead for outline, colorID in self.layers)
+
+    @cachedProperty
+    def paths(self):
+        return [(self.makePath(outline), colorID) for outline, colorID in self.layers]
+
     def draw(self, colorPalette, defaultColor):
-        for path, colorID in self.layers:
+        for path, colorID in self.paths:
             color = colorPalette.get(colorID, defaultColor)
             color.set()
             path.fill()
 
     def pointInside(self, pt):
-        return any(path.containsPoint_(pt) for path, colorID in self.layers)
+        return any(outline.pointInside(pt) for outline, colorID in self.layers)
+
+
+_layerOverhead = 500  # rough estimate of the memory per layer, apart from the arrays
+
+
+class GlyphDrawingCache:
+
+    """Cache for GlyphDrawing objects at multiple variation locations.
+
+    The locations are quantized, so tiny slider movements end up at the
+    same location. The least recently used locations are discarded when
+    there are more than `maxLocations` locations, or when the estimated
+    memory used by all drawings exceeds `memoryBudget` bytes. The most
+    recently used location is always kept.
+    """
+
+    def __init__(self, maxLocations=8, memoryBudget=64 * 1024 * 1024, locationQuantum=0.01):
+        self.maxLocations = maxLocations
+        self.memoryBudget = memoryBudget
+        self.locationQuantum = locationQuantum
+        self._locations = OrderedDict()  # locationKey -> ([{}, {}], [nbytes])
+        self.nbytes = 0
+
+    def getLocationKey(self, varLocation):
+        if not varLocation:
+            return ()
+        quantum = self.locationQuantum
+        return tuple(sorted((axisTag, round(value / quantum)) for axisTag, value in varLocation.items()))
+
+    def getDrawings(self, locationKey, colorLayers):
+        """Return the {glyphName: glyphDrawing} dict for the location, and mark
+        the location as the most recently used one.
+        """
+        entry = self._locations.get(locationKey)
+        if entry is None:
+            entry = self._locations[locationKey] = ([{}, {}], [0])
+            self._purge()
+        else:
+            self._locations.move_to_end(locationKey)
+        return entry[0][colorLayers]
+
+    def addDrawing(self, locationKey, colorLayers, glyphName, glyphDrawing):
+        drawings, size = self._locations[locationKey]
+        nbytes = glyphDrawing.nbytes
+        drawings[colorLayers][glyphName] = glyphDrawing
+        size[0] += nbytes
+        self.nbytes += nbytes
+        if self.nbytes > self.memoryBudget:
+            self._purge()
+
+    def discardGlyphs(self, glyphNames):
+        """Remove the drawings for `glyphNames` at all locations."""
+        for drawings, size in self._locations.values():
+            for glyphDrawings in drawings:
+                for glyphName in glyphNames:
+                    glyphDrawing = glyphDrawings.pop(glyphName, None)
+                    if glyphDrawing is not None:
+                        nbytes = glyphDrawing.nbytes
+                        size[0] -= nbytes
+                        self.nbytes -= nbytes
+
+    def _purge(self):
+        locations = self._locations
+        while len(locations) > 1 and (len(locations) > self.maxLocations or self.nbytes > self.memoryBudget):
+            locationKey, (drawings, size) = locations.popitem(last=False)
+            self.nbytes -= size[0]
+
+    def __len__(self):
+        return len(self._locations)
+
+    def clear(self):
+        self._locations.clear()
+        self.nbytes = 0
@@ -3,6 +3,7 @@ from fontTools.ttLib import TTFont
 from .baseFont import BaseFont
 from .glyphDrawing import GlyphDrawing
 from ..compile.compilerPool import compileTTXToBytes
+from ..misc.diskCache import getDiskCache, hashData
 from ..misc.ftFont import FTFont
 from ..misc.hbShape import HBShape
 from ..misc.properties import cachedProperty
@@ -10,18 +11,54 @@ from ..misc.properties import cachedProperty
 
 class _OTFBaseFont(BaseFont):
 
+    def resetCache(self):
+        super().resetCache()
+        self._preparedOutlines = {}
+
+    def _prepareGlyphDrawings(self, glyphNames, colorLayers):
+        # Load the outlines of all glyphs we are about to draw, including the
+        # layers of color glyphs, from FreeType in one go.
+        layerGlyphNames = {}
+        if colorLayers and "COLR" in self.ttFont:
+            colorLayers = self.ttFont["COLR"].ColorLayers
+            for glyphName in glyphNames:
+                layers = colorLayers.get(glyphName)
+                if layers is not None:
+                    layerGlyphNames[glyphName] = [layer.name for layer in layers]
+        outlineGlyphNames = []
+        for glyphName in glyphNames:
+            outlineGlyphNames.extend(layerGlyphNames.get(glyphName, [glyphName]))
+        outlineGlyphNames = list(dict.fromkeys(outlineGlyphNames))
+        try:
+            glyphIDs = [self.ttFont.getGlyphID(glyphName) for glyphName in outlineGlyphNames]
+            packedOutlines = self.ftFont.extractOutlines(glyphIDs)
+        except Exception:
+            # Fall back to loading the glyphs one by one, so the error is
+            # reported for the offending glyph only
+            self._preparedOutlines = {}
+        else:
+            self._preparedOutlines = {glyphName: packedOutlines.getOutline(index)
+                                      for index, glyphName in enumerate(outlineGlyphNames)}
+
+    def _getOutline(self, glyphName):
+        outline = self._preparedOutlines.get(glyphName)
+        if outline is None:
+            outline = self.ftFont.getOutline(glyphName)
+        return outline
+
     def _getGlyphDrawing(self, glyphName, colorLayers):
         if colorLayers and "COLR" in self.ttFont:
             colorLayers = self.ttFont["COLR"].ColorLayers
             layers = colorLayers.get(glyphName)
             if layers is not None:
-                drawingLayers = [(self.ftFont.getOutlinePath(layer.name), layer.colorID)
+                drawingLayers = [(self._getOutline(layer.name), layer.colorID)
                                  for layer in layers]
                 return GlyphDrawing(drawingLayers)
-        outline = self.ftFont.getOutlinePath(glyphName)
+        outline = self._getOutline(glyphName)
         return GlyphDrawing([(outline, None)])
 
     def varLocationChanged(self, varLocation):
+        self._preparedOutlines = {}
         self.ftFont.setVarLocation(varLocation if varLocation else {})
 
     @cachedProperty
@@ -39,6 +76,8 @@ class _OTFBaseFont(BaseFont):
 
 class OTFFont(_OTFBaseFont):
 
+    sfntCacheMaxSize = 1024 * 1024 * 1024  # in bytes, for decompressed WOFF and WOFF2 data
+
     def __init__(self, fontPath, fontNumber, dataProvider=None):
         super().__init__(fontPath, fontNumber)
         if dataProvider is not None:
@@ -50,21 +89,43 @@ class OTFFont(_OTFBaseFont):
 
     async def load(self, outputWriter):
         fontData = self.fontData
-        f = io.BytesIO(fontData)
-        self.ttFont = TTFont(f, fontNumber=self.fontNumber, lazy=True)
-        if self.ttFont.flavor in ("woff", "woff2"):
-            self.ttFont.flavor = None
-            self.ttFont.recalcBBoxes = False
-            self.ttFont.recalcTimestamp = False
-            f = io.BytesIO()
-            self.ttFont.save(f, reorderTables=False)
-            fontData = f.getvalue()
+        if fontData[:4] in (b"wOFF", b"wOF2"):
+            fontData = self._getDecompressedFontData(fontData)
+        else:
+            f = io.BytesIO(fontData)
+            self.ttFont = TTFont(f, fontNumber=self.fontNumber, lazy=True)
+        # TTFont, FreeType and HarfBuzz all share the same bytes object:
+        # io.BytesIO and hb.Face don't copy it.
         self.ftFont = FTFont(fontData, fontNumber=self.fontNumber, ttFont=self.ttFont)
         self.shaper = HBShape(fontData, fontNumber=self.fontNumber, ttFont=self.ttFont)
 
+    def _getDecompressedFontData(self, fontData):
+        # FreeType and HarfBuzz need sfnt data, so we decompress WOFF and
+        # WOFF2 fonts, and keep the result in a persistent cache keyed by the
+        # hash of the compressed data.
+        sfntCache = getDiskCache("sfnt", self.sfntCacheMaxSize)
+        if sfntCache is not None:
+            cacheKey = f"{hashData(fontData)}-{self.fontNumber}.sfnt"
+            sfntData = sfntCache.read(cacheKey)
+            if sfntData is not None:
+                self.ttFont = TTFont(io.BytesIO(sfntData), lazy=True)
+                return sfntData
+        self.ttFont = TTFont(io.BytesIO(fontData), fontNumber=self.fontNumber, lazy=True)
+        self.ttFont.flavor = None
+        self.ttFont.recalcBBoxes = False
+        self.ttFont.recalcTimestamp = False
+        f = io.BytesIO()
+        self.ttFont.save(f, reorderTables=False)
+        sfntData = f.getvalue()
+        if sfntCache is not None:
+            sfntCache.write(cacheKey, sfntData)
+        return sfntData
+
 
 class TTXFont(_OTFBaseFont):
 
+    loadResource = "compile"
+
     async def load(self, outputWriter):
         fontData = await compileTTXToBytes(self.fontPath, outputWriter)
         f = io.BytesIO(fontData)
@@ -10,7 +10,6 @@ from fontTools.feaLib.parser import Parser as FeatureParser
 from fontTools.feaLib.ast import IncludeStatement
 from fontTools.feaLib.error import FeatureLibError
 from fontTools.fontBuilder import FontBuilder
-from fontTools.pens.cocoaPen import CocoaPen  # TODO: factor out mac-specific code
 from fontTools.ttLib import TTFont
 from fontTools.ufoLib import UFOReader, UFOFileStructure
 from fontTools.ufoLib import (FONTINFO_FILENAME, GROUPS_FILENAME, KERNING_FILENAME,
@@ -19,14 +18,16 @@ from fontTools.ufoLib.glifLib import Glyph as GLIFGlyph, CONTENTS_FILENAME
 from ufo2ft.constants import COLOR_LAYER_MAPPING_KEY, COLOR_PALETTES_KEY
 from .baseFont import BaseFont
 from .glyphDrawing import GlyphDrawing
-from ..compile.compilerPool import compileUFOToBytes
+from ..compile.compileCache import compileUFOToBytesCached
 from ..compile.ufoCompiler import fetchCharacterMappingAndAnchors
+from ..misc.arrayOutline import ArrayOutline, PointCollector
 from ..misc.hbShape import HBShape
 from ..misc.properties import cachedProperty
 
 
 class UFOFont(BaseFont):
 
+    loadResource = "compile"
     ufoState = None
 
     def resetCache(self):
@@ -50,13 +51,14 @@ class UFOFont(BaseFont):
         self.reader.readInfo(self.info)
         self.lib = self.reader.readLib()
         self._cachedGlyphs = {}
+        self._cachedGlyphMetrics = {}
         if self.ufoState is None:
             includedFeatureFiles = extractIncludedFeatureFiles(self.fontPath, self.reader)
             self.ufoState = UFOState(self.reader, self.glyphSet,
                                      getUnicodesAndAnchors=self._getUnicodesAndAnchors,
                                      includedFeatureFiles=includedFeatureFiles)
 
-        fontData = await compileUFOToBytes(self.fontPath, outputWriter)
+        fontData = await compileUFOToBytesCached(self.fontPath, self.ufoState, outputWriter)
 
         f = io.BytesIO(fontData)
         self.ttFont = TTFont(f, lazy=True)
@@ -93,6 +95,9 @@ class UFOFont(BaseFont):
             self.info = SimpleNamespace()
             self.reader.readInfo(self.info)
 
+        for glyphName in self.ufoState.changedGlyphNames:
+            self._cachedGlyphMetrics.pop(glyphName, None)
+
         if needsCmapUpdate:
             # The cmap changed. Let's update it in-place and only rebuild the shaper
             newCmap = {code: gn for gn, codes in self.ufoState.unicodes.items() for code in codes}
@@ -101,6 +106,11 @@ class UFOFont(BaseFont):
             f = io.BytesIO()
             self.ttFont.save(f, reorderTables=False)
             self.shaper = self._getShaper(f.getvalue())
+        elif needsInfoUpdate:
+            # The default vertical metrics may have changed
+            self.shaper.clearGlyphMetrics()
+        else:
+            self.shaper.clearGlyphMetrics(self.ufoState.changedGlyphNames)
 
         if needsLibUpdate:
             self.lib = self.reader.readLib()
@@ -150,13 +160,33 @@ class UFOFont(BaseFont):
             self._cachedGlyphs[(layerName, glyphName)] = glyph
         return glyph
 
+    def _getGlyphMetrics(self, glyphName):
+        # Return a glyph object that has the width, height and lib attributes,
+        # but no outline. Reading it is much cheaper than self._getGlyph(),
+        # which matters as it is called from within the shaper.
+        glyph = self._cachedGlyphs.get((None, glyphName))
+        if glyph is None:
+            glyph = self._cachedGlyphMetrics.get(glyphName)
+        if glyph is None:
+            if glyphName == ".notdef" and glyphName not in self.glyphSet:
+                glyph = NotDefGlyph(self.info.unitsPerEm)
+            else:
+                try:
+                    glyph = Glyph(glyphName, self.glyphSet)
+                    self.glyphSet.readGlyph(glyphName, glyph)
+                except Exception as e:
+                    print(f"Glyph '{glyphName}' could not be read: {e!r}", file=sys.stderr)
+                    glyph = self._getGlyphMetrics(".notdef")
+            self._cachedGlyphMetrics[glyphName] = glyph
+        return glyph
+
     def _addOutlinePathToGlyph(self, glyph):
-        pen = CocoaPen(self.glyphSet)
+        pen = PointCollector(self.glyphSet, decompose=True)
         glyph.draw(pen)
-        glyph.outline = pen.path
+        glyph.outline = ArrayOutline.fromPointCollector(pen)
 
     def _getHorizontalAdvance(self, glyphName):
-        glyph = self._getGlyph(glyphName)
+        glyph = self._getGlyphMetrics(glyphName)
         return glyph.width
 
     @cachedProperty
@@ -177,14 +207,14 @@ class UFOFont(BaseFont):
             return ascender
 
     def _getVerticalAdvance(self, glyphName):
-        glyph = self._getGlyph(glyphName)
+        glyph = self._getGlyphMetrics(glyphName)
         vAdvance = glyph.height
         if vAdvance is None or vAdvance == 0:  # XXX default vAdv == 0 -> bad UFO spec
             vAdvance = self.defaultVerticalAdvance
         return -abs(vAdvance)
 
     def _getVerticalOrigin(self, glyphName):
-        glyph = self._getGlyph(glyphName)
+        glyph = self._getGlyphMetrics(glyphName)
         vOrgX = glyph.width / 2
         lib = getattr(glyph, "lib", {})
         vOrgY = lib.get("public.verticalOrigin")
@@ -258,9 +288,9 @@ class NotDefGlyph:
         pass
 
     def getOutline(self):
-        pen = CocoaPen(None)  # by now there are no more composites
+        pen = PointCollector(None)  # by now there are no more composites
         self.draw(pen)
-        return pen.path
+        return ArrayOutline.fromPointCollector(pen)
 
 
 class Glyph(GLIFGlyph):
@@ -359,6 +389,7 @@ class UFOState:
         self.fileModTimes = getFileModTimes(reader.fs.getsyspath("/"), ufoFilesToTrack)
         self.includedFeatureFiles = includedFeatureFiles
         self._previousState = previousState
+        self.changedGlyphNames = set()  # set by getUpdateInfo()
 
     def newState(self):
         # This method can only be called on a brand new state without a previous
@@ -393,6 +424,7 @@ class UFOState:
 
         if prev.glyphModTimes != self.glyphModTimes or prev.contentsModTime != self.contentsModTime:
             changedGlyphNames = {glyphName for glyphName, mtime in prev.glyphModTimes ^ self.glyphModTimes}
+            self.changedGlyphNames = changedGlyphNames
             deletedGlyphNames = {glyphName for glyphName in changedGlyphNames if glyphName not in self.glyphSet}
 
             _, changedUnicodes, changedAnchors = fetchCharacterMappingAndAnchors(self.glyphSet,
@@ -386,6 +386,12 @@ class FontList(Group):
         for fontItemInfo in self.project.fonts:
             yield fontItemInfo, self.getFontItem(fontItemInfo.identifier)
 
+    def iterVisibleFontItemInfoAndItems(self):
+        visibleRect = self._nsObject.visibleRect()
+        for fontItemInfo, fontItem in self.iterFontItemInfoAndItems():
+            if AppKit.NSIntersectsRect(fontItem._nsObject.frame(), visibleRect):
+                yield fontItemInfo, fontItem
+
     @hookedProperty
     def vertical(self):
         # Note that we heavily depend on hookedProperty's property that
@@ -1126,7 +1132,8 @@ class FGGlyphLineView(AppKit.NSView):
     @glyphs.setter
     def glyphs(self, glyphs):
         self._glyphs = glyphs
-        rectIndexList = [(gi.bounds, index) for index, gi in enumerate(glyphs) if gi.bounds is not None]
+        rectIndexList = [(tuple(bounds), index) for index, bounds in enumerate(glyphs.bounds.tolist())
+                         if not math.isnan(bounds[0])]
         self._rectTree = RectTree.fromSeq(rectIndexList)
         self._selection = set()
         self._hoveredGlyphIndex = None  # no need to trigger smart redraw calculation
@@ -5,15 +5,14 @@ import io
 import logging
 import os
 import pathlib
-import time
 import traceback
 import unicodedata2 as unicodedata
+import numpy
 import AppKit
 import objc
 from vanilla import (ActionButton, CheckBox, EditText, Group, List, PopUpButton, SplitView, Tabs,
                      TextBox, TextEditor, VanillaBaseControl, Window, HorizontalLine)
 from vanilla.dialogs import getFile
-from fontTools.misc.arrayTools import offsetRect
 from fontgoggles.font import mergeAxes, mergeScriptsAndLanguages, mergeStylisticSetNames
 from fontgoggles.font.baseFont import GlyphsRun
 from fontgoggles.mac.aligningScrollView import AligningScrollView
@@ -24,6 +23,7 @@ from fontgoggles.mac.misc import ClassNameIncrementer, makeTextCell
 from fontgoggles.mac.sliderGroup import SliderGroup, SliderPlus
 from fontgoggles.compile.compilerPool import CompilerError
 from fontgoggles.misc.decorators import asyncTaskAutoCancel, suppressAndLogException
+from fontgoggles.misc.layoutPool import LayoutPool, redirectThreadStderr
 from fontgoggles.misc.textInfo import TextInfo
 from fontgoggles.misc import opentypeTags
 
@@ -69,6 +69,7 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
         self.project = project
         self.projectProxy = makeUndoProxy(self.project, self._projectFontsChanged)
         self.observedPaths = {}
+        self.layoutPool = LayoutPool()
         self._callbackRecursionLock = 0
         self._previouslySingleSelectedItem = None
 
@@ -125,6 +126,7 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
         obs = getFileObserver()
         for path in self.observedPaths:
             obs.removeObserver(path, self._fileChanged)
+        self.layoutPool.close()
         self.__dict__.clear()
 
     def windowTitleForDocumentDisplayName_(self, displayName):
@@ -431,7 +433,9 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
             if wasModified:
                 font = fontItemInfo.font
                 if font is not None:
-                    if font.canReloadWithChange(externalFile):
+                    with font.lock:
+                        canReload = font.canReloadWithChange(externalFile)
+                    if canReload:
                         # The font will be reloaded in-place
                         fontItemInfo.wantsReload = True
                     else:
@@ -471,6 +475,7 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
         if not hasattr(self, "fontList"):
             # Window closed before we got to run
             return ()
+        self.prioritizeFontLoading()
         coros = []
         for fontItemInfo, fontItem in self.iterFontItemInfoAndItems():
             if fontItemInfo.font is None or fontItemInfo.wantsReload:
@@ -483,6 +488,15 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
             self.setLanguagesFromScript()  # update the available languages
         self.fontListSelectionChangedCallback(self.fontList)
 
+    @objc.python_method
+    def prioritizeFontLoading(self):
+        # Load the visible fonts first, then the selected ones
+        visibleFontItemInfos = [fontItemInfo for fontItemInfo, fontItem
+                                in self.fontList.iterVisibleFontItemInfoAndItems()]
+        selectedFontItemInfos = [fontItemInfo for fontItemInfo in self.project.fonts
+                                 if fontItemInfo.identifier in self.fontList.selection]
+        self.project.prioritizeFonts(visibleFontItemInfos + selectedFontItemInfos)
+
     @objc.python_method
     async def _loadFont(self, fontItemInfo, fontItem):
         fontItem.setIsLoading(True)
@@ -589,11 +603,7 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
             # Our window already closed, and our poor async task is too
             # late. Nothing left to do.
             return
-        self.textInfo = TextInfo(sender.get())
-        self.textInfo.shouldApplyBiDi = self.project.textSettings.shouldApplyBiDi
-        self.textInfo.directionOverride = self.project.textSettings.direction
-        self.textInfo.scriptOverride = self.project.textSettings.script
-        self.textInfo.languageOverride = self.project.textSettings.language
+        self.textInfo = TextInfo.fromTextSettings(sender.get(), self.project.textSettings)
         if self.project.textSettings.alignment is not None:
             align = self.project.textSettings.alignment
         else:
@@ -611,14 +621,20 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
             self.updateCharacterList(delay=0.05)
         else:
             charSelection = self.characterList.getSelection()
-        t = time.time()
-        for fontItemInfo, fontItem in self.iterFontItemInfoAndItems():
-            self.setFontItemText(fontItemInfo, fontItem)
-            elapsed = time.time() - t
-            if elapsed > 0.01:
-                # time to unblock the event loop
-                await asyncio.sleep(0)
-                t = time.time()
+        # The fonts are laid out concurrently in worker threads, and we
+        # update the font items as the results come in.
+        fontItemInfosAndItems = list(self.iterFontItemInfoAndItems())
+        textSettings = self.project.textSettings
+        glyphRuns = self.layoutPool.iterGlyphRuns(
+            [fontItemInfo.font for fontItemInfo, fontItem in fontItemInfosAndItems],
+            self.textInfo,
+            features=textSettings.features,
+            varLocation=textSettings.varLocation,
+            colorLayers=textSettings.enableColor,
+            workerContext=objc.autorelease_pool)
+        async for index, glyphs, output in glyphRuns:
+            fontItemInfo, fontItem = fontItemInfosAndItems[index]
+            self.setFontItemGlyphs(fontItem, glyphs, output)
         self.growOrShrinkFontList()
         self.fontListSelectionChangedCallback(self.fontList)
         if not updateCharacterList:
@@ -631,12 +647,15 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
         if font is None:
             return
         stderr = io.StringIO()
-        with contextlib.redirect_stderr(stderr):
+        with redirectThreadStderr(stderr):
             glyphs = font.getGlyphRunFromTextInfo(self.textInfo,
                                                   features=self.project.textSettings.features,
                                                   varLocation=self.project.textSettings.varLocation,
                                                   colorLayers=self.project.textSettings.enableColor)
-        stderr = stderr.getvalue()
+        self.setFontItemGlyphs(fontItem, glyphs, stderr.getvalue())
+
+    @objc.python_method
+    def setFontItemGlyphs(self, fontItem, glyphs, stderr):
         if stderr:
             fontItem.writeCompileOutput(stderr)
 
@@ -696,7 +715,7 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
             keyMap = {"ay": "adv"}
         if glyphs is None:
             glyphs = []
-        glyphListData = [{keyMap.get(k, k): v for k, v in g.__dict__.items()} for g in glyphs]
+        glyphListData = [{keyMap.get(k, k): v for k, v in g.asDict().items()} for g in glyphs]
         with self.blockCallbackRecursion():
             self.glyphList.set(glyphListData)
             fontItem = self.fontList.getSingleSelectedItem()
@@ -725,6 +744,7 @@ class FGMainWindowController(AppKit.NSWindowController, metaclass=ClassNameIncre
 
     @objc.python_method
     def fontListSelectionChangedCallback(self, sender):
+        self.prioritizeFontLoading()
         fontItem = sender.getSingleSelectedItem()
         if self._previouslySingleSelectedItem is not None:
             self._previouslySingleSelectedItem.setAuxillaryOutput(None)
@@ -1316,33 +1336,32 @@ _minimalSpaceBox = 12
 
 
 def addBoundingBoxes(glyphs):
-    for gi in glyphs:
-        bounds = gi.glyphDrawing.bounds
-        if bounds is not None:
-            gi.bounds = offsetRect(bounds, *gi.pos)
+    noBounds = (numpy.nan,) * 4
+    drawingBounds = [glyphDrawing.bounds for glyphDrawing in glyphs.glyphDrawings]
+    bounds = numpy.array([noBounds if b is None else b for b in drawingBounds], float).reshape((-1, 4))
+    posX = glyphs.posX
+    posY = glyphs.posY
+    bounds += numpy.stack([posX, posY, posX, posY], axis=1)
+    empty = numpy.isnan(bounds[:, 0])
+    if empty.any():
+        # Empty shapes, let's make bounding boxes so we can visualize them anyway
+        unitsPerEm = glyphs.unitsPerEm
+        if glyphs.vertical:
+            xMin = posX - unitsPerEm
+            xMax = posX + unitsPerEm * 1.5
+            wide = abs(glyphs.ay) >= _minimalSpaceBox
+            # glyphs.dy and glyphs.ay are negative
+            yMax = numpy.where(wide, posY - glyphs.dy, posY + _minimalSpaceBox / 2)
+            yMin = numpy.where(wide, yMax + glyphs.ay, posY - _minimalSpaceBox / 2)
         else:
-            # Empty shape, let's make a bounding box so we can visualize it anyway
-            x, y = gi.pos
-            if glyphs.vertical:
-                xMin = x - glyphs.unitsPerEm
-                xMax = x + glyphs.unitsPerEm * 1.5
-                if abs(gi.ay) >= _minimalSpaceBox:
-                    # gi.dy and gi.ay are negative
-                    yMax = y - gi.dy
-                    yMin = yMax + gi.ay
-                else:
-                    yMin = y - _minimalSpaceBox / 2
-                    yMax = y + _minimalSpaceBox / 2
-            else:
-                if abs(gi.ax) >= _minimalSpaceBox:
-                    xMin = x
-                    xMax = x + gi.ax
-                else:
-                    xMin = x - _minimalSpaceBox / 2
-                    xMax = x + _minimalSpaceBox / 2
-                yMin = y - glyphs.unitsPerEm
-                yMax = y + glyphs.unitsPerEm * 1.5
-            gi.bounds = (xMin, yMin, xMax, yMax)
+            wide = abs(glyphs.ax) >= _minimalSpaceBox
+            xMin = numpy.where(wide, posX, posX - _minimalSpaceBox / 2)
+            xMax = numpy.where(wide, posX + glyphs.ax, posX + _minimalSpaceBox / 2)
+            yMin = posY - unitsPerEm
+            yMax = posY + unitsPerEm * 1.5
+        emptyBounds = numpy.stack([xMin, yMin, xMax, yMax], axis=1)
+        bounds[empty] = emptyBounds[empty]
+    glyphs.bounds = bounds
 
 
 def _tagFromMenuItem(title, defaultTitle=None):
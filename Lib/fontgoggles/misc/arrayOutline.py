@@ -0,0 +1,273 @@
+import numpy
+from fontTools.pens.basePen import BasePen
+from fontTools.pens.pointPen import PointToSegmentPen
+from .properties import cachedProperty
+
+
+# From FreeType:
+FT_CURVE_TAG_ON = 1
+FT_CURVE_TAG_CONIC = 0
+FT_CURVE_TAG_CUBIC = 2
+FT_CURVE_TAG_MASK = 3
+
+segmentTypes = {FT_CURVE_TAG_ON: "line", FT_CURVE_TAG_CONIC: "qcurve", FT_CURVE_TAG_CUBIC: "curve"}
+coordinateType = numpy.float64
+
+# Indexed by the tag of the preceding point + 1, or 0 for off-curve points
+_segmentTypeTable = numpy.array([None, "qcurve", "line", "curve"], dtype=object)
+
+
+def getSegmentTypes(tags, contours):
+    """Return an array with the point pen segment type for each point. The
+    segment type of an on-curve point depends on the tag of the preceding
+    point in the contour. `contours` holds the index of the last point of
+    each contour, and may contain the contours of many outlines.
+    """
+    contours = numpy.asarray(contours)
+    previousIndices = numpy.arange(-1, len(tags) - 1)
+    if len(contours):
+        contourStarts = numpy.concatenate([[0], contours[:-1] + 1])
+        previousIndices[contourStarts] = contours
+    tableIndices = numpy.where(tags == FT_CURVE_TAG_ON, tags[previousIndices] + 1, 0)
+    return _segmentTypeTable[tableIndices]
+
+
+def drawPointsFromLists(pen, points, segmentTypes, contourRanges):
+    """Replay an outline to a point pen, from precomputed lists of points,
+    segment types and (start, end) point index pairs.
+    """
+    for startIndex, endIndex in contourRanges:
+        pen.beginPath()
+        for pt, segmentType in zip(points[startIndex:endIndex], segmentTypes[startIndex:endIndex]):
+            pen.addPoint(pt, segmentType=segmentType)
+        pen.endPath()
+
+
+class ArrayOutline:
+
+    """A platform neutral glyph outline, stored as numpy arrays, in the same
+    form as a FreeType outline: `points` is an (n, 2) array, `tags` holds the
+    FreeType curve tag for each point and `contours` holds the index of the
+    last point of each contour.
+    """
+
+    curveSteps = 8  # the number of line segments per curve, for pointInside()
+
+    def __init__(self, points, tags, contours):
+        self.tags = numpy.asarray(tags, numpy.byte) & FT_CURVE_TAG_MASK
+        self.contours = numpy.asarray(contours, numpy.short)
+        points = numpy.asarray(points)
+        if not len(points):
+            points = numpy.zeros((0, 2), coordinateType)
+        self.points = points[:len(self.tags)]  # strip phantom points, if any
+        assert len(self.points) == len(self.tags)
+
+    @classmethod
+    def fromPointCollector(cls, collector):
+        return cls(numpy.array(collector.points, coordinateType), collector.tags, collector.contours)
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.tags.nbytes + self.contours.nbytes
+
+    @cachedProperty
+    def bounds(self):
+        """The control point bounds as an (xMin, yMin, xMax, yMax) tuple, or
+        None if the outline is empty.
+        """
+        if not len(self.points):
+            return None
+        xMin, yMin = self.points.min(axis=0).tolist()
+        xMax, yMax = self.points.max(axis=0).tolist()
+        return xMin, yMin, xMax, yMax
+
+    def pointInside(self, pt):
+        """Return True if `pt` is inside the outline, using the non-zero
+        winding rule. Curves are approximated by line segments.
+        """
+        edges = self.flattenedEdges
+        if not len(edges):
+            return False
+        x, y = pt
+        x0, y0, x1, y1 = edges.T
+        side = (x1 - x0) * (y - y0) - (x - x0) * (y1 - y0)
+        upward = (y0 <= y) & (y1 > y) & (side > 0)
+        downward = (y0 > y) & (y1 <= y) & (side < 0)
+        return bool(numpy.count_nonzero(upward) - numpy.count_nonzero(downward))
+
+    @cachedProperty
+    def flattenedEdges(self):
+        """An (n, 4) array of (x0, y0, x1, y1) line segments that approximate
+        the outline.
+        """
+        segmentCollector = _SegmentCollector()
+        self.draw(segmentCollector)
+        return segmentCollector.getFlattenedEdges(self.curveSteps)
+
+    def drawPoints(self, pen):
+        contourEnds = self.contours.tolist()
+        contourRanges = zip([0] + [end + 1 for end in contourEnds[:-1]], [end + 1 for end in contourEnds])
+        drawPointsFromLists(pen, [tuple(pt) for pt in self.points.tolist()],
+                            getSegmentTypes(self.tags, self.contours).tolist(), contourRanges)
+
+    def draw(self, pen):
+        self.drawPoints(PointToSegmentPen(pen))
+
+
+class PackedOutlines:
+
+    """The outlines of many glyphs, packed into flat arrays: `points`, `tags`
+    and `contours` hold the data of all outlines concatenated, with
+    `contours` holding indices into `points`. The outline for the glyph at
+    `index` uses points `pointOffsets[index]` up to `pointOffsets[index + 1]`,
+    and contours `contourOffsets[index]` up to `contourOffsets[index + 1]`.
+    """
+
+    def __init__(self, glyphIDs, points, tags, contours, pointOffsets, contourOffsets):
+        self.glyphIDs = glyphIDs
+        self.points = points
+        self.tags = tags & FT_CURVE_TAG_MASK
+        self.contours = contours
+        self.pointOffsets = pointOffsets
+        self.contourOffsets = contourOffsets
+
+    def __len__(self):
+        return len(self.glyphIDs)
+
+    def getOutline(self, index):
+        pointStart, pointEnd = self.pointOffsets[index:index + 2]
+        contourStart, contourEnd = self.contourOffsets[index:index + 2]
+        return ArrayOutline(self.points[pointStart:pointEnd], self.tags[pointStart:pointEnd],
+                            self.contours[contourStart:contourEnd] - pointStart)
+
+    @cachedProperty
+    def _replayData(self):
+        # The points and segment types for all glyphs at once, as lists
+        points = [tuple(pt) for pt in self.points.tolist()]
+        segmentTypes = getSegmentTypes(self.tags, self.contours).tolist()
+        contourEnds = (self.contours + 1).tolist()
+        return points, segmentTypes, contourEnds
+
+    def drawPoints(self, index, pen):
+        """Draw the outline for the glyph at `index` to a point pen. The segment
+        types for all glyphs are computed in one go, upon first use, so replaying
+        many glyphs does very little work per point.
+        """
+        points, segmentTypes, contourEnds = self._replayData
+        contourStart, contourEnd = self.contourOffsets[index:index + 2].tolist()
+        contourStarts = [self.pointOffsets[index].item()] + contourEnds[contourStart:contourEnd - 1]
+        drawPointsFromLists(pen, points, segmentTypes,
+                            zip(contourStarts, contourEnds[contourStart:contourEnd]))
+
+    def draw(self, index, pen):
+        self.drawPoints(index, PointToSegmentPen(pen))
+
+
+class PointCollector(BasePen):
+
+    """Segment pen that collects an outline in the form that ArrayOutline
+    uses. With `decompose=True`, components are drawn as outlines,
+    otherwise they are collected in `components`. Either way, the names of
+    all glyphs used as (nested) components are collected in `baseGlyphNames`.
+    """
+
+    def __init__(self, glyphSet, decompose=False):
+        super().__init__(glyphSet)
+        self.decompose = decompose
+        self.points = []
+        self.tags = []
+        self.contours = []
+        self.components = []
+        self.baseGlyphNames = set()
+        self.contourStartPointIndex = None
+
+    def moveTo(self, pt):
+        self.contourStartPointIndex = len(self.points)
+        self.points.append(pt)
+        self.tags.append(FT_CURVE_TAG_ON)
+
+    def lineTo(self, pt):
+        self.points.append(pt)
+        self.tags.append(FT_CURVE_TAG_ON)
+
+    def curveTo(self, *pts):
+        self.tags.extend([FT_CURVE_TAG_CUBIC] * (len(pts) - 1))
+        self.tags.append(FT_CURVE_TAG_ON)
+        self.points.extend(pts)
+
+    def qCurveTo(self, *pts):
+        self.tags.extend([FT_CURVE_TAG_CONIC] * (len(pts) - 1))
+        if pts[-1] is None:
+            self.contourStartPointIndex = len(self.points)
+            pts = pts[:-1]
+        else:
+            self.tags.append(FT_CURVE_TAG_ON)
+        self.points.extend(pts)
+
+    def closePath(self):
+        assert self.contourStartPointIndex is not None
+        currentPointIndex = len(self.points) - 1
+        if (self.contourStartPointIndex != currentPointIndex and
+                self.points[self.contourStartPointIndex] == self.points[currentPointIndex] and
+                self.tags[self.contourStartPointIndex] == self.tags[currentPointIndex]):
+            self.points.pop()
+            self.tags.pop()
+        self.contours.append(len(self.points) - 1)
+        self.contourStartPointIndex = None
+
+    endPath = closePath
+
+    def addComponent(self, glyphName, transformation):
+        self.baseGlyphNames.add(glyphName)
+        if self.decompose:
+            super().addComponent(glyphName, transformation)
+        else:
+            self.components.append((glyphName, transformation))
+
+
+class _SegmentCollector(BasePen):
+
+    # Collects lines, quadratic and cubic segments separately, so they can
+    # each be flattened in one go. The order of the edges doesn't matter for
+    # the winding number.
+
+    def __init__(self):
+        super().__init__(None)
+        self.lines = []
+        self.quads = []
+        self.cubics = []
+        self.startPoint = None
+
+    def _moveTo(self, pt):
+        self.startPoint = pt
+
+    def _lineTo(self, pt):
+        self.lines.append((self._getCurrentPoint(), pt))
+
+    def _qCurveToOne(self, pt1, pt2):
+        self.quads.append((self._getCurrentPoint(), pt1, pt2))
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        self.cubics.append((self._getCurrentPoint(), pt1, pt2, pt3))
+
+    def _closePath(self):
+        currentPoint = self._getCurrentPoint()
+        if currentPoint != self.startPoint:
+            self.lines.append((currentPoint, self.startPoint))
+
+    _endPath = _closePath
+
+    def getFlattenedEdges(self, curveSteps):
+        t = numpy.linspace(0, 1, curveSteps + 1)[:, None]
+        mt = 1 - t
+        polylines = []
+        if self.quads:
+            p0, p1, p2 = numpy.array(self.quads, coordinateType).transpose(1, 0, 2)[:, :, None]
+            polylines.append(mt**2 * p0 + 2 * mt * t * p1 + t**2 * p2)
+        if self.cubics:
+            p0, p1, p2, p3 = numpy.array(self.cubics, coordinateType).transpose(1, 0, 2)[:, :, None]
+            polylines.append(mt**3 * p0 + 3 * mt**2 * t * p1 + 3 * mt * t**2 * p2 + t**3 * p3)
+        edges = [numpy.array(self.lines, coordinateType).reshape(-1, 4)]
+        for polyline in polylines:
+            edges.append(numpy.concatenate([polyline[:, :-1], polyline[:, 1:]], axis=2).reshape(-1, 4))
+        return numpy.concatenate(edges)
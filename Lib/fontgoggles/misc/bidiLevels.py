@@ -0,0 +1,296 @@
+"""Array based implementation of the Unicode Bidirectional Algorithm (UAX#9),
+resolving embedding levels for a whole paragraph at once.
+
+It follows the rules as implemented by python-bidi's bidi.algorithm module,
+and gives the same levels, except that it does not fail on characters that
+python-bidi doesn't handle: unassigned characters are treated as L, and the
+isolate formatting characters (LRI, RLI, FSI, PDI) as ON.
+
+Instead of a dict per character, the bidi classes and levels are stored in
+numpy arrays, and most rules are applied to all characters at once.
+"""
+
+import functools
+import numpy
+from .unicodeProperties import codePointsFromText, getBidiClassTable
+
+
+BIDI_CLASSES = ["L", "R", "AL", "EN", "ES", "ET", "AN", "CS", "NSM", "BN", "B", "S", "WS", "ON",
+                "LRE", "LRO", "RLE", "RLO", "PDF"]
+(L, R, AL, EN, ES, ET, AN, CS, NSM, BN, B, S, WS, ON,
+ LRE, LRO, RLE, RLO, PDF) = range(len(BIDI_CLASSES))
+
+_fallbackClasses = {"": L, "LRI": ON, "RLI": ON, "FSI": ON, "PDI": ON}
+
+EXPLICIT_LEVEL_LIMIT = 62
+
+_explicitEmbeddings = {
+    RLE: (lambda level: (level + 1) | 1, None),
+    LRE: (lambda level: (level + 2) & ~1, None),
+    RLO: (lambda level: (level + 1) | 1, R),
+    LRO: (lambda level: (level + 2) & ~1, L),
+}
+_explicitControls = list(_explicitEmbeddings) + [PDF, B]
+_x6Ignored = list(_explicitEmbeddings) + [BN, PDF, B]
+_x9Removed = list(_explicitEmbeddings) + [BN, PDF]
+
+
+def getBiDiClasses(text):
+    """Return an array with the bidi class of each character of `text`, as
+    an index into BIDI_CLASSES.
+    """
+    table = getBidiClassTable()
+    return _getClassCodes()[table.lookupIndices(codePointsFromText(text))]
+
+
+@functools.lru_cache(maxsize=None)
+def _getClassCodes():
+    table = getBidiClassTable()
+    return numpy.array([_fallbackClasses[value] if value not in BIDI_CLASSES else BIDI_CLASSES.index(value)
+                        for value in table.values], dtype=numpy.int8)
+
+
+def getBaseLevel(bidiClasses):
+    """Return the paragraph level: 1 if the first strong character is right
+    to left, 0 otherwise (rules P2 and P3).
+    """
+    strong = numpy.flatnonzero(_isIn(bidiClasses, [L, R, AL]))
+    if not len(strong):
+        return 0
+    return int(bidiClasses[strong[0]] != L)
+
+
+def getBiDiLevels(text, baseLevel=None):
+    """Resolve the embedding levels of `text`. Return a (levels, baseLevel)
+    tuple, `levels` being an array with a level for each character.
+    Characters that are removed by rule X9 get the level of the preceding
+    character.
+    """
+    origClasses = getBiDiClasses(text)
+    if baseLevel is None:
+        baseLevel = getBaseLevel(origClasses)
+    numChars = len(origClasses)
+
+    classes = origClasses.copy()
+    levels = numpy.full(numChars, baseLevel, dtype=numpy.int16)
+    _resolveExplicitLevels(classes, levels, baseLevel)
+
+    # X9: from here on, we work with the remaining characters only
+    isRemoved = _isIn(classes, _x9Removed)
+    hasRemovedChars = isRemoved.any()
+    if hasRemovedChars:
+        charIndices = numpy.flatnonzero(~isRemoved)
+        classes = classes[charIndices]
+        levels = levels[charIndices]
+        origClasses = origClasses[charIndices]
+
+    if len(levels):
+        runs = _LevelRuns(levels, baseLevel)
+        _resolveWeakTypes(classes, runs)
+        _resolveNeutralTypes(classes, levels, runs)
+        _resolveImplicitLevels(classes, levels)
+        _resetWhitespaceLevels(origClasses, levels, baseLevel)
+
+    if hasRemovedChars:
+        allLevels = numpy.full(numChars, -1, dtype=numpy.int16)
+        allLevels[charIndices] = levels
+        indices = _lastIndex(allLevels >= 0)
+        levels = numpy.where(indices >= 0, allLevels[indices], baseLevel)
+    return levels, baseLevel
+
+
+def _resolveExplicitLevels(classes, levels, baseLevel):
+    # X1-X8. The levels only change at explicit embedding controls and
+    # paragraph separators, so we only loop over those, and fill the stretches
+    # in between.
+    overflowCounter = almostOverflowCounter = 0
+    embeddingLevel = baseLevel
+    override = None
+    stack = []
+    start = 0
+    controls = numpy.flatnonzero(_isIn(classes, _explicitControls)).tolist()
+    for index in controls + [len(classes)]:
+        # X6
+        levels[start:index] = embeddingLevel
+        if override is not None:
+            stretch = classes[start:index]
+            stretch[~_isIn(stretch, _x6Ignored)] = override
+        if index == len(classes):
+            break
+        start = index + 1
+        bidiClass = int(classes[index])
+        levels[index] = baseLevel
+        if bidiClass in _explicitEmbeddings:
+            # X2-X5
+            if overflowCounter:
+                overflowCounter += 1
+                continue
+            levelFunc, newOverride = _explicitEmbeddings[bidiClass]
+            newLevel = levelFunc(embeddingLevel)
+            if newLevel < EXPLICIT_LEVEL_LIMIT:
+                stack.append((embeddingLevel, override))
+                embeddingLevel, override = newLevel, newOverride
+            elif embeddingLevel == EXPLICIT_LEVEL_LIMIT - 2:
+                almostOverflowCounter += 1
+            else:
+                overflowCounter += 1
+        elif bidiClass == PDF:
+            # X7
+            if overflowCounter:
+                overflowCounter -= 1
+            elif almostOverflowCounter and embeddingLevel != EXPLICIT_LEVEL_LIMIT - 1:
+                almostOverflowCounter -= 1
+            elif stack:
+                embeddingLevel, override = stack.pop()
+        else:
+            # X8
+            assert bidiClass == B
+            stack = []
+            overflowCounter = almostOverflowCounter = 0
+            embeddingLevel = baseLevel
+            override = None
+
+
+class _LevelRuns:
+
+    # X10: the level runs, as arrays that have a value for each character
+
+    def __init__(self, levels, baseLevel):
+        numChars = len(levels)
+        isRunStart = numpy.ones(numChars, dtype=bool)
+        isRunStart[1:] = levels[1:] != levels[:-1]
+        runStarts = numpy.flatnonzero(isRunStart)
+        runEnds = numpy.append(runStarts[1:], numChars)
+        runLevels = levels[runStarts]
+        precedingLevels = numpy.append(baseLevel, runLevels[:-1])
+        followingLevels = numpy.append(runLevels[1:], baseLevel)
+        runIndices = numpy.cumsum(isRunStart) - 1
+        self.starts = runStarts[runIndices]
+        self.ends = runEnds[runIndices]
+        self.sor = _direction(numpy.maximum(precedingLevels, runLevels))[runIndices]
+        self.eor = _direction(numpy.maximum(followingLevels, runLevels))[runIndices]
+
+    def lastIndex(self, mask):
+        indices = _lastIndex(mask)
+        return numpy.where(indices >= self.starts, indices, -1)
+
+    def nextIndex(self, mask):
+        indices = _nextIndex(mask)
+        return numpy.where(indices < self.ends, indices, -1)
+
+
+def _resolveWeakTypes(classes, runs):
+    # W1: NSM gets the type of the preceding character, or sor
+    isNSM = classes == NSM
+    if isNSM.any():
+        indices = runs.lastIndex(~isNSM)
+        classes[isNSM] = numpy.where(indices >= 0, classes[indices], runs.sor)[isNSM]
+
+    # W2: EN preceded by AL (searching back to the first strong type)
+    # becomes AN
+    isEN = classes == EN
+    if isEN.any():
+        indices = runs.lastIndex(_isIn(classes, [L, R, AL]))
+        precededByAL = (indices >= 0) & (classes[indices] == AL)
+        classes[isEN & precededByAL] = AN
+
+    # W3
+    classes[classes == AL] = R
+
+    # W4: a single ES between two ENs becomes EN, a single CS between two
+    # numbers of the same type becomes that type. This only applies within
+    # a level run.
+    inner = numpy.flatnonzero(_isIn(classes, [ES, CS]))
+    inner = inner[(runs.starts[inner] < inner) & (inner < runs.ends[inner] - 1)]
+    previousClasses = classes[inner - 1]
+    nextClasses = classes[inner + 1]
+    innerClasses = classes[inner]
+    isES = (innerClasses == ES) & (previousClasses == EN) & (nextClasses == EN)
+    isCS = (innerClasses == CS) & (previousClasses == nextClasses) & _isIn(previousClasses, [AN, EN])
+    classes[inner[isES]] = EN
+    classes[inner[isCS]] = previousClasses[isCS]
+
+    # W5: sequences of ETs adjacent to EN become EN
+    isET = classes == ET
+    if isET.any():
+        before = runs.lastIndex(~isET)
+        after = runs.nextIndex(~isET)
+        adjacentToEN = (((before >= 0) & (classes[before] == EN)) |
+                        ((after >= 0) & (classes[after] == EN)))
+        classes[isET & adjacentToEN] = EN
+
+    # W6
+    classes[_isIn(classes, [ET, ES, CS])] = ON
+
+    # W7: EN preceded by L (searching back to the first strong type) becomes L
+    isEN = classes == EN
+    if isEN.any():
+        indices = runs.lastIndex(_isIn(classes, [L, R]))
+        precedingStrong = numpy.where(indices >= 0, classes[indices], runs.sor)
+        classes[isEN & (precedingStrong == L)] = L
+
+
+def _resolveNeutralTypes(classes, levels, runs):
+    # N1: sequences of neutrals get the direction of the surrounding strong
+    # text, if it is the same on both sides. Numbers count as R.
+    # N2: remaining neutrals get the embedding direction.
+    isNeutral = _isIn(classes, [B, S, WS, ON])
+    before = runs.lastIndex(~isNeutral)
+    after = runs.nextIndex(~isNeutral)
+    classBefore = _numbersAsR(numpy.where(before >= 0, classes[before], runs.sor))
+    classAfter = _numbersAsR(numpy.where(after >= 0, classes[after], runs.eor))
+    classBefore = classBefore[isNeutral]
+    classAfter = classAfter[isNeutral]
+    classes[isNeutral] = numpy.where(classBefore == classAfter, classBefore, _direction(levels[isNeutral]))
+
+
+def _resolveImplicitLevels(classes, levels):
+    # I1 and I2
+    isEven = levels % 2 == 0
+    isNumber = _isIn(classes, [AN, EN])
+    levels[isEven & (classes == R)] += 1
+    levels[isEven & isNumber] += 2
+    levels[~isEven & ((classes == L) | isNumber)] += 1
+
+
+def _resetWhitespaceLevels(origClasses, levels, baseLevel):
+    # L1: separators, and whitespace preceding a separator or at the end of
+    # the line, get the paragraph level.
+    isSeparator = _isIn(origClasses, [B, S])
+    isWhitespace = origClasses == WS
+    indices = _nextIndex(~isWhitespace)
+    followedBySeparator = (indices < 0) | isSeparator[indices]
+    levels[isSeparator | (isWhitespace & followedBySeparator)] = baseLevel
+
+
+def _isIn(classes, classList):
+    # Much faster than numpy.isin() for a few small integer classes
+    mask = classes == classList[0]
+    for bidiClass in classList[1:]:
+        mask |= classes == bidiClass
+    return mask
+
+
+def _direction(levels):
+    return numpy.where(levels % 2, R, L).astype(numpy.int8)
+
+
+def _numbersAsR(classes):
+    return numpy.where(_isIn(classes, [AN, EN]), R, classes)
+
+
+def _lastIndex(mask):
+    # For each position, return the index of the nearest True value in `mask`
+    # at or before it, or -1 if there is none.
+    indices = numpy.where(mask, numpy.arange(len(mask), dtype=numpy.int32), -1)
+    return numpy.maximum.accumulate(indices) if len(indices) else indices
+
+
+def _nextIndex(mask):
+    # For each position, return the index of the nearest True value in `mask`
+    # at or after it, or -1 if there is none.
+    numItems = len(mask)
+    indices = numpy.where(mask, numpy.arange(numItems, dtype=numpy.int32), numItems)
+    if numItems:
+        indices = numpy.minimum.accumulate(indices[::-1])[::-1]
+    return numpy.where(indices < numItems, indices, -1)
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+cacheFolderEnvironmentVariable = "FONTGOGGLES_CACHE_DIR"
+
+
+def getCacheRootFolder():
+    """Return the folder in which FontGoggles keeps its persistent caches, or
+    None if caching to disk is disabled. This can be overridden with the
+    FONTGOGGLES_CACHE_DIR environment variable; setting it to an empty string
+    disables the disk caches.
+    """
+    folder = os.environ.get(cacheFolderEnvironmentVariable)
+    if folder is not None:
+        return pathlib.Path(folder) if folder else None
+    home = pathlib.Path.home()
+    if sys.platform == "darwin":
+        return home / "Library" / "Caches" / "FontGoggles"
+    elif sys.platform == "win32":
+        return pathlib.Path(os.environ.get("LOCALAPPDATA", home)) / "FontGoggles" / "Cache"
+    else:
+        return pathlib.Path(os.environ.get("XDG_CACHE_HOME", home / ".cache")) / "fontgoggles"
+
+
+_diskCaches = {}
+_diskCachesLock = threading.Lock()
+
+
+def getDiskCache(name, maxSize):
+    """Return the shared DiskCache called `name`, or None if disk caching is
+    disabled.
+    """
+    with _diskCachesLock:
+        if name not in _diskCaches:
+            rootFolder = getCacheRootFolder()
+            _diskCaches[name] = None if rootFolder is None else DiskCache(rootFolder / name, maxSize)
+        return _diskCaches[name]
+
+
+def hashData(*chunks):
+    """Return a hex digest for the concatenation of the bytes-like `chunks`,
+    to be used as (part of) a cache key.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+class DiskCache:
+
+    """A persistent cache of files in `folder`, keyed by strings, typically
+    content hashes. Once the total size of the files exceeds `maxSize` bytes,
+    the least recently used files are deleted.
+
+    Files are written to a temporary file first, and then moved into place,
+    so readers never see partially written files. Errors writing to the
+    cache are logged but otherwise ignored: the cache is an optimization
+    only.
+    """
+
+    def __init__(self, folder, maxSize):
+        self.folder = pathlib.Path(folder)
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+
+    def _getPath(self, key):
+        return self.folder / key
+
+    def getPath(self, key):
+        """Return the path of the cached file for `key`, or None if it is not
+        in the cache.
+        """
+        path = self._getPath(key)
+        try:
+            # Modification times serve as our "last used" times, as access
+            # times are often not maintained by the file system.
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def read(self, key):
+        """Return the cached data for `key` as bytes, or None if it is not in
+        the cache.
+        """
+        path = self.getPath(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def write(self, key, data):
+        """Store `data` for `key`, and return the path of the cached file, or
+        None if the data could not be written.
+        """
+        path = self._getPath(key)
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            fd, tempPath = tempfile.mkstemp(dir=self.folder, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tempPath, path)
+            except BaseException:
+                os.remove(tempPath)
+                raise
+        except OSError as e:
+            logger.warning("can't write to cache %s: %s", self.folder, e)
+            return None
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Delete the least recently used files until the cache is no larger
+        than self.maxSize. The file at path `keep` is never deleted.
+        """
+        entries = []
+        totalSize = 0
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.name.startswith(".tmp-"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue  # deleted in the meantime
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    totalSize += st.st_size
+        except OSError:
+            return
+        entries.sort()
+        keep = os.fspath(keep) if keep is not None else None
+        for mtime, size, path in entries:
+            if totalSize <= self.maxSize:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalSize -= size
+
+    def clear(self):
+        for entry in list(self.folder.glob("*")):
+            try:
+                entry.unlink()
+            except OSError:
+                pass
@@ -1,9 +1,11 @@
+import ctypes
 import io
 import logging
+import numpy
 from fontTools.ttLib import TTFont
 from fontTools.pens.pointPen import PointToSegmentPen
 import freetype
-from ..mac.makePathFromOutline import makePathFromOutline
+from .arrayOutline import ArrayOutline, PackedOutlines
 
 
 class FTFont:
@@ -37,34 +39,83 @@ class FTFont:
         freetype.FT_Set_Var_Design_Coordinates(self._ftFace._FT_Face, len(coordinates), c_coordinates)
 
     def drawGlyphToPointPen(self, glyphName, pen):
+        self.getOutline(glyphName).drawPoints(pen)
+
+    def drawGlyphToPen(self, glyphName, pen):
+        self.drawGlyphToPointPen(glyphName, PointToSegmentPen(pen))
+
+    def getOutline(self, glyphName):
         glyphID = self._ttFont.getGlyphID(glyphName)
         face = self._ftFace
         face.load_glyph(glyphID, freetype.FT_LOAD_NO_SCALE)
-        contours = (i + 1 for i in face.glyph.outline.contours)
-        points = face.glyph.outline.points
-        flags = face.glyph.outline.tags
-        curveType = "curve" if any(t & 0x02 for t in flags) else "qcurve"
-        fromIndex = 0
-        for toIndex in contours:
-            cPoints = points[fromIndex:toIndex]
-            cFlags = flags[fromIndex:toIndex]
-            pen.beginPath()
-            for i in range(len(cPoints)):
-                if not cFlags[i] & 0x01:
-                    segmentType = None
-                elif cFlags[i - 1] & 0x01:
-                    segmentType = "line"
-                else:
-                    segmentType = curveType
-                pen.addPoint(cPoints[i], segmentType)
-            pen.endPath()
-            fromIndex = toIndex
+        return ArrayOutline(*outlineToArrays(face.glyph.outline._FT_Outline))
 
-    def drawGlyphToPen(self, glyphName, pen):
-        self.drawGlyphToPointPen(glyphName, PointToSegmentPen(pen))
+    def extractOutlines(self, glyphIDs=None):
+        """Load the outlines for `glyphIDs`, or all glyphs if `glyphIDs` is
+        None, and return them as a PackedOutlines object. The outline data is
+        copied from FreeType as raw bytes, so there is very little work per
+        glyph.
+        """
+        if glyphIDs is None:
+            glyphIDs = range(self._ftFace.num_glyphs)
+        glyphIDs = list(glyphIDs)
+        ftFace = self._ftFace._FT_Face
+        ftGlyph = ftFace.contents.glyph
+        pointsData = bytearray()
+        tagsData = bytearray()
+        contoursData = bytearray()
+        pointOffsets = [0]
+        contourOffsets = [0]
+        numPoints = numContours = 0
+        for glyphID in glyphIDs:
+            error = freetype.FT_Load_Glyph(ftFace, glyphID, freetype.FT_LOAD_NO_SCALE)
+            if error:
+                raise freetype.FT_Exception(error)
+            outline = ftGlyph.contents.outline
+            n_points = outline.n_points
+            n_contours = outline.n_contours
+            if n_points:
+                pointsData += ctypes.string_at(outline.points, n_points * _vectorSize)
+                tagsData += ctypes.string_at(outline.tags, n_points)
+                contoursData += ctypes.string_at(outline.contours, n_contours * _shortSize)
+            numPoints += n_points
+            numContours += n_contours
+            pointOffsets.append(numPoints)
+            contourOffsets.append(numContours)
+        pointOffsets = numpy.array(pointOffsets, numpy.int64)
+        contourOffsets = numpy.array(contourOffsets, numpy.int64)
+        points = numpy.frombuffer(pointsData, _posType).reshape(-1, 2).astype(numpy.int64)
+        tags = numpy.frombuffer(tagsData, numpy.byte)
+        contours = numpy.frombuffer(contoursData, numpy.short).astype(numpy.int32)
+        # Make the contour end indices relative to all points
+        contours += numpy.repeat(pointOffsets[:-1], numpy.diff(contourOffsets)).astype(numpy.int32)
+        return PackedOutlines(glyphIDs, points, tags, contours, pointOffsets, contourOffsets)
 
     def getOutlinePath(self, glyphName):
+        from ..mac.makePathFromOutline import makePathFromOutline
         glyphID = self._ttFont.getGlyphID(glyphName)
         face = self._ftFace
         face.load_glyph(glyphID, freetype.FT_LOAD_NO_SCALE)
         return makePathFromOutline(face.glyph.outline._FT_Outline)
+
+
+_vectorSize = ctypes.sizeof(freetype.FT_Vector)
+_shortSize = ctypes.sizeof(ctypes.c_short)
+_posType = numpy.dtype(f"i{ctypes.sizeof(freetype.FT_Pos)}")
+
+
+def outlineToArrays(outline):
+    """Copy the points, tags and contours of an FT_Outline struct into
+    numpy arrays, without looping over the points in Python.
+    """
+    numPoints = outline.n_points
+    numContours = outline.n_contours
+    if not numPoints:
+        return numpy.zeros((0, 2), numpy.int64), numpy.zeros(0, numpy.byte), numpy.zeros(0, numpy.short)
+    points = numpy.ctypeslib.as_array(ctypes.cast(outline.points, ctypes.POINTER(freetype.FT_Pos)),
+                                      (numPoints, 2)).astype(numpy.int64)
+    tags = numpy.ctypeslib.as_array(ctypes.cast(outline.tags, ctypes.POINTER(ctypes.c_byte)),
+                                    (numPoints,)).copy()
+    contours = numpy.ctypeslib.as_array(ctypes.cast(outline.contours, ctypes.POINTER(ctypes.c_short)),
+                                        (numContours,)).copy()
+    return points, tags, contours
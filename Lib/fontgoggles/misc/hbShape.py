@@ -1,7 +1,6 @@
-from collections import defaultdict
 import functools
 import io
-import itertools
+import numpy
 from fontTools.ttLib import TTFont
 from fontTools.unicodedata import ot_tag_to_script
 import uharfbuzz as hb
@@ -46,19 +45,34 @@ def _getGlyphIDFunc(font, char, shaper):
     return glyphID
 
 
+#
+# The metrics callbacks are called for every glyph of every shaped string,
+# so their results are stored in tables indexed by glyph ID. A None item
+# means the metric wasn't requested yet. See HBShape.clearGlyphMetrics().
+#
+
 def _getHorizontalAdvanceFunc(font, glyphID, shaper):
-    glyphName = shaper.glyphOrder[glyphID]
-    return shaper.getHorizontalAdvance(glyphName)
+    advance = shaper._hAdvances[glyphID]
+    if advance is None:
+        advance = shaper.getHorizontalAdvance(shaper.glyphOrder[glyphID])
+        shaper._hAdvances[glyphID] = advance
+    return advance
 
 
 def _getVerticalAdvanceFunc(font, glyphID, shaper):
-    glyphName = shaper.glyphOrder[glyphID]
-    return shaper.getVerticalAdvance(glyphName)
+    advance = shaper._vAdvances[glyphID]
+    if advance is None:
+        advance = shaper.getVerticalAdvance(shaper.glyphOrder[glyphID])
+        shaper._vAdvances[glyphID] = advance
+    return advance
 
 
 def _getVerticalOriginFunc(font, glyphID, shaper):
-    glyphName = shaper.glyphOrder[glyphID]
-    return shaper.getVerticalOrigin(glyphName)
+    origin = shaper._vOrigins[glyphID]
+    if origin is None:
+        origin = shaper.getVerticalOrigin(shaper.glyphOrder[glyphID])
+        shaper._vOrigins[glyphID] = origin
+    return origin
 
 
 _stylisticSets = {f"ss{i:02}" for i in range(1, 21)}
@@ -113,6 +127,20 @@ class HBShape:
         else:
             self._funcs = None
 
+        # The scale and the font funcs never change, so we set them up once.
+        # The variation location is only applied when it actually changed,
+        # and we reuse a single buffer. See _configure() and _shapeOne().
+        self.font.scale = (self.face.upem, self.face.upem)
+        hb.ot_font_set_funcs(self.font)
+        if self._funcs is not None:
+            self.font.funcs = self._funcs
+        self._currentVarLocation = None
+        self._buffer = hb.Buffer()
+        # Metrics from callbacks may depend on the location, unless the
+        # font isn't variable.
+        self._metricsDependOnLocation = "fvar" in ttFont
+        self.clearGlyphMetrics()
+
     def getFeatures(self, tag):
         return hb.ot_layout_language_get_feature_tags(self.face, tag)
 
@@ -148,42 +176,295 @@ class HBShape:
         except KeyError:
             return default
 
+    def clearGlyphMetrics(self, glyphNames=None):
+        """Forget the glyph metrics that were obtained from the metrics
+        callbacks, for the glyphs in `glyphNames`, or for all glyphs if
+        `glyphNames` is None. Clients should call this when the metrics of
+        glyphs changed, for example after the source was edited.
+        """
+        if glyphNames is None:
+            numGlyphs = len(self.glyphOrder)
+            self._hAdvances = [None] * numGlyphs
+            self._vAdvances = [None] * numGlyphs
+            self._vOrigins = [None] * numGlyphs
+        else:
+            for glyphName in glyphNames:
+                glyphID = self.getGlyphID(glyphName, None)
+                if glyphID is not None:
+                    self._hAdvances[glyphID] = None
+                    self._vAdvances[glyphID] = None
+                    self._vOrigins[glyphID] = None
+
     def shape(self, text, *, features=None, varLocation=None,
               direction=None, language=None, script=None):
-        if features is None:
-            features = {}
+        self._configure(varLocation)
+        return self._shapeOne(text, features, direction, language, script)
+
+    def shapeMany(self, segments, *, features=None, varLocation=None):
+        """Shape a sequence of text segments with the same features and
+        variation location. Each segment is a (text, direction, language, script)
+        tuple, where all but the text may be None. Returns a list with a list
+        of GlyphInfo objects for each segment.
+
+        This is more efficient than calling shape() for each segment, as the
+        font only gets configured once.
+        """
+        self._configure(varLocation)
+        return [self._shapeOne(text, features, direction, language, script)
+                for text, direction, language, script in segments]
+
+    def shapeManyToArrays(self, segments, *, features=None, varLocation=None):
+        """Like shapeMany(), but returns the results column-wise, as a
+        (glyphIDs, clusters, positions) tuple of NumPy arrays per segment.
+        `positions` has shape (numGlyphs, 4), with the columns being dx, dy,
+        ax and ay. No per-glyph Python objects are retained.
+        """
+        self._configure(varLocation)
+        results = []
+        for text, direction, language, script in segments:
+            buf = self._shapeToBuffer(text, features, direction, language, script)
+            infos = buf.glyph_infos
+            gids = numpy.array([info.codepoint for info in infos], numpy.int32)
+            clusters = numpy.array([info.cluster for info in infos], numpy.int32)
+            positions = numpy.array([pos.position for pos in buf.glyph_positions], numpy.int32)
+            results.append((gids, clusters, positions.reshape((-1, 4))))
+        return results
+
+    def shapeToArrays(self, text, *, features=None, varLocation=None,
+                      direction=None, language=None, script=None,
+                      start=0, end=None, segmentProperties=None):
+        """Shape text[start:end], using the rest of `text` as context, and
+        return a (glyphIDs, clusters, positions, unsafeToBreak,
+        segmentProperties) tuple. The first three are like the results of
+        shapeManyToArrays(), but the clusters are indices into `text`.
+        `unsafeToBreak` is a boolean array with HarfBuzz' UNSAFE_TO_BREAK
+        glyph flag. `segmentProperties` is a (direction, script, language)
+        tuple as resolved by HarfBuzz: pass it back in when reshaping part
+        of the same text, so the properties are not guessed from the part.
+        """
+        self._configure(varLocation)
+        if end is None:
+            end = len(text)
+        buf = self._shapeToBuffer(text, features, direction, language, script,
+                                  start, end - start, segmentProperties)
+        infos = buf.glyph_infos
+        gids = numpy.array([info.codepoint for info in infos], numpy.int32)
+        clusters = numpy.array([info.cluster for info in infos], numpy.int32)
+        unsafeToBreak = numpy.array([info.flags & hb.GlyphFlags.UNSAFE_TO_BREAK for info in infos], bool)
+        positions = numpy.array([pos.position for pos in buf.glyph_positions], numpy.int32)
+        segmentProperties = (buf.direction, buf.script, buf.language)
+        return gids, clusters, positions.reshape((-1, 4)), unsafeToBreak, segmentProperties
+
+    def _configure(self, varLocation):
         if varLocation is None:
             varLocation = {}
+        if varLocation != self._currentVarLocation:
+            self.font.set_variations(varLocation)
+            self._currentVarLocation = dict(varLocation)  # the client may modify theirs in-place
+            if self._metricsDependOnLocation and self._funcs is not None:
+                self.clearGlyphMetrics()
+
+    def _shapeOne(self, text, features, direction, language, script):
+        buf = self._shapeToBuffer(text, features, direction, language, script)
+        glyphOrder = self.glyphOrder
+        infos = []
+        for info, pos in zip(buf.glyph_infos, buf.glyph_positions):
+            infos.append(GlyphInfo(info.codepoint, glyphOrder[info.codepoint], info.cluster, *pos.position))
+        return infos
 
-        self.font.scale = (self.face.upem, self.face.upem)
-        self.font.set_variations(varLocation)
+    def getSegmentProperties(self, text, *, direction=None, language=None, script=None):
+        """Return the (direction, script, language) tuple that will be used
+        when shaping `text` with these arguments.
+        """
+        buf = hb.Buffer()
+        self._fillBuffer(buf, text, direction, language, script)
+        return (buf.direction, buf.script, buf.language)
 
-        hb.ot_font_set_funcs(self.font)
+    def _shapeToBuffer(self, text, features, direction, language, script,
+                       itemOffset=0, itemLength=-1, segmentProperties=None):
+        if features is None:
+            features = {}
 
-        if self._funcs is not None:
-            self.font.funcs = self._funcs
+        buf = self._buffer
+        buf.clear_contents()
+        self._fillBuffer(buf, text, direction, language, script, itemOffset, itemLength, segmentProperties)
+
+        hb.shape(self.font, buf, features)
+        return buf
 
-        buf = hb.Buffer.create()
-        buf.add_str(str(text))  # add_str() does not accept str subclasses
-        buf.guess_segment_properties()
+    @staticmethod
+    def _fillBuffer(buf, text, direction, language, script,
+                    itemOffset=0, itemLength=-1, segmentProperties=None):
+        buf.add_str(str(text), itemOffset, itemLength)  # add_str() does not accept str subclasses
 
-        if direction is not None:
-            buf.direction = direction
-        if language is not None:
-            buf.language = language
-        if script is not None:
-            script = ot_tag_to_script(script)
+        if segmentProperties is not None:
+            buf.direction, buf.script, buf.language = segmentProperties
+        else:
+            buf.guess_segment_properties()
+
+            if direction is not None:
+                buf.direction = direction
+            if language is not None:
+                buf.language = language
             if script is not None:
-                buf.script = script
+                script = ot_tag_to_script(script)
+                if script is not None:
+                    buf.script = script
 
-        hb.shape(self.font, buf, features)
 
-        glyphOrder = self.glyphOrder
-        infos = []
-        for info, pos in zip(buf.glyph_infos, buf.glyph_positions):
-            infos.append(GlyphInfo(info.codepoint, glyphOrder[info.codepoint], info.cluster, *pos.position))
+class ShapedText:
 
-        return infos
+    """The result of HBShape.shapeToArrays() for a complete text, which can be
+    partially reshaped after the text was edited, see reshape(). The glyph
+    arrays are in HarfBuzz' output order, as usual.
+    """
+
+    def __init__(self, text, gids, clusters, positions, unsafeToBreak, segmentProperties,
+                 shapeArguments=(None, None, None)):
+        self.text = text
+        self.gids = gids
+        self.clusters = clusters
+        self.positions = positions
+        self.unsafeToBreak = unsafeToBreak
+        self.segmentProperties = segmentProperties
+        self.shapeArguments = shapeArguments  # direction, language, script
+        self._isReversed = segmentProperties[0] in ("rtl", "btt")
+        self._safeBoundaries = None
+
+    @classmethod
+    def fromShaper(cls, shaper, text, *, features=None, varLocation=None,
+                   direction=None, language=None, script=None):
+        return cls(text, *shaper.shapeToArrays(text, features=features, varLocation=varLocation,
+                                               direction=direction, language=language, script=script),
+                   (direction, language, script))
+
+    def getCommonLength(self, text):
+        """Return the number of characters at the start and the end of `text`
+        that are the same as in self.text.
+        """
+        prefixLength = _commonPrefixLength(self.text, text)
+        return prefixLength + _commonSuffixLength(self.text, text, min(len(self.text), len(text)) - prefixLength)
+
+    def reshape(self, shaper, text, *, features=None, varLocation=None):
+        """Shape `text`, being an edited version of self.text, with the same
+        features and variation location. Only the edited part plus some
+        surroundings get reshaped, the glyphs of the rest of the text are
+        reused. Returns a new ShapedText object, or None if nothing could be
+        reused, in which case the text should be shaped from scratch.
+        """
+        safeBoundaries = self._getSafeBoundaries()
+        if safeBoundaries is None:
+            return None
+        boundaries, glyphIndices = safeBoundaries
+        oldText = self.text
+        prefixLength = _commonPrefixLength(oldText, text)
+        suffixLength = _commonSuffixLength(oldText, text, min(len(oldText), len(text)) - prefixLength)
+        delta = len(text) - len(oldText)
+
+        # We splice at the safe boundaries closest to the edit, but we reshape
+        # from one more safe boundary away, so we can verify that the glyphs
+        # on the reused side of the splice points did not change.
+        i = numpy.searchsorted(boundaries, prefixLength, "right") - 1
+        j = numpy.searchsorted(boundaries, len(oldText) - suffixLength, "left")
+        i0 = max(i - 1, 0)
+        j1 = min(j + 1, len(boundaries) - 1)
+        start = boundaries[i0]
+        end = boundaries[j1]
+        if start == 0 and end == len(oldText):
+            return None
+        direction, language, script = self.shapeArguments
+        if shaper.getSegmentProperties(text, direction=direction, language=language,
+                                       script=script) != self.segmentProperties:
+            # The edit changed the guessed direction or script
+            return None
+
+        gids, clusters, positions, unsafeToBreak, _ = shaper.shapeToArrays(
+            text, features=features, varLocation=varLocation, start=start, end=end + delta,
+            segmentProperties=self.segmentProperties)
+        gids, clusters, positions, unsafeToBreak = self._logical(gids, clusters, positions, unsafeToBreak)
+
+        spliceA = _findSplicePoint(clusters, unsafeToBreak, boundaries[i], start)
+        spliceB = _findSplicePoint(clusters, unsafeToBreak, boundaries[j] + delta, end + delta)
+        if spliceA is None or spliceB is None or spliceA > spliceB:
+            return None
+
+        oldGIDs, oldClusters, oldPositions, oldUnsafeToBreak = self._logical(
+            self.gids, self.clusters, self.positions, self.unsafeToBreak)
+        oldA0, oldA, oldB, oldB1 = glyphIndices[[i0, i, j, j1]]
+        if not (numpy.array_equal(gids[:spliceA], oldGIDs[oldA0:oldA]) and
+                numpy.array_equal(clusters[:spliceA], oldClusters[oldA0:oldA]) and
+                numpy.array_equal(positions[:spliceA], oldPositions[oldA0:oldA]) and
+                numpy.array_equal(gids[spliceB:], oldGIDs[oldB:oldB1]) and
+                numpy.array_equal(clusters[spliceB:], oldClusters[oldB:oldB1] + delta) and
+                numpy.array_equal(positions[spliceB:], oldPositions[oldB:oldB1])):
+            return None
+
+        newArrays = []
+        for oldArray, newArray, offset in [(oldGIDs, gids, 0), (oldClusters, clusters, delta),
+                                           (oldPositions, positions, 0),
+                                           (oldUnsafeToBreak, unsafeToBreak, 0)]:
+            newArrays.append(numpy.concatenate([oldArray[:oldA], newArray[spliceA:spliceB],
+                                                oldArray[oldB:] + offset]))
+        return ShapedText(text, *self._logical(*newArrays), self.segmentProperties, self.shapeArguments)
+
+    def _logical(self, *arrays):
+        # Convert between output order and logical order
+        if self._isReversed:
+            return [a[::-1] for a in arrays]
+        return arrays
+
+    def _getSafeBoundaries(self):
+        # Return the character indices at which it is safe to break the glyph
+        # run, plus the corresponding glyph indices in logical order.
+        if self._safeBoundaries is None:
+            clusters, unsafeToBreak = self._logical(self.clusters, self.unsafeToBreak)
+            if (numpy.diff(clusters) < 0).any():
+                # Clusters are not monotonic, we can't reliably splice
+                self._safeBoundaries = ()
+            else:
+                isClusterStart = numpy.ones(len(clusters), bool)
+                isClusterStart[1:] = clusters[1:] != clusters[:-1]
+                boundaries = numpy.unique(numpy.concatenate(
+                    [[0], clusters[isClusterStart & ~unsafeToBreak], [len(self.text)]]))
+                glyphIndices = numpy.searchsorted(clusters, boundaries, "left")
+                self._safeBoundaries = boundaries, glyphIndices
+        return self._safeBoundaries or None
+
+
+def _findSplicePoint(clusters, unsafeToBreak, charIndex, rangeBoundary):
+    # Return the (logical) glyph index for the start of the cluster at
+    # `charIndex`, or None if it is not safe to break the glyph run there.
+    index = numpy.searchsorted(clusters, charIndex, "left")
+    if charIndex == rangeBoundary:
+        return index
+    if index == len(clusters) or clusters[index] != charIndex or unsafeToBreak[index]:
+        return None
+    return index
+
+
+def _commonPrefixLength(s1, s2):
+    # Binary search, so the comparisons happen at C speed
+    lo = 0
+    hi = min(len(s1), len(s2))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if s1[lo:mid] == s2[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _commonSuffixLength(s1, s2, maxLength):
+    lo = 0
+    hi = maxLength
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if s1[len(s1) - mid:len(s1) - lo] == s2[len(s2) - mid:len(s2) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
 
 
 def characterGlyphMapping(clusters, numChars):
@@ -195,36 +476,39 @@ def characterGlyphMapping(clusters, numChars):
 
     "Each character belongs to the cluster that has the highest cluster
     value not larger than its initial cluster value.""
-    """
-
-    if clusters:
-        if clusters[-1] != 0:
-            assert clusters[0] == 0
-
-    clusterToChars = {}
-    charToCluster = {}
-    for cl, clNext in _pairs(sorted(set(clusters)), numChars):
-        chars = list(range(cl, clNext))
-        clusterToChars[cl] = chars
-        for char in chars:
-            charToCluster[char] = cl
 
-    glyphToChars = [clusterToChars[cl] for cl in clusters]
+    This returns lists of lists, see clusterMapping() for the underlying
+    array-based representation.
+    """
+    clusterStarts, clusterEnds, glyphClusters = clusterMapping(clusters, numChars)
 
-    charToGlyphs = defaultdict(list)
-    for glyphIndex, charIndices in enumerate(glyphToChars):
-        for ci in charIndices:
-            charToGlyphs[ci].append(glyphIndex)
+    glyphToChars = [list(range(start, end)) for start, end in zip(clusterStarts[glyphClusters].tolist(),
+                                                                   clusterEnds[glyphClusters].tolist())]
 
-    # assert sorted(charToGlyphs) == list(range(numChars)), charToGlyphs
-    charToGlyphs = [charToGlyphs[ci] for ci in sorted(charToGlyphs)]
+    # CSR-style: the glyph indices sorted by cluster, plus the offset of
+    # the first glyph of each cluster
+    glyphsByCluster = numpy.argsort(glyphClusters, kind="stable")
+    clusterOffsets = numpy.searchsorted(glyphClusters[glyphsByCluster], numpy.arange(len(clusterStarts) + 1))
+    clusterGlyphs = [glyphsByCluster[clusterOffsets[i]:clusterOffsets[i + 1]].tolist()
+                     for i in range(len(clusterStarts))]
+    charClusters = numpy.repeat(numpy.arange(len(clusterStarts)), clusterEnds - clusterStarts)
+    charToGlyphs = [clusterGlyphs[i] for i in charClusters.tolist()]
 
     return glyphToChars, charToGlyphs
 
 
-def _pairs(seq, sentinel):
-    it = itertools.chain(seq, (sentinel,))
-    prev = next(it)
-    for i in it:
-        yield prev, i
-        prev = i
+def clusterMapping(clusters, numChars):
+    """Return a (clusterStarts, clusterEnds, glyphClusters) tuple of arrays.
+    Cluster i covers the characters from clusterStarts[i] up to (but not
+    including) clusterEnds[i], and glyph j belongs to cluster glyphClusters[j].
+    """
+    clusters = numpy.asarray(clusters, numpy.int64)
+    if len(clusters):
+        if clusters[-1] != 0:
+            assert clusters[0] == 0
+    clusterStarts, glyphClusters = numpy.unique(clusters, return_inverse=True)
+    clusterEnds = numpy.empty_like(clusterStarts)
+    clusterEnds[:-1] = clusterStarts[1:]
+    if len(clusterEnds):
+        clusterEnds[-1] = numChars
+    return clusterStarts, clusterEnds, glyphClusters.reshape(-1)
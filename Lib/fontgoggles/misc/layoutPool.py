@@ -0,0 +1,156 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import os
+import sys
+import threading
+
+
+class LayoutPool:
+
+    """Lay out text with many fonts concurrently, using a pool of threads.
+
+    Most of the work happens in HarfBuzz and FreeType, on separate faces per
+    font. Fonts protect their own state with a lock, so the same font may
+    safely be passed multiple times.
+    """
+
+    def __init__(self, maxWorkers=None):
+        if maxWorkers is None:
+            maxWorkers = os.cpu_count() or 1
+        self.maxWorkers = maxWorkers
+        self.executor = concurrent.futures.ThreadPoolExecutor(maxWorkers,
+                                                              thread_name_prefix="fontgoggles_layout")
+        self._futures = set()
+
+    def close(self):
+        """Shut down the worker threads. Layout calls that haven't started yet
+        are cancelled.
+        """
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future in list(self._futures):
+            future.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def iterGlyphRuns(self, fonts, textInfo, *, features=None, varLocation=None,
+                            colorLayers=False, workerContext=None):
+        """Lay out `textInfo` with each of the `fonts`, and yield
+        (index, glyphs, output) tuples as soon as the results come in, `index`
+        being the index into `fonts`. `output` is what was written to stderr
+        during layout. Fonts that are None, or that are being reloaded (see
+        FontLoader.loadFont()), are skipped.
+
+        `workerContext` is an optional context manager factory, that will be
+        entered around each layout call in the worker thread. For example,
+        use objc.autorelease_pool on macOS.
+
+        When this async generator is closed early, for example because the
+        task that iterates over it got cancelled, the layout calls that
+        haven't started yet will be cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for index, font in enumerate(fonts):
+            if font is None or font.isReloading:
+                continue
+            executorFuture = self.executor.submit(_getGlyphRun, font, textInfo,
+                                                  dict(features=features, varLocation=varLocation,
+                                                       colorLayers=colorLayers),
+                                                  workerContext)
+            self._futures.add(executorFuture)
+            executorFuture.add_done_callback(self._futures.discard)
+            futures[asyncio.wrap_future(executorFuture, loop=loop)] = index
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in sorted(done, key=futures.get):
+                    glyphs, output = future.result()
+                    if glyphs is not None:
+                        yield futures[future], glyphs, output
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _getGlyphRun(font, textInfo, kwargs, workerContext):
+    output = io.StringIO()
+    with contextlib.ExitStack() as stack:
+        if workerContext is not None:
+            stack.enter_context(workerContext())
+        stack.enter_context(redirectThreadStderr(output))
+        with font.lock:
+            if font.isReloading:
+                # The reload started after this call was scheduled
+                return None, ""
+            glyphs = font.getGlyphRunFromTextInfo(textInfo, **kwargs)
+    return glyphs, output.getvalue()
+
+
+@contextlib.contextmanager
+def redirectThreadStderr(stream):
+    """Like contextlib.redirect_stderr(), but only for the current thread. The
+    former replaces sys.stderr, which affects all threads.
+
+    While any thread is redirecting its output, sys.stderr is replaced by a
+    stand-in that dispatches to the stream for the current thread. The
+    original sys.stderr is restored once the last redirection ends.
+    """
+    stderr = _installThreadLocalStderr()
+    previousStream = getattr(stderr.local, "stream", None)
+    stderr.local.stream = stream
+    try:
+        yield stream
+    finally:
+        stderr.local.stream = previousStream
+        _uninstallThreadLocalStderr()
+
+
+class _ThreadLocalStderr:
+
+    # Stand-in for sys.stderr, that writes to the stream that was set for
+    # the current thread, or else to the original sys.stderr.
+
+    def __init__(self, stderr):
+        self.stderr = stderr
+        self.local = threading.local()
+
+    def _getStream(self):
+        stream = getattr(self.local, "stream", None)
+        return self.stderr if stream is None else stream
+
+    def write(self, data):
+        return self._getStream().write(data)
+
+    def flush(self):
+        self._getStream().flush()
+
+    def __getattr__(self, attr):
+        return getattr(self.stderr, attr)
+
+
+_installLock = threading.Lock()
+_threadLocalStderr = None
+_numRedirections = 0
+
+
+def _installThreadLocalStderr():
+    global _threadLocalStderr, _numRedirections
+    with _installLock:
+        if _threadLocalStderr is None:
+            _threadLocalStderr = _ThreadLocalStderr(sys.stderr)
+            sys.stderr = _threadLocalStderr
+        _numRedirections += 1
+        return _threadLocalStderr
+
+
+def _uninstallThreadLocalStderr():
+    global _threadLocalStderr, _numRedirections
+    with _installLock:
+        _numRedirections -= 1
+        if _numRedirections == 0:
+            if sys.stderr is _threadLocalStderr:
+                # Don't clobber sys.stderr if someone else replaced it since
+                sys.stderr = _threadLocalStderr.stderr
+            _threadLocalStderr = None
@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+import itertools
+
+
+class LoadScheduler:
+
+    """Bound the number of fonts that are loaded concurrently, and determine
+    the order in which they get loaded.
+
+    Loading is split into stages that need different resources, and each
+    resource has its own concurrency limit:
+
+    - "io": opening and sniffing font files, done in worker threads
+    - "parse": parsing binary fonts in-process
+    - "compile": compiling sources in the compiler pool
+
+    Binary fonts are parsed on the event loop, so parsing is serial anyway:
+    its limiter orders the work by priority, and lets the event loop run
+    between fonts.
+
+    When a resource is busy, waiting fonts get it in order of priority: lower
+    values go first, and fonts with the same priority go in the order in which
+    they were requested. Priorities can be changed while fonts are waiting.
+
+        >>> scheduler = LoadScheduler(io=1)
+        >>> order = []
+        >>> async def load(key):
+        ...     async with scheduler.limit("io", key):
+        ...         order.append(key)
+        ...         await asyncio.sleep(0)
+        >>> async def main():
+        ...     scheduler.setPriorities({"c": -1})
+        ...     await asyncio.gather(load("a"), load("b"), load("c"))
+        >>> asyncio.run(main())
+        >>> order
+        ['a', 'c', 'b']
+    """
+
+    defaultLimits = dict(io=8, parse=1, compile=5)
+
+    def __init__(self, **limits):
+        limits = {**self.defaultLimits, **limits}
+        self._priorities = {}
+        sequence = itertools.count()
+        self._limiters = {resource: _PriorityLimiter(limit, self.getPriority, sequence)
+                          for resource, limit in limits.items()}
+
+    def getPriority(self, key):
+        return self._priorities.get(key, 0)
+
+    def setPriorities(self, priorities):
+        """Replace all priorities with the `priorities` dict, which maps keys
+        to numbers. Keys that are not in `priorities` get priority 0.
+        """
+        self._priorities = dict(priorities)
+
+    @contextlib.asynccontextmanager
+    async def limit(self, resource, key):
+        """Async context manager that waits until `resource` is available for
+        `key`, and holds on to it until the context ends.
+        """
+        limiter = self._limiters[resource]
+        await limiter.acquire(key)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def getNumWaiting(self, resource):
+        return len(self._limiters[resource].waiters)
+
+
+class _PriorityLimiter:
+
+    def __init__(self, limit, getPriority, sequence):
+        self.limit = limit
+        self.numActive = 0
+        self.waiters = []  # [(sequenceNumber, key, future), ...]
+        self._getPriority = getPriority
+        self._sequence = sequence
+
+    async def acquire(self, key):
+        if self.numActive < self.limit and not self.waiters:
+            self.numActive += 1
+            return
+        waiter = (next(self._sequence), key, asyncio.get_running_loop().create_future())
+        self.waiters.append(waiter)
+        future = waiter[2]
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were handed the resource, but got cancelled before we
+                # could use it: pass it on.
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            raise
+
+    def release(self):
+        # The resource is handed over directly to the waiter with the highest
+        # priority, so numActive only goes down if nobody is waiting.
+        self.numActive -= 1
+        while self.waiters and self.numActive < self.limit:
+            waiter = min(self.waiters, key=lambda waiter: (self._getPriority(waiter[1]), waiter[0]))
+            self.waiters.remove(waiter)
+            future = waiter[2]
+            if not future.done():
+                future.set_result(None)
+                self.numActive += 1
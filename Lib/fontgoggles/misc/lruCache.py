@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+
+    """A bounded mapping that discards the least recently used items once
+    it grows beyond `maxSize` items. It keeps count of cache hits and misses
+    for the get() method, so clients can see how effective the cache is.
+
+        >>> cache = LRUCache(2)
+        >>> cache["a"] = 1
+        >>> cache["b"] = 2
+        >>> cache.get("a")
+        1
+        >>> cache["c"] = 3  # "b" is now the least recently used item
+        >>> cache.get("b") is None
+        True
+        >>> sorted(cache.keys())
+        ['a', 'c']
+        >>> cache.hits, cache.misses
+        (1, 1)
+    """
+
+    def __init__(self, maxSize=1000):
+        self.maxSize = maxSize
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        items = self._items
+        items[key] = value
+        items.move_to_end(key)
+        while len(items) > self.maxSize:
+            items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        return self._items.keys()
+
+    def clear(self):
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,307 @@
+"""Export glyph runs of many fonts to SVG or PDF proof documents.
+
+The writers are streaming: each font is written as soon as it is added, so
+only the glyph runs of one font need to be in memory at a time. Each
+distinct glyph drawing is written once per font, as an SVG element in
+<defs> or a PDF form XObject, and is then referenced by position.
+
+    with PDFProofWriter("proof.pdf", fontSize=36) as writer:
+        for title, glyphsRuns in ...:
+            writer.addFont(title, glyphsRuns)
+"""
+
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+from fontTools.pens.basePen import BasePen
+from fontTools.pens.svgPathPen import SVGPathPen
+from .rasterizer import layoutGlyphsRuns
+
+
+def getProofWriterClass(path):
+    """Return the proof writer class for the file extension of `path`."""
+    suffix = str(path).rsplit(".", 1)[-1].lower()
+    writerClass = _proofWriterClasses.get(suffix)
+    if writerClass is None:
+        raise ValueError(f"unsupported proof format: '{suffix}'")
+    return writerClass
+
+
+class BaseProofWriter:
+
+    """Base class for the proof writers. Each font gets a title line, followed
+    by its glyph runs as lines below each other.
+    """
+
+    titleSize = 10
+
+    def __init__(self, path, fontSize=36, *, lineSpacing=1.2, margin=None, foreground=(0, 0, 0, 1)):
+        self.path = path
+        self.fontSize = fontSize
+        self.lineSpacing = lineSpacing
+        self.margin = fontSize / 2 if margin is None else margin
+        self.foreground = foreground
+        self.numFonts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def addFont(self, title, glyphsRuns):
+        """Write a font's glyph runs, under `title`."""
+        width, height, lines = layoutGlyphsRuns(glyphsRuns, self.fontSize, self.lineSpacing)
+        width = max(width, self.titleSize * len(title) * 0.6)
+        self._writeFont(title, width + 2 * self.margin, height + 2 * self.margin + 2 * self.titleSize,
+                        lines, self.margin, self.margin + 2 * self.titleSize)
+        self.numFonts += 1
+
+    def _writeFont(self, title, width, height, lines, offsetX, offsetY):
+        raise NotImplementedError()
+
+    def close(self):
+        raise NotImplementedError()
+
+
+class SVGProofWriter(BaseProofWriter):
+
+    """Write all fonts into a single SVG document, below each other. The
+    size of the document is only known at the end, so the root element is
+    rewritten when closing the file.
+    """
+
+    _rootElementSize = 256  # reserved, padded with spaces
+
+    def __init__(self, path, fontSize=36, **kwargs):
+        super().__init__(path, fontSize, **kwargs)
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._rootElementOffset = self._file.tell()
+        self._file.write(self._formatRootElement(0, 0) + "\n")
+        self._width = 0
+        self._height = 0
+
+    def _formatRootElement(self, width, height):
+        element = (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                   f'width="{_formatNumber(width)}" height="{_formatNumber(height)}" '
+                   f'viewBox="0 0 {_formatNumber(width)} {_formatNumber(height)}"')
+        assert len(element) < self._rootElementSize
+        return element + " " * (self._rootElementSize - len(element) - 1) + ">"
+
+    def _writeFont(self, title, width, height, lines, offsetX, offsetY):
+        write = self._file.write
+        fontIndex = self.numFonts
+        write(f'<g id="font{fontIndex}" transform="translate(0 {_formatNumber(self._height)})">\n')
+        write(f'<text x="{_formatNumber(offsetX)}" y="{_formatNumber(offsetY - self.titleSize)}" '
+              f'font-family="sans-serif" font-size="{self.titleSize}">{escape(title)}</text>\n')
+        glyphIDs = {}  # id(glyphDrawing) -> (element id, glyphDrawing)
+        write("<defs>\n")
+        for glyphsRun, scale, originX, originY in lines:
+            palette = glyphsRun.colorPalette
+            for glyphDrawing in glyphsRun.glyphDrawings:
+                if glyphDrawing is None or not glyphDrawing.layers or id(glyphDrawing) in glyphIDs:
+                    continue
+                elementID = f"font{fontIndex}_glyph{len(glyphIDs)}"
+                # Keep a reference to the glyph drawing, so its id remains valid
+                glyphIDs[id(glyphDrawing)] = elementID, glyphDrawing
+                write(f'<g id="{elementID}">')
+                for outline, colorID in glyphDrawing.layers:
+                    pen = SVGPathPen(None, _formatNumber)
+                    outline.draw(pen)
+                    write(f'<path{_svgFillAttributes(palette, colorID)} d="{pen.getCommands()}"/>')
+                write("</g>\n")
+        write("</defs>\n")
+        for glyphsRun, scale, originX, originY in lines:
+            write(f'<g fill="{_svgColor(self.foreground)}"{_svgOpacity(self.foreground)} '
+                  f'transform="translate({_formatNumber(originX + offsetX)} {_formatNumber(originY + offsetY)}) '
+                  f'scale({_formatNumber(scale)} {_formatNumber(-scale)})">\n')
+            for glyphDrawing, x, y in zip(glyphsRun.glyphDrawings, glyphsRun.posX.tolist(),
+                                          glyphsRun.posY.tolist()):
+                if glyphDrawing is None or id(glyphDrawing) not in glyphIDs:
+                    continue
+                elementID, _ = glyphIDs[id(glyphDrawing)]
+                write(f'<use xlink:href="#{elementID}" x="{x}" y="{y}"/>\n')
+            write("</g>\n")
+        write("</g>\n")
+        self._width = max(self._width, width)
+        self._height += height
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.write("</svg>\n")
+        self._file.seek(self._rootElementOffset)
+        self._file.write(self._formatRootElement(self._width, self._height))
+        self._file.close()
+        self._file = None
+
+
+class PDFProofWriter(BaseProofWriter):
+
+    """Write a multi-page PDF document, with a page per font. The objects are
+    written as they are made; the page tree and the cross-reference table are
+    written when closing the file.
+    """
+
+    def __init__(self, path, fontSize=36, **kwargs):
+        super().__init__(path, fontSize, **kwargs)
+        self._file = open(path, "wb")
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._objectOffsets = []
+        self._pageIDs = []
+        self._catalogID = self._reserveObject()
+        self._pagesID = self._reserveObject()
+        self._titleFontID = self._writeObject(
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    def _reserveObject(self):
+        self._objectOffsets.append(None)
+        return len(self._objectOffsets)
+
+    def _writeObject(self, data, objectID=None):
+        if objectID is None:
+            objectID = self._reserveObject()
+        self._objectOffsets[objectID - 1] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % objectID + data + b"\nendobj\n")
+        return objectID
+
+    def _writeStream(self, dictContents, data):
+        data = zlib.compress(data)
+        return self._writeObject(b"<< " + dictContents + b" /Filter /FlateDecode /Length %d >>\nstream\n" % len(data)
+                                 + data + b"\nendstream")
+
+    def _writeFont(self, title, width, height, lines, offsetX, offsetY):
+        xObjects = {}  # id(glyphDrawing) -> (name, objectID, glyphDrawing)
+        content = [b"BT /F1 %d Tf %s %s Td (%s) Tj ET" % (
+            self.titleSize, _pdfNumber(offsetX), _pdfNumber(height - offsetY + self.titleSize),
+            _pdfString(title))]
+        content.append(_pdfFillColor(self.foreground))
+        for glyphsRun, scale, originX, originY in lines:
+            content.append(b"q %s 0 0 %s %s %s cm" % (_pdfNumber(scale), _pdfNumber(scale),
+                                                      _pdfNumber(originX + offsetX),
+                                                      _pdfNumber(height - originY - offsetY)))
+            for glyphDrawing, x, y in zip(glyphsRun.glyphDrawings, glyphsRun.posX.tolist(),
+                                          glyphsRun.posY.tolist()):
+                if glyphDrawing is None or not glyphDrawing.layers:
+                    continue
+                entry = xObjects.get(id(glyphDrawing))
+                if entry is None:
+                    name = b"G%d" % len(xObjects)
+                    objectID = self._writeGlyph(glyphDrawing, glyphsRun.colorPalette)
+                    # Keep a reference to the glyph drawing, so its id remains valid
+                    entry = xObjects[id(glyphDrawing)] = name, objectID, glyphDrawing
+                content.append(b"q 1 0 0 1 %d %d cm /%s Do Q" % (x, y, entry[0]))
+            content.append(b"Q")
+        contentID = self._writeStream(b"", b"\n".join(content))
+        xObjectRefs = b" ".join(b"/%s %d 0 R" % (name, objectID) for name, objectID, _ in xObjects.values())
+        pageID = self._writeObject(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> /XObject << %s >> >> >>" % (
+                self._pagesID, _pdfNumber(width), _pdfNumber(height), contentID, self._titleFontID, xObjectRefs))
+        self._pageIDs.append(pageID)
+
+    def _writeGlyph(self, glyphDrawing, palette):
+        content = []
+        alphaStates = {}
+        for outline, colorID in glyphDrawing.layers:
+            if not len(outline.contours):
+                continue
+            content.append(b"q")
+            if colorID is not None and colorID < len(palette):
+                color = palette[colorID]
+                content.append(_pdfFillColor(color))
+                if color[3] < 1:
+                    stateName = alphaStates.setdefault(color[3], b"A%d" % len(alphaStates))
+                    content.append(b"/%s gs" % stateName)
+            pen = _PDFPathPen()
+            outline.draw(pen)
+            content.extend(pen.commands)
+            content.append(b"f Q")
+        xMin, yMin, xMax, yMax = glyphDrawing.bounds or (0, 0, 0, 0)
+        resources = b""
+        if alphaStates:
+            resources = b" /Resources << /ExtGState << %s >> >>" % b" ".join(
+                b"/%s << /ca %s >>" % (name, _pdfNumber(alpha)) for alpha, name in alphaStates.items())
+        return self._writeStream(b"/Type /XObject /Subtype /Form /BBox [%s %s %s %s]%s" % (
+            _pdfNumber(xMin), _pdfNumber(yMin), _pdfNumber(xMax), _pdfNumber(yMax), resources),
+            b"\n".join(content))
+
+    def close(self):
+        if self._file is None:
+            return
+        kids = b" ".join(b"%d 0 R" % pageID for pageID in self._pageIDs)
+        self._writeObject(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pageIDs)),
+                          self._pagesID)
+        self._writeObject(b"<< /Type /Catalog /Pages %d 0 R >>" % self._pagesID, self._catalogID)
+        xrefOffset = self._file.tell()
+        xref = [b"xref", b"0 %d" % (len(self._objectOffsets) + 1), b"0000000000 65535 f "]
+        xref.extend(b"%010d 00000 n " % offset for offset in self._objectOffsets)
+        self._file.write(b"\n".join(xref) + b"\n")
+        self._file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(self._objectOffsets) + 1, self._catalogID, xrefOffset))
+        self._file.close()
+        self._file = None
+
+
+_proofWriterClasses = {"svg": SVGProofWriter, "pdf": PDFProofWriter}
+
+
+class _PDFPathPen(BasePen):
+
+    # BasePen converts quadratic curves to cubic ones for us
+
+    def __init__(self):
+        super().__init__(None)
+        self.commands = []
+
+    def _moveTo(self, pt):
+        self.commands.append(b"%s %s m" % (_pdfNumber(pt[0]), _pdfNumber(pt[1])))
+
+    def _lineTo(self, pt):
+        self.commands.append(b"%s %s l" % (_pdfNumber(pt[0]), _pdfNumber(pt[1])))
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        self.commands.append(b" ".join(_pdfNumber(v) for v in (*pt1, *pt2, *pt3)) + b" c")
+
+    def _closePath(self):
+        self.commands.append(b"h")
+
+    def _endPath(self):
+        pass
+
+
+def _formatNumber(value):
+    value = round(value, 2)
+    if value == int(value):
+        return str(int(value))
+    return str(value)
+
+
+def _pdfNumber(value):
+    return _formatNumber(value).encode("ascii")
+
+
+def _pdfString(text):
+    data = text.encode("cp1252", "replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _pdfFillColor(color):
+    r, g, b, a = color
+    return b"%s %s %s rg" % (_pdfNumber(r), _pdfNumber(g), _pdfNumber(b))
+
+
+def _svgColor(color):
+    r, g, b, a = color
+    return "#%02x%02x%02x" % (round(r * 255), round(g * 255), round(b * 255))
+
+
+def _svgOpacity(color):
+    return f' fill-opacity="{_formatNumber(color[3])}"' if color[3] < 1 else ""
+
+
+def _svgFillAttributes(palette, colorID):
+    if colorID is None or colorID >= len(palette):
+        return ""  # the foreground color is inherited
+    color = palette[colorID]
+    return f" fill={quoteattr(_svgColor(color))}{_svgOpacity(color)}"
@@ -0,0 +1,285 @@
+"""A headless renderer for GlyphsRun objects, that doesn't need AppKit.
+
+Outlines are rasterized by a pure numpy scanline rasterizer: the outline is
+flattened into line segments (see ArrayOutline.flattenedEdges), which are
+intersected with a few sub-scanlines per pixel row. Coverage along each
+sub-scanline is exact, so the result is anti-aliased, using the non-zero
+winding rule.
+
+Images are (height, width, 4) uint8 RGBA arrays, that can be written to
+PNG files with writePNG().
+"""
+
+import math
+import struct
+import zlib
+import numpy
+from .lruCache import LRUCache
+
+
+def rasterizeEdges(edges, width, height, subSamples=4):
+    """Return a (height, width) float32 array with the coverage of the shape
+    described by `edges`, an (n, 4) array of (x0, y0, x1, y1) line segments
+    in pixel coordinates, y pointing down. Each pixel row is sampled by
+    `subSamples` sub-scanlines.
+    """
+    coverage = numpy.zeros((height, width), numpy.float32)
+    if not len(edges) or not width or not height:
+        return coverage
+    x0, y0, x1, y1 = numpy.asarray(edges, numpy.float64).T
+    notHorizontal = y0 != y1
+    x0, y0, x1, y1 = x0[notHorizontal], y0[notHorizontal], x1[notHorizontal], y1[notHorizontal]
+    direction = numpy.where(y1 > y0, 1, -1)
+    yMin = numpy.minimum(y0, y1) * subSamples - 0.5
+    yMax = numpy.maximum(y0, y1) * subSamples - 0.5
+    # The sub-scanlines that each edge crosses, half-open at the bottom
+    firstSample = numpy.clip(numpy.ceil(yMin), 0, height * subSamples).astype(numpy.intp)
+    endSample = numpy.clip(numpy.ceil(yMax), 0, height * subSamples).astype(numpy.intp)
+    counts = numpy.maximum(endSample - firstSample, 0)
+    numCrossings = counts.sum()
+    if not numCrossings:
+        return coverage
+
+    # One entry per (edge, sub-scanline) crossing
+    edgeIndices = numpy.repeat(numpy.arange(len(counts)), counts)
+    crossingStarts = numpy.cumsum(counts) - counts
+    samples = firstSample[edgeIndices] + numpy.arange(numCrossings) - crossingStarts[edgeIndices]
+    sampleY = (samples + 0.5) / subSamples
+    ex0, ey0, ex1, ey1 = x0[edgeIndices], y0[edgeIndices], x1[edgeIndices], y1[edgeIndices]
+    crossingX = ex0 + (sampleY - ey0) * (ex1 - ex0) / (ey1 - ey0)
+    crossingDirection = direction[edgeIndices]
+
+    # Sort the crossings by sub-scanline and x, and compute the winding
+    # number to the right of each crossing
+    order = numpy.lexsort((crossingX, samples))
+    samples = samples[order]
+    crossingX = crossingX[order]
+    crossingDirection = crossingDirection[order]
+    winding = numpy.cumsum(crossingDirection)
+    isRowStart = numpy.ones(numCrossings, bool)
+    isRowStart[1:] = samples[1:] != samples[:-1]
+    rowStartIndices = numpy.flatnonzero(isRowStart)
+    rowOffsets = (winding - crossingDirection)[rowStartIndices]
+    winding -= numpy.repeat(rowOffsets, numpy.diff(numpy.append(rowStartIndices, numCrossings)))
+    steps = (winding != 0).astype(numpy.int8) - (winding - crossingDirection != 0)
+    hasStep = steps != 0
+    steps = steps[hasStep].astype(numpy.float64)
+    rows = samples[hasStep] // subSamples
+    crossingX = numpy.clip(crossingX[hasStep], 0, width)
+
+    # Each step adds its coverage to the pixel it is in, and a full pixel to
+    # everything right of it: accumulate the differences, then integrate.
+    columns = numpy.floor(crossingX).astype(numpy.intp)
+    fraction = crossingX - columns
+    stride = width + 2
+    flatIndices = rows * stride + columns
+    weights = numpy.concatenate([steps * (1 - fraction), steps * fraction])
+    differences = numpy.bincount(numpy.concatenate([flatIndices, flatIndices + 1]), weights,
+                                 minlength=height * stride)
+    differences = differences[:height * stride].reshape(height, stride)
+    coverage = numpy.cumsum(differences, axis=1)[:, :width] / subSamples
+    return numpy.clip(coverage, 0, 1).astype(numpy.float32)
+
+
+def rasterizeOutline(outline, scale, offsetX=0, offsetY=0, subSamples=4):
+    """Rasterize an ArrayOutline. The outline is scaled by `scale`, its y
+    axis is flipped, and it is offset by (`offsetX`, `offsetY`) pixels.
+    Return a (coverage, left, top) tuple: the coverage array only covers the
+    outline's bounding box, (left, top) being the pixel position of its top
+    left corner. Return None if the outline is empty.
+    """
+    bounds = outline.bounds
+    if bounds is None:
+        return None
+    xMin, yMin, xMax, yMax = bounds
+    left = math.floor(xMin * scale + offsetX)
+    right = math.ceil(xMax * scale + offsetX)
+    top = math.floor(-yMax * scale + offsetY)
+    bottom = math.ceil(-yMin * scale + offsetY)
+    edges = outline.flattenedEdges * (scale, -scale, scale, -scale)
+    edges += (offsetX - left, offsetY - top, offsetX - left, offsetY - top)
+    return rasterizeEdges(edges, right - left, bottom - top, subSamples), left, top
+
+
+class GlyphsRunRenderer:
+
+    """Render GlyphsRun objects into RGBA images, including color layers.
+
+    The coverage masks of glyph layers are cached, so a glyph that occurs
+    many times is only rasterized once per size and subpixel position. The
+    cache is keyed by the glyph drawing object, so it relies on the font's
+    glyph drawing cache to hand out the same drawing for the same glyph at
+    the same variation location.
+
+    A renderer is not thread-safe: use one per thread.
+    """
+
+    def __init__(self, subSamples=4, subpixelPositions=4, maxCachedMasks=10000):
+        self.subSamples = subSamples
+        self.subpixelPositions = subpixelPositions
+        # The cached values keep the glyph drawings alive, so their ids remain valid
+        self._masks = LRUCache(maxCachedMasks)
+
+    def getLayerMasks(self, glyphDrawing, scale, phaseX, phaseY):
+        """Return a list of (coverage, left, top) tuples, or None values for
+        empty layers, one for each layer of `glyphDrawing`.
+        """
+        key = (id(glyphDrawing), scale, phaseX, phaseY)
+        cached = self._masks.get(key)
+        if cached is None:
+            offsetX = phaseX / self.subpixelPositions
+            offsetY = phaseY / self.subpixelPositions
+            layerMasks = [rasterizeOutline(outline, scale, offsetX, offsetY, self.subSamples)
+                          for outline, colorID in glyphDrawing.layers]
+            cached = (glyphDrawing, layerMasks)
+            self._masks[key] = cached
+        return cached[1]
+
+    def drawGlyphsRun(self, image, glyphsRun, scale, originX, originY, foreground=(0, 0, 0, 1)):
+        """Draw `glyphsRun` into `image`, a premultiplied (height, width, 4)
+        float array as returned by newImage(). The origin of the run is at
+        pixel position (`originX`, `originY`), the y axis pointing down.
+        """
+        palette = [_premultiply(color) for color in glyphsRun.colorPalette]
+        foreground = _premultiply(foreground)
+        quantum = self.subpixelPositions
+        glyphX = (glyphsRun.posX * scale + originX).tolist()
+        glyphY = (-glyphsRun.posY * scale + originY).tolist()
+        for glyphDrawing, x, y in zip(glyphsRun.glyphDrawings, glyphX, glyphY):
+            if glyphDrawing is None or not glyphDrawing.layers:
+                continue
+            x = round(x * quantum)
+            y = round(y * quantum)
+            layerMasks = self.getLayerMasks(glyphDrawing, scale, x % quantum, y % quantum)
+            for (outline, colorID), layerMask in zip(glyphDrawing.layers, layerMasks):
+                if layerMask is None:
+                    continue
+                coverage, left, top = layerMask
+                if colorID is not None and colorID < len(palette):
+                    color = palette[colorID]
+                else:
+                    color = foreground
+                _compositeMask(image, coverage, x // quantum + left, y // quantum + top, color)
+
+    def renderGlyphsRun(self, glyphsRun, fontSize, *, margin=0, foreground=(0, 0, 0, 1),
+                        background=(1, 1, 1, 1)):
+        """Render `glyphsRun` at `fontSize` pixels per em, into an image that
+        is large enough for the ink and the advances, plus `margin` pixels.
+        """
+        return self.renderGlyphsRuns([glyphsRun], fontSize, margin=margin, foreground=foreground,
+                                     background=background)
+
+    def renderGlyphsRuns(self, glyphsRuns, fontSize, *, lineSpacing=1.2, margin=0,
+                         foreground=(0, 0, 0, 1), background=(1, 1, 1, 1)):
+        """Render horizontal glyph runs as lines below each other, the
+        baselines `lineSpacing` em apart. Return an RGBA image.
+        """
+        width, height, lines = layoutGlyphsRuns(glyphsRuns, fontSize, lineSpacing)
+        image = newImage(width + 2 * margin, height + 2 * margin, background)
+        for glyphsRun, scale, originX, originY in lines:
+            self.drawGlyphsRun(image, glyphsRun, scale, originX + margin, originY + margin, foreground)
+        return toRGBA(image)
+
+
+def layoutGlyphsRuns(glyphsRuns, fontSize, lineSpacing=1.2):
+    """Lay out horizontal glyph runs as lines below each other, at `fontSize`
+    units per em, the baselines `lineSpacing` em apart. Return a
+    (width, height, lines) tuple, `lines` being a list of
+    (glyphsRun, scale, originX, originY) tuples. The origins are relative to
+    the top left corner, the y axis pointing down. The width and the height
+    are rounded up to whole units.
+    """
+    lineDistance = lineSpacing * fontSize
+    left = top = math.inf
+    right = bottom = -math.inf
+    lines = []
+    for lineIndex, glyphsRun in enumerate(glyphsRuns):
+        scale = fontSize / glyphsRun.unitsPerEm
+        xMin, yMin, xMax, yMax = getGlyphsRunBounds(glyphsRun)
+        baseline = lineIndex * lineDistance
+        left = min(left, math.floor(xMin * scale))
+        right = max(right, math.ceil(xMax * scale))
+        top = min(top, math.floor(baseline - yMax * scale))
+        bottom = max(bottom, math.ceil(baseline - yMin * scale))
+        lines.append((glyphsRun, scale, baseline))
+    if not lines:
+        return 0, 0, []
+    return right - left, bottom - top, [(glyphsRun, scale, -left, baseline - top)
+                                        for glyphsRun, scale, baseline in lines]
+
+
+def getGlyphsRunBounds(glyphsRun):
+    """Return the union of the ink bounds of the run and its advance box, as
+    an (xMin, yMin, xMax, yMax) tuple in font units. The advance box goes from
+    the origin to the end position, and vertically from a quarter em below
+    the baseline to one em above it.
+    """
+    unitsPerEm = glyphsRun.unitsPerEm
+    endX, endY = glyphsRun.endPos
+    xMin, yMin, xMax, yMax = min(0, endX), min(-0.25 * unitsPerEm, endY), max(0, endX), unitsPerEm
+    for glyphDrawing, x, y in zip(glyphsRun.glyphDrawings, glyphsRun.posX.tolist(), glyphsRun.posY.tolist()):
+        if glyphDrawing is None or glyphDrawing.bounds is None:
+            continue
+        gxMin, gyMin, gxMax, gyMax = glyphDrawing.bounds
+        xMin, yMin = min(xMin, x + gxMin), min(yMin, y + gyMin)
+        xMax, yMax = max(xMax, x + gxMax), max(yMax, y + gyMax)
+    return xMin, yMin, xMax, yMax
+
+
+def newImage(width, height, background=(1, 1, 1, 1)):
+    """Return a premultiplied float32 image filled with `background`."""
+    image = numpy.empty((height, width, 4), numpy.float32)
+    image[:] = _premultiply(background)
+    return image
+
+
+def toRGBA(image):
+    """Convert a premultiplied float image to a straight alpha uint8 image."""
+    alpha = image[..., 3:]
+    rgb = numpy.divide(image[..., :3], alpha, out=numpy.zeros_like(image[..., :3]), where=alpha > 0)
+    rgba = numpy.concatenate([rgb, alpha], axis=2)
+    return numpy.round(numpy.clip(rgba, 0, 1) * 255).astype(numpy.uint8)
+
+
+def writePNG(image, file):
+    """Write a (height, width, 4) uint8 RGBA image as a PNG file. `file` is
+    a path or a binary file object.
+    """
+    height, width, numChannels = image.shape
+    assert numChannels == 4 and image.dtype == numpy.uint8
+    # Filter type 0 (None) for each row
+    rows = numpy.concatenate([numpy.zeros((height, 1), numpy.uint8), image.reshape(height, width * 4)], axis=1)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    data = b"\x89PNG\r\n\x1a\n"
+    data += _pngChunk(b"IHDR", header)
+    data += _pngChunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+    data += _pngChunk(b"IEND", b"")
+    if hasattr(file, "write"):
+        file.write(data)
+    else:
+        with open(file, "wb") as f:
+            f.write(data)
+
+
+def _pngChunk(chunkType, data):
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data))
+
+
+def _premultiply(color):
+    r, g, b, a = color
+    return numpy.array([r * a, g * a, b * a, a], numpy.float32)
+
+
+def _compositeMask(image, coverage, left, top, color):
+    # Composite `color` over `image`, through `coverage`, clipping at the
+    # image boundaries.
+    height, width = image.shape[:2]
+    maskHeight, maskWidth = coverage.shape
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + maskWidth, width), min(top + maskHeight, height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    coverage = coverage[y0 - top:y1 - top, x0 - left:x1 - left, None]
+    region = image[y0:y1, x0:x1]
+    region *= 1 - coverage * color[3]
+    region += coverage * color
@@ -1,6 +1,8 @@
-import itertools
-from fontTools.unicodedata import script
+import functools
+import numpy
 from unicodedata2 import category
+from .bidiLevels import getBiDiLevels
+from .unicodeProperties import codePointsFromText, getScriptTable
 
 # Monkeypatch bidi to use unicodedata2
 import unicodedata2
@@ -19,75 +21,81 @@ UNKNOWN_SCRIPT = {"Zinh", "Zyyy", "Zxxx"}
 
 
 def textSegments(txt):
-    scripts = detectScript(txt)
-    storage = getBiDiInfo(txt)
+    scripts = _detectScriptIndices(txt, getScriptTable())
+    levels, baseLevel = getBiDiLevels(txt)
 
-    levels = [None] * len(txt)
-    for ch in storage['chars']:
-        levels[ch['index']] = ch['level']
+    isRunStart = numpy.ones(len(txt), dtype=bool)
+    isRunStart[1:] = (scripts[1:] != scripts[:-1]) | (levels[1:] != levels[:-1])
+    runStarts = numpy.flatnonzero(isRunStart).tolist()
+    runEnds = runStarts[1:] + [len(txt)]
+    scriptValues = _getScriptValues()
 
-    prevLevel = storage['base_level']
-    for i, level in enumerate(levels):
-        if level is None:
-            levels[i] = prevLevel
-        else:
-            prevLevel = level
+    segments = []
+    for index, nextIndex in zip(runStarts, runEnds):
+        segments.append((txt[index:nextIndex], scriptValues[scripts[index]], int(levels[index]), index))
+    return segments, baseLevel
 
-    chars = list(zip(txt, scripts, levels))
 
-    runLenghts = []
-    for value, sub in itertools.groupby(chars, key=lambda item: item[1:]):
-        runLenghts.append(len(list(sub)))
+def detectScript(txt):
+    scriptTable = getScriptTable()
+    return _getScriptValues()[_detectScriptIndices(txt, scriptTable)].tolist()
 
-    segments = []
-    index = 0
-    for rl in runLenghts:
-        nextIndex = index + rl
-        segment = chars[index:nextIndex]
-        runChars = "".join(ch for ch, script, bidiLevel in segment)
-        _, script, bidiLevel = segment[0]
-        segments.append((runChars, script, bidiLevel, index))
-        index = nextIndex
-    return segments, storage['base_level']
 
+def _detectScriptIndices(txt, scriptTable):
+    # Returns an array with an index into the _getScriptValues() array for
+    # each character of txt.
+    codePoints = codePointsFromText(txt)
+    charScript = scriptTable.lookupIndices(codePoints)
+    unknown = numpy.isin(charScript, [scriptTable.valueIndex(scr) for scr in UNKNOWN_SCRIPT])
 
-def detectScript(txt):
-    charScript = [script(c) for c in txt]
-
-    for i, ch in enumerate(txt):
-        scr = charScript[i]
-        if scr in UNKNOWN_SCRIPT:
-            if i:
-                scr = charScript[i-1]
-            else:
-                scr = None
-            cat = category(ch)
-            if ch in MIRRORED and cat == "Pe":
-                scr = None
-        charScript[i] = scr
+    # Unknowns take the script of the preceding character, except for
+    # closing brackets, which should get the script of the _next_ character
+    closingBracket = unknown & numpy.isin(codePoints, _getMirroredClosingPunctuation())
+    charScript = numpy.where(unknown, -1, charScript)
+    indices = _fillForward(~unknown | closingBracket)
+    charScript = numpy.where(indices >= 0, charScript[indices], -1)
 
     # Any unknowns should be mapped to the _next_ script
-    prev = None
-    for i in range(len(txt) - 1, -1, -1):
-        if charScript[i] is None:
-            charScript[i] = prev
-        else:
-            prev = charScript[i]
+    indices = _fillBackward(charScript >= 0)
+    charScript = numpy.where(indices >= 0, charScript[indices], -1)
 
     # There may be unknowns at the end of the string, fall back to
     # preceding script
-    prev = "Zxxx"  # last resort
-    for i in range(len(txt)):
-        if charScript[i] is None:
-            charScript[i] = prev
-        else:
-            prev = charScript[i]
+    indices = _fillForward(charScript >= 0)
+    lastResort = len(scriptTable.values)  # "Zxxx", see _getScriptValues()
+    charScript = numpy.where(indices >= 0, charScript[indices], lastResort)
 
-    assert None not in charScript
+    assert (charScript >= 0).all()
 
     return charScript
 
 
+def _fillForward(valid):
+    # For each position, return the index of the nearest valid position at or
+    # before it, or -1 if there is none.
+    indices = numpy.where(valid, numpy.arange(len(valid)), -1)
+    return numpy.maximum.accumulate(indices) if len(indices) else indices
+
+
+def _fillBackward(valid):
+    # For each position, return the index of the nearest valid position at or
+    # after it, or -1 if there is none.
+    indices = _fillForward(valid[::-1])[::-1]
+    return numpy.where(indices >= 0, len(valid) - 1 - indices, -1)
+
+
+@functools.lru_cache(maxsize=None)
+def _getScriptValues():
+    # The script table values, plus our last resort value
+    return numpy.array(getScriptTable().values + ["Zxxx"], dtype=object)
+
+
+@functools.lru_cache(maxsize=None)
+def _getMirroredClosingPunctuation():
+    return numpy.array(sorted(ord(ch) for ch in MIRRORED if category(ch) == "Pe"),
+                       dtype=numpy.uint32)
+
+
 # copied from bidi/algorthm.py and modified to be more useful for us.
 
 def getBiDiInfo(text, *, upper_is_rtl=False, base_dir=None, debug=False):
@@ -1,4 +1,6 @@
 import itertools
+import numpy
+from .properties import cachedProperty
 from .segmenting import textSegments
 
 
@@ -14,6 +16,19 @@ class TextInfo:
         self.scriptOverride = None
         self.languageOverride = None
 
+    @classmethod
+    def fromTextSettings(cls, text, textSettings):
+        """Create a TextInfo object for `text`, configured with the BiDi,
+        direction, script and language options from a
+        fontgoggles.project.TextSettings object.
+        """
+        self = cls(text)
+        self.shouldApplyBiDi = textSettings.shouldApplyBiDi
+        self.directionOverride = textSettings.direction
+        self.scriptOverride = textSettings.script
+        self.languageOverride = textSettings.language
+        return self
+
     @property
     def text(self):
         return self._text
@@ -22,26 +37,35 @@ class TextInfo:
     def text(self, text):
         self._text = text
         self._segments, self.baseLevel = textSegments(text)
-        self.reorderedSegments = self._getReorderedSegments()
-
-        toBiDi = {}
-        fromBiDi = {}
-        afterIndex = 0
+        del self.reorderedSegments
+        del self._fromBiDi
+        del self._toBiDi
+
+    @cachedProperty
+    def reorderedSegments(self):
+        return self._getReorderedSegments()
+
+    @cachedProperty
+    def _fromBiDi(self):
+        # Permutation array: maps BiDi-ordered char indices to original
+        # char indices
+        charIndices = []
         for segmentText, segmentScript, segmentBiDiLevel, firstCluster in self.reorderedSegments:
-            charIndices = [beforeIndex
-                           for beforeIndex in range(firstCluster, firstCluster + len(segmentText))]
+            segmentIndices = numpy.arange(firstCluster, firstCluster + len(segmentText), dtype=numpy.int32)
             if segmentBiDiLevel % 2:
-                charIndices = reversed(charIndices)
-
-            for beforeIndex in charIndices:
-                toBiDi[beforeIndex] = afterIndex
-                fromBiDi[afterIndex] = beforeIndex
-                afterIndex += 1
-
-        assert len(toBiDi) == len(text)
-        assert len(fromBiDi) == len(text)
-        self._toBiDi = toBiDi
-        self._fromBiDi = fromBiDi
+                segmentIndices = segmentIndices[::-1]
+            charIndices.append(segmentIndices)
+        fromBiDi = numpy.concatenate(charIndices) if charIndices else numpy.zeros(0, dtype=numpy.int32)
+        assert len(fromBiDi) == len(self._text)
+        return fromBiDi
+
+    @cachedProperty
+    def _toBiDi(self):
+        # The inverse permutation of _fromBiDi
+        fromBiDi = self._fromBiDi
+        toBiDi = numpy.empty_like(fromBiDi)
+        toBiDi[fromBiDi] = numpy.arange(len(fromBiDi), dtype=numpy.int32)
+        return toBiDi
 
     @property
     def segments(self):
@@ -64,12 +88,10 @@ class TextInfo:
         return segments
 
     def mapToBiDi(self, charIndices):
-        toBiDi = self._toBiDi
-        return [toBiDi[charIndex] for charIndex in charIndices]
+        return _mapCharIndices(self._toBiDi, charIndices)
 
     def mapFromBiDi(self, charIndices):
-        fromBiDi = self._fromBiDi
-        return [fromBiDi[charIndex] for charIndex in charIndices]
+        return _mapCharIndices(self._fromBiDi, charIndices)
 
     @property
     def baseDirection(self):
@@ -86,3 +108,10 @@ class TextInfo:
     def suggestedAlignment(self):
         alignments = dict(LTR="left", RTL="right", TTB="top", BTT="bottom")
         return alignments[self.direction]
+
+
+def _mapCharIndices(permutation, charIndices):
+    charIndices = numpy.asarray(list(charIndices), dtype=numpy.intp)
+    if len(charIndices) and (charIndices.min() < 0 or charIndices.max() >= len(permutation)):
+        raise IndexError("character index out of range")
+    return permutation[charIndices].tolist()
@@ -0,0 +1,119 @@
+"""Compact range tables for Unicode character properties, for looking up
+the properties of all characters of a string at once.
+
+The tables are built on first use: the script table comes straight from
+fontTools.unicodedata, the others are built by scanning all code points
+with unicodedata2 once.
+"""
+
+import bisect
+import functools
+import numpy
+import unicodedata2
+from fontTools.unicodedata import Scripts
+
+
+MAX_CODE_POINT = 0x10FFFF
+
+
+class RangeTable:
+
+    """Maps code points to property values. `starts` is a sorted array of
+    code points at which a new range starts, `valueIndices` holds for each
+    range the index into `values`.
+    """
+
+    def __init__(self, starts, valueIndices, values):
+        assert len(starts) == len(valueIndices)
+        assert starts[0] == 0
+        self.starts = numpy.asarray(starts, dtype=numpy.uint32)
+        self.valueIndices = numpy.asarray(valueIndices, dtype=numpy.int32)
+        self.values = list(values)
+        self._valuesArray = numpy.array(self.values, dtype=object)
+
+    @classmethod
+    def fromRanges(cls, starts, values):
+        """Build a table from a list of range starts and a list with the
+        value for each range.
+        """
+        valueToIndex = {}
+        valueIndices = [valueToIndex.setdefault(value, len(valueToIndex)) for value in values]
+        return cls(starts, valueIndices, valueToIndex)
+
+    @classmethod
+    def fromFunction(cls, func):
+        """Build a table by calling `func` with each character."""
+        valueToIndex = {}
+        indices = numpy.fromiter(
+            (valueToIndex.setdefault(value, len(valueToIndex))
+             for value in map(func, map(chr, range(MAX_CODE_POINT + 1)))),
+            dtype=numpy.int32, count=MAX_CODE_POINT + 1)
+        starts = numpy.concatenate([[0], numpy.flatnonzero(numpy.diff(indices)) + 1])
+        return cls(starts, indices[starts], valueToIndex)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, codePoint):
+        rangeIndex = bisect.bisect_right(self.starts, codePoint) - 1
+        return self.values[self.valueIndices[rangeIndex]]
+
+    def valueIndex(self, value):
+        """Return the index of `value`, or -1 if the table doesn't contain it."""
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return -1
+
+    def lookupIndices(self, codePoints):
+        """Return an array with the value index for each of the `codePoints`."""
+        rangeIndices = numpy.searchsorted(self.starts, codePoints, side="right") - 1
+        return self.valueIndices[rangeIndices]
+
+    def lookup(self, codePoints):
+        """Return a list with the value for each of the `codePoints`."""
+        return self.indicesToValues(self.lookupIndices(codePoints))
+
+    def indicesToValues(self, valueIndices):
+        return self._valuesArray[valueIndices].tolist()
+
+
+def codePointsFromText(text):
+    """Return a uint32 array with the code points of `text`."""
+    return numpy.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=numpy.uint32)
+
+
+@functools.lru_cache(maxsize=None)
+def getScriptTable():
+    return RangeTable.fromRanges(Scripts.RANGES, Scripts.VALUES)
+
+
+@functools.lru_cache(maxsize=None)
+def getCategoryTable():
+    return RangeTable.fromFunction(unicodedata2.category)
+
+
+@functools.lru_cache(maxsize=None)
+def getBidiClassTable():
+    return RangeTable.fromFunction(unicodedata2.bidirectional)
+
+
+@functools.lru_cache(maxsize=None)
+def getMirroredTable():
+    return RangeTable.fromFunction(unicodedata2.mirrored)
+
+
+def scripts(text):
+    return getScriptTable().lookup(codePointsFromText(text))
+
+
+def categories(text):
+    return getCategoryTable().lookup(codePointsFromText(text))
+
+
+def bidiClasses(text):
+    return getBidiClassTable().lookup(codePointsFromText(text))
+
+
+def mirrored(text):
+    return getMirroredTable().lookup(codePointsFromText(text))
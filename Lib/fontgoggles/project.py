@@ -1,12 +1,19 @@
 import asyncio
+from collections import defaultdict
+import concurrent.futures
 from dataclasses import dataclass, field
 import json
 from os import PathLike
 import os
 import pathlib
 import sys
+import threading
 import typing
 from .font import getOpener
+from .misc.loadScheduler import LoadScheduler
+from .misc.proofExport import getProofWriterClass
+from .misc.rasterizer import GlyphsRunRenderer
+from .misc.textInfo import TextInfo
 
 
 class Project:
@@ -73,12 +80,139 @@ class Project:
         return FontItemInfo(fontItemIdentifier, fontKey, self._fontLoader)
 
     async def loadFonts(self, outputWriter=None):
-        """Load fonts as concurrently as possible."""
+        """Load fonts concurrently, within the limits of the load scheduler.
+        Fonts are loaded in the order of self.fonts, except for the ones passed
+        to self.prioritizeFonts().
+        """
         if outputWriter is None:
             outputWriter = sys.stderr.write
         await asyncio.gather(*(fontItemInfo.load(outputWriter)
                                for fontItemInfo in self.fonts if fontItemInfo.font is None))
 
+    def prioritizeFonts(self, fontItemInfos):
+        """Load the fonts for `fontItemInfos` first, in the given order, before
+        any other fonts that are waiting to be loaded. This may be called while
+        fonts are loading, for example when the visible fonts change. It
+        replaces the priorities set by previous calls.
+        """
+        fontKeys = list(dict.fromkeys(fontItemInfo.fontKey for fontItemInfo in fontItemInfos))
+        self._fontLoader.scheduler.setPriorities(
+            {fontKey: index - len(fontKeys) for index, fontKey in enumerate(fontKeys)})
+
+    async def shapeLines(self, consumer, lines=None, *, maxWorkers=None, outputWriter=None):
+        """Shape many lines of text with all fonts of the project, using
+        self.textSettings. If `lines` is None, the lines of the text file
+        self.textSettings.textFilePath will be used.
+
+        For each font and each line, `consumer(fontItemInfo, lineIndex, glyphs)`
+        is called, `glyphs` being a GlyphsRun without glyph drawings (see
+        BaseFont.shapeLines()). Nothing is accumulated, so this scales to large
+        text corpora.
+
+        The lines are segmented only once, and the segmentation is shared by
+        all fonts. The fonts are shaped concurrently by up to `maxWorkers`
+        worker threads. A font is only ever used by one thread, so `consumer`
+        is called from that thread, in line order per font.
+
+        Fonts that are not yet loaded will be loaded first.
+        """
+        textInfos = self._getTextInfos(lines)
+        await self.loadFonts(outputWriter)
+
+        def shapeFont(fontItemInfos):
+            font = fontItemInfos[0].font
+            for lineIndex, glyphs in enumerate(font.shapeLines(textInfos, self.textSettings)):
+                for fontItemInfo in fontItemInfos:
+                    consumer(fontItemInfo, lineIndex, glyphs)
+
+        loop = asyncio.get_running_loop()
+        with concurrent.futures.ThreadPoolExecutor(maxWorkers) as executor:
+            await asyncio.gather(*(loop.run_in_executor(executor, shapeFont, fontItemInfos)
+                                   for fontItemInfos in self._groupLoadedFontItems()))
+
+    async def renderImages(self, consumer, lines=None, *, fontSize=36, maxWorkers=None, outputWriter=None,
+                           **renderOptions):
+        """Render many lines of text with all fonts of the project, using
+        self.textSettings, into an RGBA image per font, with the lines below
+        each other (see GlyphsRunRenderer.renderGlyphsRuns()). This doesn't
+        need AppKit. If `lines` is None, the lines of the text file
+        self.textSettings.textFilePath will be used.
+
+        For each font, `consumer(fontItemInfo, image)` is called, from the
+        worker thread that rendered the image. Images are not accumulated, so
+        this scales to large projects. Extra keyword arguments are passed on
+        to the renderer.
+        """
+        textInfos = self._getTextInfos(lines)
+        await self.loadFonts(outputWriter)
+
+        def renderFont(fontItemInfos):
+            font = fontItemInfos[0].font
+            renderer = GlyphsRunRenderer()
+            glyphsRuns = self._getGlyphRuns(font, textInfos)
+            image = renderer.renderGlyphsRuns(glyphsRuns, fontSize, **renderOptions)
+            for fontItemInfo in fontItemInfos:
+                consumer(fontItemInfo, image)
+
+        loop = asyncio.get_running_loop()
+        with concurrent.futures.ThreadPoolExecutor(maxWorkers) as executor:
+            await asyncio.gather(*(loop.run_in_executor(executor, renderFont, fontItemInfos)
+                                   for fontItemInfos in self._groupLoadedFontItems()))
+
+    def _getTextInfos(self, lines):
+        # Return a TextInfo for each of `lines`, or for each line of the text
+        # file if `lines` is None
+        if lines is None:
+            with open(self.textSettings.textFilePath, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        return [TextInfo.fromTextSettings(line, self.textSettings) for line in lines]
+
+    def _groupLoadedFontItems(self):
+        # The same font may occur multiple times in the project, so we only
+        # need to do the work once: return a list of fontItemInfo lists, one
+        # per loaded font.
+        fontItemInfosByKey = defaultdict(list)
+        for fontItemInfo in self.fonts:
+            if fontItemInfo.font is not None:
+                fontItemInfosByKey[fontItemInfo.fontKey].append(fontItemInfo)
+        return list(fontItemInfosByKey.values())
+
+    def _getGlyphRuns(self, font, textInfos):
+        # Lay out each of `textInfos` with `font`, using self.textSettings
+        textSettings = self.textSettings
+        return [font.getGlyphRunFromTextInfo(textInfo, features=textSettings.features,
+                                             varLocation=textSettings.varLocation,
+                                             colorLayers=textSettings.enableColor)
+                for textInfo in textInfos]
+
+    async def exportProof(self, path, lines=None, *, fontSize=36, outputWriter=None, **writerOptions):
+        """Write a proof document of many lines of text, rendered with all
+        fonts of the project, using self.textSettings. The format (SVG or PDF)
+        follows from the file extension of `path`. If `lines` is None, the
+        lines of the text file self.textSettings.textFilePath will be used.
+
+        The fonts are laid out and written one at a time. Fonts that were not
+        loaded are unloaded again after they are written, so memory use
+        doesn't grow with the number of fonts.
+        """
+        writerClass = getProofWriterClass(path)
+        textInfos = self._getTextInfos(lines)
+
+        loop = asyncio.get_running_loop()
+        with writerClass(path, fontSize, **writerOptions) as writer:
+            for fontItemInfo in self.fonts:
+                wasLoaded = fontItemInfo.font is not None
+                if not wasLoaded:
+                    await fontItemInfo.load(outputWriter)
+                glyphsRuns = await loop.run_in_executor(None, self._getGlyphRuns,
+                                                        fontItemInfo.font, textInfos)
+                fontPath, fontNumber = fontItemInfo.fontKey
+                title = fontPath.name if not fontNumber else f"{fontPath.name}#{fontNumber}"
+                writer.addFont(title, glyphsRuns)
+                del glyphsRuns
+                if not wasLoaded:
+                    fontItemInfo.unload()
+
     def _nextFontItemIdentifier(self):
         return next(self._fontItemIdentifierGenerator)
 
@@ -147,15 +281,32 @@ class FontLoader:
     def __init__(self):
         self.fonts = {}
         self.wantsReload = set()
+        # fontPath -> (file signature, font data), shared by the fonts of a
+        # TTC file. Entries are dropped once no loaded font uses the file.
         self.cachedFontData = {}
+        self._cachedFontDataLock = threading.Lock()
+        self.scheduler = LoadScheduler()
 
     def getData(self, fontPath):
         assert isinstance(fontPath, os.PathLike)
-        fontData = self.cachedFontData.get(fontPath)
-        if fontData is None:
-            with open(fontPath, "rb") as f:
-                fontData = f.read()
-            self.cachedFontData[fontPath] = fontData
+        signature = _getFileSignature(fontPath)
+        with self._cachedFontDataLock:  # fonts are opened from worker threads
+            cached = self.cachedFontData.get(fontPath)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        # We read the file rather than memory-mapping it: the file may be
+        # rewritten in place by whatever tool produced it, and a truncated
+        # mapping would crash us the next time it's read from. Files are read
+        # outside the lock, so they can be read concurrently. Fonts from the
+        # same file that are opened at the same time may each read it, but
+        # the first result is shared from then on.
+        with open(fontPath, "rb") as f:
+            fontData = f.read()
+        with self._cachedFontDataLock:
+            cached = self.cachedFontData.get(fontPath)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            self.cachedFontData[fontPath] = signature, fontData
         return fontData
 
     async def loadFont(self, fontKey, outputWriter):
@@ -163,31 +314,64 @@ class FontLoader:
         if font is not None:
             if fontKey in self.wantsReload:
                 self.wantsReload.remove(fontKey)
-                await font.load(outputWriter)
+                async with self.scheduler.limit(font.loadResource, fontKey):
+                    # The font is reloaded in place, so it must not be used
+                    # by layout threads in the meantime. Taking the lock
+                    # waits for a layout call that is in progress, but we
+                    # don't hold on to it: the reload may take a while.
+                    with font.lock:
+                        font.isReloading = True
+                    try:
+                        await font.load(outputWriter)
+                    finally:
+                        font.isReloading = False
         else:
-            path, fontNumber = fontKey
-            numFonts, opener, getSortInfo = getOpener(path)
-            assert fontNumber < numFonts(path)
-            font = opener(path, fontNumber, self)
-            await font.load(outputWriter)
+            async with self.scheduler.limit("io", fontKey):
+                loop = asyncio.get_running_loop()
+                font = await loop.run_in_executor(None, self._openFont, fontKey)
+            async with self.scheduler.limit(font.loadResource, fontKey):
+                await font.load(outputWriter)
             self.fonts[fontKey] = font
 
+    def _openFont(self, fontKey):
+        path, fontNumber = fontKey
+        numFonts, opener, getSortInfo = getOpener(path)
+        assert fontNumber < numFonts(path)
+        return opener(path, fontNumber, self)
+
     def unloadFont(self, fontKey):
         self.fonts.pop(fontKey, None)  # discard
-        self.cachedFontData = {}
+        self._purgeFontData()
 
     def purgeFonts(self, usedKeys):
         self.fonts = {fontKey: fontObject for fontKey, fontObject in self.fonts.items()
                       if fontKey in usedKeys}
-        self.cachedFontData = {}
+        self._purgeFontData()
+
+    def _purgeFontData(self):
+        usedPaths = {fontPath for fontPath, fontNumber in self.fonts}
+        with self._cachedFontDataLock:
+            for fontPath in list(self.cachedFontData):
+                if fontPath not in usedPaths:
+                    del self.cachedFontData[fontPath]
 
     def updateFontKey(self, oldFontKey, newFontKey):
+        oldFontPath, newFontPath = oldFontKey[0], newFontKey[0]
+        with self._cachedFontDataLock:
+            cached = self.cachedFontData.pop(oldFontPath, None)
+            if cached is not None:
+                self.cachedFontData[newFontPath] = cached
         if oldFontKey not in self.fonts:
             # Font was not loaded, nothing to rename
             return
         self.fonts[newFontKey] = self.fonts.pop(oldFontKey)
 
 
+def _getFileSignature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
 @dataclass
 class TextSettings:
     # Content settings
@@ -0,0 +1,45 @@
+"""Compare the speed of fontgoggles.misc.bidiLevels with python-bidi's
+pure Python implementation, for long right-to-left paragraphs.
+
+    python Scripts/benchmarkBiDi.py [numChars]
+"""
+
+import random
+import sys
+import timeit
+from fontgoggles.misc.bidiLevels import getBiDiLevels
+from fontgoggles.misc.segmenting import getBiDiInfo
+
+
+samples = {
+    "Arabic": "السلام عليكم (123) ١٢٣, abc. ",
+    "Hebrew": "שלום עולם (123) 4.5% abc, אבג. ",
+}
+
+
+def makeParagraph(sample, numChars):
+    words = sample.split(" ")
+    rnd = random.Random(numChars)
+    paragraph = []
+    length = 0
+    while length < numChars:
+        word = rnd.choice(words)
+        paragraph.append(word)
+        length += len(word) + 1
+    return " ".join(paragraph)[:numChars]
+
+
+def main(numChars=10000, repeat=5):
+    for name, sample in samples.items():
+        paragraph = makeParagraph(sample, numChars)
+        levels, baseLevel = getBiDiLevels(paragraph)
+        storage = getBiDiInfo(paragraph)
+        assert levels.tolist() == [ch["level"] for ch in sorted(storage["chars"], key=lambda ch: ch["index"])]
+        oldTime = min(timeit.repeat(lambda: getBiDiInfo(paragraph), number=1, repeat=repeat))
+        newTime = min(timeit.repeat(lambda: getBiDiLevels(paragraph), number=1, repeat=repeat))
+        print(f"{name}, {numChars} characters: python-bidi {oldTime * 1000:.1f} ms, "
+              f"bidiLevels {newTime * 1000:.1f} ms, {oldTime / newTime:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
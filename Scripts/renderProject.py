@@ -0,0 +1,43 @@
+"""Render the text of a FontGoggles project with each of its fonts, and write
+a PNG file per font. This doesn't need AppKit, so it runs on any platform.
+
+    python Scripts/renderProject.py project.gggls outputFolder [fontSize]
+
+The lines are taken from the project's text file if it has one, otherwise
+from its text setting.
+"""
+
+import asyncio
+import os
+import pathlib
+import sys
+from fontgoggles.misc.rasterizer import writePNG
+from fontgoggles.project import Project
+
+
+async def renderProject(projectPath, outputFolder, fontSize):
+    projectPath = pathlib.Path(projectPath)
+    project = Project.fromJSON(projectPath.read_bytes(), projectPath.parent)
+    lines = None
+    if project.textSettings.textFilePath is None:
+        lines = project.textSettings.text.splitlines()
+    outputFolder = pathlib.Path(outputFolder)
+    outputFolder.mkdir(parents=True, exist_ok=True)
+
+    def writeImage(fontItemInfo, image):
+        fontPath, fontNumber = fontItemInfo.fontKey
+        fileName = f"{fontItemInfo.identifier}_{fontPath.stem}"
+        if fontNumber:
+            fileName += f"#{fontNumber}"
+        writePNG(image, os.fspath(outputFolder / (fileName + ".png")))
+
+    await project.renderImages(writeImage, lines, fontSize=fontSize, margin=round(fontSize / 4))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) not in (2, 3):
+        print(__doc__)
+        sys.exit(1)
+    fontSize = float(args[2]) if len(args) == 3 else 48
+    asyncio.run(renderProject(args[0], args[1], fontSize))
@@ -0,0 +1,11 @@
+import pytest
+from fontgoggles.misc import diskCache
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _diskCacheFolder(tmp_path_factory):
+    # Keep the persistent caches out of the user's cache folder
+    mp = pytest.MonkeyPatch()
+    mp.setenv(diskCache.cacheFolderEnvironmentVariable, str(tmp_path_factory.mktemp("cache")))
+    yield
+    mp.undo()
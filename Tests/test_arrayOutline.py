@@ -0,0 +1,126 @@
+import pytest
+from fontTools.pens.boundsPen import ControlBoundsPen
+from fontTools.pens.pointInsidePen import PointInsidePen
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.ttLib import TTFont
+from fontgoggles.font import getOpener
+from fontgoggles.misc.arrayOutline import ArrayOutline
+from fontgoggles.misc.ftFont import FTFont
+from testSupport import getFontPath
+
+
+def _getFonts(fileName):
+    p = getFontPath(fileName)
+    ttf = TTFont(p, lazy=True)
+    return FTFont.fromPath(p), ttf.getGlyphSet()
+
+
+@pytest.mark.parametrize("fileName", ["IBMPlexSans-Regular.ttf", "IBMPlexSans-Regular.otf"])
+def test_ftOutline(fileName):
+    ftf, ttfGlyphSet = _getFonts(fileName)
+    for glyphName in ["a", "B", "O", "period", "bar", "aring", "space"]:
+        outline = ftf.getOutline(glyphName)
+        refPen = RecordingPen()
+        ttfGlyphSet[glyphName].draw(refPen)
+        pen = RecordingPen()
+        outline.draw(pen)
+        if glyphName != "aring":  # composite glyph
+            assert pen.value == refPen.value
+        boundsPen = ControlBoundsPen(ttfGlyphSet)
+        ttfGlyphSet[glyphName].draw(boundsPen)
+        assert outline.bounds == boundsPen.bounds
+
+
+@pytest.mark.parametrize("fileName", ["IBMPlexSans-Regular.ttf", "IBMPlexSans-Regular.otf"])
+def test_pointInside(fileName):
+    ftf, ttfGlyphSet = _getFonts(fileName)
+    for glyphName in ["a", "B", "O", "period", "aring"]:
+        outline = ftf.getOutline(glyphName)
+        xMin, yMin, xMax, yMax = outline.bounds
+        numPoints = numMismatches = 0
+        for x in range(int(xMin) - 10, int(xMax) + 10, 19):
+            for y in range(int(yMin) - 10, int(yMax) + 10, 19):
+                refPen = PointInsidePen(ttfGlyphSet, (x, y))
+                ttfGlyphSet[glyphName].draw(refPen)
+                numPoints += 1
+                numMismatches += refPen.getResult() != outline.pointInside((x, y))
+        # Curves are approximated by lines, so points very close to a curve
+        # may be classified differently
+        assert numMismatches / numPoints < 0.01
+
+
+def test_pointInside_polygon():
+    square = ArrayOutline([(0, 0), (0, 100), (100, 100), (100, 0),
+                           (25, 25), (75, 25), (75, 75), (25, 75)], [1] * 8, [3, 7])
+    assert square.bounds == (0, 0, 100, 100)
+    assert square.pointInside((10, 50))
+    assert not square.pointInside((50, 50))  # opposite direction: a hole
+    assert not square.pointInside((150, 50))
+    empty = ArrayOutline([], [], [])
+    assert empty.bounds is None
+    assert not empty.pointInside((0, 0))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fileName", ["IBMPlexSans-Regular.ttf", "MutatorSansBoldWideMutated.ufo",
+                                      "MutatorSans.designspace"])
+async def test_glyphDrawingBounds(fileName):
+    fontPath = getFontPath(fileName)
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    glyphs = font.getGlyphRun("ABO")
+    for glyphDrawing in glyphs.glyphDrawings:
+        outline, colorID = glyphDrawing.layers[0]
+        assert isinstance(outline, ArrayOutline)
+        boundsPen = ControlBoundsPen(None)
+        outline.draw(boundsPen)
+        assert glyphDrawing.bounds == boundsPen.bounds
+        xMin, yMin, xMax, yMax = glyphDrawing.bounds
+        assert not glyphDrawing.pointInside((xMin - 1, yMin - 1))
+
+
+@pytest.mark.parametrize("fileName", ["IBMPlexSans-Regular.ttf", "IBMPlexSans-Regular.otf"])
+def test_extractOutlines(fileName):
+    ftf, ttfGlyphSet = _getFonts(fileName)
+    glyphNames = ["a", "B", "space", "O", "period", "bar", "a"]
+    glyphIDs = [ftf._ttFont.getGlyphID(glyphName) for glyphName in glyphNames]
+    packed = ftf.extractOutlines(glyphIDs)
+    assert len(packed) == len(glyphNames)
+    assert packed.pointOffsets[-1] == len(packed.points) == len(packed.tags)
+    assert packed.contourOffsets[-1] == len(packed.contours)
+    for index, glyphName in enumerate(glyphNames):
+        outline = packed.getOutline(index)
+        expectedOutline = ftf.getOutline(glyphName)
+        assert outline.points.tolist() == expectedOutline.points.tolist()
+        assert outline.tags.tolist() == expectedOutline.tags.tolist()
+        assert outline.contours.tolist() == expectedOutline.contours.tolist()
+        refPen = RecordingPen()
+        ttfGlyphSet[glyphName].draw(refPen)
+        pen = RecordingPen()
+        packed.draw(index, pen)
+        assert pen.value == refPen.value
+
+
+def test_extractOutlines_allGlyphs():
+    ftf, ttfGlyphSet = _getFonts("IBMPlexSans-Regular.ttf")
+    packed = ftf.extractOutlines()
+    assert len(packed) == len(ttfGlyphSet)
+    assert len(ftf.extractOutlines([])) == 0
+
+
+@pytest.mark.asyncio
+async def test_glyphDrawingsFromPackedOutlines():
+    fontPath = getFontPath("IBMPlexSans-Regular.otf")
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    glyphs = font.getGlyphRun("Abc ABC")
+    # The outlines were loaded in one go
+    assert sorted(font._preparedOutlines) == ["A", "B", "C", "b", "c", "space"]
+    for glyphName, glyphDrawing in zip(glyphs.glyphNames, glyphs.glyphDrawings):
+        [(outline, colorID)] = glyphDrawing.layers
+        expectedOutline = font.ftFont.getOutline(glyphName)
+        assert outline.points.tolist() == expectedOutline.points.tolist()
+        assert outline.tags.tolist() == expectedOutline.tags.tolist()
+        assert outline.contours.tolist() == expectedOutline.contours.tolist()
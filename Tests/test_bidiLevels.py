@@ -0,0 +1,57 @@
+import random
+import pytest
+from fontgoggles.misc.bidiLevels import getBiDiLevels
+from fontgoggles.misc.segmenting import getBiDiInfo
+
+
+def _referenceLevels(text, baseDir=None):
+    storage = getBiDiInfo(text, base_dir=baseDir)
+    levels = [None] * len(text)
+    for ch in storage["chars"]:
+        levels[ch["index"]] = ch["level"]
+    previousLevel = storage["base_level"]
+    for i, level in enumerate(levels):
+        if level is None:
+            levels[i] = previousLevel
+        else:
+            previousLevel = level
+    return levels, storage["base_level"]
+
+
+testStrings = [
+    "",
+    "Abc",
+    "حتى",
+    "حتى12",
+    "abc אבג 123 def",
+    "אב (abc) 12.5% ג",
+    "ال 1,234.5 $100 ١٢٣ a",
+    "a‫א b‬ c",
+    "א‭abc‬‪‮123‬‬ ב",
+    "abć א́\tב \nג a  ",
+    "‫" * 70 + "a" + "‬" * 70 + "א",
+]
+
+
+@pytest.mark.parametrize("text", testStrings)
+@pytest.mark.parametrize("baseDir", [None, "L", "R"])
+def test_getBiDiLevels(text, baseDir):
+    levels, baseLevel = getBiDiLevels(text, None if baseDir is None else "LR".index(baseDir))
+    assert (levels.tolist(), baseLevel) == _referenceLevels(text, baseDir)
+
+
+def test_getBiDiLevels_random():
+    characters = ("abc 123+-$%#.,:/()\t\n ​ً́٠١۱٫٬"
+                  "الאב‪‫‬‭‮­؀‎‏؜−°")
+    rnd = random.Random(0)
+    for i in range(500):
+        text = "".join(rnd.choice(characters) for j in range(rnd.randrange(30)))
+        levels, baseLevel = getBiDiLevels(text)
+        assert (levels.tolist(), baseLevel) == _referenceLevels(text)
+
+
+def test_getBiDiLevels_unhandledByPythonBiDi():
+    # Unassigned characters count as L, isolate controls as neutrals
+    levels, baseLevel = getBiDiLevels("א ͸ ⁧ב⁩")
+    assert baseLevel == 1
+    assert levels.tolist() == [1, 1, 2, 1, 1, 1, 1]
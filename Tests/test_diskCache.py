@@ -0,0 +1,62 @@
+import os
+import pathlib
+import pytest
+from fontTools.ttLib import TTFont
+from fontgoggles.font.otfFont import OTFFont
+from fontgoggles.misc.diskCache import DiskCache, getDiskCache, hashData
+from testSupport import getFontPath
+
+
+def test_diskCache(tmpdir):
+    cache = DiskCache(pathlib.Path(tmpdir / "cache"), 250)
+    assert cache.getPath("a") is None
+    assert cache.read("a") is None
+    for i, key in enumerate("abc"):
+        path = cache.write(key, key.encode("ascii") * 100)
+        assert path.read_bytes() == key.encode("ascii") * 100
+        os.utime(path, (i, i))  # make the order of use unambiguous
+    # The cache is too big for three items, so "a" was evicted
+    assert cache.getPath("a") is None
+    assert cache.read("b") == b"b" * 100
+    os.utime(cache.getPath("b"), (10, 10))
+    # A new item evicts the least recently used item: "c"
+    cache.write("d", b"d" * 100)
+    assert sorted(p.name for p in cache.folder.iterdir()) == ["b", "d"]
+    assert (cache.hits, cache.misses) == (2, 3)
+    # An item larger than the cache replaces everything else
+    cache.write("e", b"e" * 500)
+    assert sorted(p.name for p in cache.folder.iterdir()) == ["e"]
+    cache.clear()
+    assert list(cache.folder.iterdir()) == []
+
+
+def test_hashData():
+    assert hashData(b"abc", b"def") == hashData(b"abcdef")
+    assert hashData(b"abc") != hashData(b"abd")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("flavor", ["woff", "woff2"])
+async def test_woffCache(tmpdir, flavor):
+    woffPath = pathlib.Path(tmpdir / f"IBMPlexSans-Regular.{flavor}")
+    ttFont = TTFont(getFontPath("IBMPlexSans-Regular.ttf"))
+    ttFont.flavor = flavor
+    ttFont.save(woffPath)
+    sfntCache = getDiskCache("sfnt", OTFFont.sfntCacheMaxSize)
+    hits, misses = sfntCache.hits, sfntCache.misses
+
+    glyphRuns = []
+    for i in range(2):
+        font = OTFFont(woffPath, 0)
+        await font.load(None)
+        glyphRuns.append(font.getGlyphRun("Abc"))
+    assert (sfntCache.hits - hits, sfntCache.misses - misses) == (1, 1)
+    # The second time around, the font is read from the cache
+    assert font.ttFont.flavor is None
+    font.ttFont.reader.file.seek(0)
+    assert font.ttFont.reader.file.read(4) == b"\0\1\0\0"
+    assert [g.name for g in glyphRuns[0]] == [g.name for g in glyphRuns[1]] == ["A", "b", "c"]
+    assert glyphRuns[0].endPos == glyphRuns[1].endPos
+    referenceFont = OTFFont(getFontPath("IBMPlexSans-Regular.ttf"), 0)
+    await referenceFont.load(None)
+    assert font.ftFont.getOutline("b").points.tolist() == referenceFont.ftFont.getOutline("b").points.tolist()
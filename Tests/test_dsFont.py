@@ -1,7 +1,15 @@
-import pytest
+import pathlib
+import shutil
 import sys
+import numpy
+import pytest
+from fontTools.pens.recordingPen import RecordingPointPen
+from fontTools.pens.transformPen import TransformPointPen
 from fontTools.ufoLib import UFOReader
-from fontgoggles.font.dsFont import DSFont, PointCollector
+from fontTools.ufoLib.glifLib import Glyph
+from fontgoggles.compile.compileCache import dsCacheMaxSize, ufoCacheMaxSize
+from fontgoggles.font.dsFont import DSFont, PointCollector, SubModelCache
+from fontgoggles.misc.diskCache import getDiskCache
 from testSupport import getFontPath
 
 
@@ -58,6 +66,9 @@ async def test_DSFont():
         'MutatorSansLightWide.ufo',
     ]
     assert expected == [p.name for p in font.getExternalFiles()]
+    # Shaping does not need the outlines
+    font.shaper.shape("ABC")
+    assert font._varGlyphs == {}
     run = font.getGlyphRun("ABC")
     ax = [gi.ax for gi in run]
     assert [396, 443, 499] == ax
@@ -73,3 +84,162 @@ async def test_DSFont():
     assert run[0].ay == -900
     assert run[0].dx == -370
     assert run[0].dy == -700
+
+
+@pytest.mark.asyncio
+async def test_interpolateVarGlyphs():
+    ufoPath = getFontPath("MutatorSans.designspace")
+    font = DSFont(ufoPath, 0)
+    await font.load(sys.stderr.write)
+    glyphNames = ["A", "Aacute", "B", "O", "S", "acute", "space"]
+    varLocation = {"wght": 300, "wdth": 700}
+    font.setVarLocation(varLocation)
+    expected = [font._getVarGlyph(glyphName).getPoints() for glyphName in glyphNames]
+
+    font.resetCache()
+    font.setVarLocation(varLocation)
+    font._prepareGlyphDrawings(glyphNames, False)
+    varGlyphs = [font._getVarGlyph(glyphName) for glyphName in glyphNames]
+    assert not any(varGlyph.needsInterpolation for varGlyph in varGlyphs)
+    for varGlyph, points in zip(varGlyphs, expected):
+        assert numpy.allclose(varGlyph.getPoints(), points)
+    assert len(font._stackedDeltas) == 1
+
+    # A new location reuses the stacked deltas
+    font.setVarLocation({"wght": 700, "wdth": 300})
+    font._prepareGlyphDrawings(glyphNames, False)
+    assert font._stackedDeltas.hits == 1
+    assert not any(varGlyph.needsInterpolation for varGlyph in varGlyphs)
+
+
+@pytest.mark.asyncio
+async def test_subModelCache():
+    ufoPath = getFontPath("MutatorSans.designspace")
+    font = DSFont(ufoPath, 0)
+    await font.load(sys.stderr.write)
+    # MutatorSans has sparse masters: "B" and "S" have intermediate layers
+    glyphA = font._getVarGlyph("A")
+    assert font._getVarGlyph("C").model is glyphA.model
+    assert font._getVarGlyphMetrics("O").model is glyphA.model
+    assert font._getVarGlyph("B").model is not glyphA.model
+    assert len(font._subModels) == 2
+
+    subModels = SubModelCache(font.masterModel)
+    numMasters = len(font.doc.sources)
+    sparse = [1] * (numMasters - 1) + [None]
+    subModel, items = subModels.getSubModel(sparse)
+    assert items == [1] * (numMasters - 1)
+    assert subModels.getSubModel(list(sparse))[0] is subModel
+    assert subModels.getSubModel([2] * numMasters)[0] is not subModel
+    assert len(subModels) == 2
+
+    location = {"wght": 0.25}
+    scalars = subModel.getScalars(location)
+    assert scalars == subModel.model.getScalars(location)
+    assert subModel.getScalars(dict(location)) is scalars
+
+
+@pytest.mark.asyncio
+async def test_invalidateComposites(tmpdir):
+    dsPath = pathlib.Path(shutil.copytree(getFontPath("MutatorSans.designspace").parent, tmpdir / "MutatorSans"))
+    font = DSFont(dsPath / "MutatorSans.designspace", 0)
+    await font.load(sys.stderr.write)
+    run = font.getGlyphRun("AÁB")
+    assert run.glyphNames == ["A", "Aacute", "B"]
+    assert font._glyphDependants["acute"] == {"Aacute"}
+    drawingB = run.glyphDrawings[2]
+    boundsAacute = run.glyphDrawings[1].bounds
+
+    ufoPath = pathlib.Path(font.doc.default.path)
+    glyphSet = font._ufos[(str(ufoPath), None)].glyphSet
+    glyph = Glyph("acute", None)
+    ppen = RecordingPointPen()
+    glyphSet.readGlyph("acute", glyph, ppen)
+    glyphSet.writeGlyph("acute", glyph,
+                        lambda pen: ppen.replay(TransformPointPen(pen, (1, 0, 0, 1, 0, 100))))
+
+    assert font.canReloadWithChange(ufoPath)
+    await font.load(sys.stderr.write)
+    assert set(font._varGlyphs) == {"A", "B"}
+    run = font.getGlyphRun("AÁB")
+    assert run.glyphDrawings[2] is drawingB
+    xMin, yMin, xMax, yMax = run.glyphDrawings[1].bounds
+    assert yMax == boundsAacute[3] + 100
+
+
+@pytest.mark.asyncio
+async def test_invalidateMixedComposites(tmpdir):
+    dsPath = pathlib.Path(shutil.copytree(getFontPath("MutatorSans.designspace").parent, tmpdir / "MutatorSans"))
+    # Make Aacute a mix of a component and an outline, by decomposing the
+    # acute component in all masters
+    for ufoPath in sorted(dsPath.glob("*.ufo")):
+        glyphSet = UFOReader(ufoPath, validate=False).getGlyphSet()
+        if "Aacute" not in glyphSet:
+            continue
+        glyph = Glyph("Aacute", None)
+        ppen = RecordingPointPen()
+        glyphSet.readGlyph("Aacute", glyph, ppen)
+        acutePen = RecordingPointPen()
+        glyphSet.readGlyph("acute", None, acutePen)
+
+        def drawAacute(pen):
+            for method, args, kwargs in ppen.value:
+                if method == "addComponent" and args[0] == "acute":
+                    acutePen.replay(TransformPointPen(pen, args[1]))
+                else:
+                    getattr(pen, method)(*args, **kwargs)
+
+        glyphSet.writeGlyph("Aacute", glyph, drawAacute)
+
+    font = DSFont(dsPath / "MutatorSans.designspace", 0)
+    await font.load(sys.stderr.write)
+    run = font.getGlyphRun("Á")
+    assert run.glyphNames == ["Aacute"]
+    assert font._glyphDependants["A"] == {"Aacute"}
+    assert "Aacute" not in font._glyphDependants["acute"]
+    boundsAacute = run.glyphDrawings[0].bounds
+
+    ufoPath = pathlib.Path(font.doc.default.path)
+    glyphSet = font._ufos[(str(ufoPath), None)].glyphSet
+    glyph = Glyph("A", None)
+    ppen = RecordingPointPen()
+    glyphSet.readGlyph("A", glyph, ppen)
+    glyphSet.writeGlyph("A", glyph,
+                        lambda pen: ppen.replay(TransformPointPen(pen, (1, 0, 0, 1, 0, -300))))
+
+    assert font.canReloadWithChange(ufoPath)
+    await font.load(sys.stderr.write)
+    assert "Aacute" not in font._varGlyphs
+    run = font.getGlyphRun("Á")
+    xMin, yMin, xMax, yMax = run.glyphDrawings[0].bounds
+    assert yMin == boundsAacute[1] - 300
+    assert yMax == boundsAacute[3]
+
+
+@pytest.mark.asyncio
+async def test_compileCache(tmpdir):
+    dsFolder = pathlib.Path(shutil.copytree(getFontPath("MutatorSans.designspace").parent, tmpdir / "MutatorSans"))
+    dsPath = dsFolder / "MutatorSans.designspace"
+    ufoCache = getDiskCache("ufo", ufoCacheMaxSize)
+    dsCache = getDiskCache("designspace", dsCacheMaxSize)
+
+    async def loadFont():
+        ufoMisses, dsHits, dsMisses = ufoCache.misses, dsCache.hits, dsCache.misses
+        font = DSFont(dsPath, 0)
+        await font.load(sys.stderr.write)
+        return font, (ufoCache.misses - ufoMisses, dsCache.hits - dsHits, dsCache.misses - dsMisses)
+
+    font1, stats = await loadFont()
+    # Nothing changed: both the masters and the variable font come from the cache
+    font2, stats = await loadFont()
+    assert stats == (0, 2, 0)
+    assert font2.masterModel.supports == font1.masterModel.supports
+    font2.setVarLocation({"wdth": 500, "wght": 500})
+    font1.setVarLocation({"wdth": 500, "wght": 500})
+    assert font2.getGlyphRun("ABC").endPos == font1.getGlyphRun("ABC").endPos
+    # A changed designspace document causes the variable font to be rebuilt,
+    # but the masters are still cached
+    dsPath.write_text(dsPath.read_text() + "<!-- changed -->\n")
+    font3, stats = await loadFont()
+    assert stats == (0, 0, 2)
+    assert font3.masterModel.supports == font1.masterModel.supports
@@ -1,6 +1,11 @@
+import pathlib
+import shutil
 import pytest
+from fontTools.pens.recordingPen import RecordingPointPen
+from fontTools.ufoLib.glifLib import Glyph
 from fontgoggles.font import getOpener, sniffFontType, sortedFontPathsAndNumbers
 from fontgoggles.misc.textInfo import TextInfo
+from fontgoggles.project import TextSettings
 from testSupport import getFontPath, testDataFolder
 
 
@@ -300,3 +305,156 @@ async def test_verticalGlyphMetricsFromUFO():
     assert expectedAY == ay
     assert expectedDX == dx
     assert expectedDY == dy
+
+
+@pytest.mark.asyncio
+async def test_shapeCache():
+    fontPath = getFontPath('IBMPlexSansArabic-Regular.ttf')
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    textInfo = TextInfo("abc حتى")
+    glyphs1 = font.getGlyphRunFromTextInfo(textInfo)
+    assert (font.shapeCache.hits, font.shapeCache.misses) == (0, 2)
+    glyphs2 = font.getGlyphRunFromTextInfo(textInfo)
+    assert (font.shapeCache.hits, font.shapeCache.misses) == (2, 2)
+    assert [(g.name, g.cluster, g.pos) for g in glyphs1] == [(g.name, g.cluster, g.pos) for g in glyphs2]
+    glyphs3 = font.getGlyphRunFromTextInfo(textInfo, features=dict(liga=False))
+    assert (font.shapeCache.hits, font.shapeCache.misses) == (2, 4)
+    assert [g.name for g in glyphs3] == [g.name for g in glyphs1]
+
+
+@pytest.mark.asyncio
+async def test_shapeLines():
+    fontPath = getFontPath('IBMPlexSansArabic-Regular.ttf')
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    lines = ["abc حتى", "", "fit"]
+    runs = list(font.shapeLines(lines, TextSettings()))
+    assert len(runs) == 3
+    assert len(runs[1]) == 0
+    assert len(font.shapeCache) == 0
+    for line, glyphs in zip(lines, runs):
+        expected = font.getGlyphRunFromTextInfo(TextInfo(line))
+        assert glyphs.glyphNames == expected.glyphNames
+        assert glyphs.clusters.tolist() == expected.clusters.tolist()
+        assert glyphs.endPos == expected.endPos
+        assert glyphs.glyphDrawings == [None] * len(glyphs)
+
+
+@pytest.mark.asyncio
+async def test_glyphMetricsReload(tmpdir):
+    ufoPath = pathlib.Path(shutil.copytree(getFontPath("MutatorSansBoldWideMutated.ufo"), tmpdir / "test.ufo"))
+    numFonts, opener, getSortInfo = getOpener(ufoPath)
+    font = opener(ufoPath, 0)
+    await font.load(None)
+    glyphs = font.getGlyphRun("AB")
+    advances = [g.ax for g in glyphs]
+    assert advances == [1290, 1270]
+    # Shaping does not need the outlines
+    font.shaper.shape("ABC")
+    assert set(font._cachedGlyphs) == {(None, "A"), (None, "B")}
+
+    glyph = Glyph("B", None)
+    ppen = RecordingPointPen()
+    font.glyphSet.readGlyph("B", glyph, ppen)
+    glyph.width = 1000
+    font.glyphSet.writeGlyph("B", glyph, ppen.replay)
+
+    assert font.canReloadWithChange(None)
+    await font.load(None)
+    glyphs = font.getGlyphRun("AB")
+    assert [g.ax for g in glyphs] == [1290, 1000]
+
+
+@pytest.mark.asyncio
+async def test_incrementalShaping():
+    fontPath = getFontPath('IBMPlexSansArabic-Regular.ttf')
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    referenceFont = opener(fontPath, 0)
+    await referenceFont.load(None)
+    text = "office Wave AVATAR " * 10 + "حتى بيت سلام " * 10
+    for i in range(10):
+        text = text[:100] + "fi" + text[100:-50] + "ب " + text[-50:]
+        glyphs = font.getGlyphRunFromTextInfo(TextInfo(text))
+        referenceFont.resetCache()
+        expected = referenceFont.getGlyphRunFromTextInfo(TextInfo(text))
+        assert glyphs.glyphNames == expected.glyphNames
+        assert glyphs.clusters.tolist() == expected.clusters.tolist()
+        assert glyphs.posX.tolist() == expected.posX.tolist()
+        assert glyphs.posY.tolist() == expected.posY.tolist()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fileName", ["MutatorSans.ttf", "MutatorSans.designspace"])
+async def test_glyphDrawingCacheLocations(fileName):
+    fontPath = getFontPath(fileName)
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    glyphsLight = font.getGlyphRun("ABC", varLocation={"wght": 0})
+    glyphsBold = font.getGlyphRun("ABC", varLocation={"wght": 1000})
+    assert glyphsLight.glyphDrawings[0].bounds != glyphsBold.glyphDrawings[0].bounds
+    # Going back to a previous location reuses its drawings
+    glyphs = font.getGlyphRun("ABC", varLocation={"wght": 0})
+    assert all(a is b for a, b in zip(glyphs.glyphDrawings, glyphsLight.glyphDrawings))
+    glyphs = font.getGlyphRun("ABC", varLocation={"wght": 1000.001})  # quantized to the same location
+    assert all(a is b for a, b in zip(glyphs.glyphDrawings, glyphsBold.glyphDrawings))
+    assert len(font._glyphDrawings) == 2
+
+    for i in range(font.glyphDrawingCacheLocations + 2):
+        font.getGlyphRun("ABC", varLocation={"wght": 100 + i})
+    assert len(font._glyphDrawings) == font.glyphDrawingCacheLocations
+    glyphs = font.getGlyphRun("ABC", varLocation={"wght": 0})
+    assert all(a is not b for a, b in zip(glyphs.glyphDrawings, glyphsLight.glyphDrawings))
+    # Any iterable of glyph names will do
+    glyphDrawings = list(font.getGlyphDrawings(glyphName for glyphName in ["A", "B", "C"]))
+    assert glyphDrawings == glyphs.glyphDrawings
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fileName", ["MutatorSans.ttf", "MutatorSans.designspace"])
+async def test_getGlyphRunsForLocations(fileName):
+    fontPath = getFontPath(fileName)
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    referenceFont = opener(fontPath, 0)
+    await referenceFont.load(None)
+    textInfo = TextInfo("ÁBS ABC")
+    font.setVarLocation({"wght": 300})
+    varLocations = [{"wght": wght, "wdth": wdth} for wght in range(0, 1001, 250) for wdth in range(0, 1001, 500)]
+    glyphsRuns = font.getGlyphRunsForLocations(textInfo, varLocations)
+    # The font is back at its previous location
+    assert font._currentVarLocation == {"wght": 300}
+    expected = referenceFont.getGlyphRun("A", varLocation={"wght": 300})
+    [glyphDrawing] = font.getGlyphDrawings(["A"])
+    assert glyphDrawing.bounds == pytest.approx(expected.glyphDrawings[0].bounds)
+    assert len(glyphsRuns) == len(varLocations)
+    assert len({glyphs.glyphDrawings[0].bounds for glyphs in glyphsRuns}) == len(varLocations)
+    for glyphs, varLocation in zip(glyphsRuns, varLocations):
+        expected = referenceFont.getGlyphRunFromTextInfo(textInfo, varLocation=varLocation)
+        assert glyphs.glyphNames == expected.glyphNames
+        assert glyphs.posX.tolist() == expected.posX.tolist()
+        assert glyphs.posY.tolist() == expected.posY.tolist()
+        for glyphDrawing, expectedGlyphDrawing in zip(glyphs.glyphDrawings, expected.glyphDrawings):
+            assert glyphDrawing.bounds == pytest.approx(expectedGlyphDrawing.bounds)
+
+
+@pytest.mark.asyncio
+async def test_glyphDrawingCacheMemoryBudget():
+    fontPath = getFontPath("MutatorSans.ttf")
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    glyphs = font.getGlyphRun("ABC", varLocation={"wght": 0})
+    nbytes = sum(glyphDrawing.nbytes for glyphDrawing in glyphs.glyphDrawings)
+    assert font._glyphDrawings.nbytes == nbytes
+    font._glyphDrawings.memoryBudget = nbytes * 1.5
+    font.getGlyphRun("ABC", varLocation={"wght": 1000})
+    # The previous location no longer fits, the current one is always kept
+    assert len(font._glyphDrawings) == 1
+    assert font._glyphDrawings.nbytes <= nbytes * 1.5
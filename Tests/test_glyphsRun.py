@@ -0,0 +1,90 @@
+import numpy
+import pytest
+from fontgoggles.font.baseFont import GlyphsRun
+from fontgoggles.misc.hbShape import characterGlyphMapping
+
+
+def _makeRun():
+    glyphs = GlyphsRun(4, 1000, False)
+    gids = numpy.array([3, 5, 7], numpy.int32)
+    clusters = numpy.array([0, 1, 3], numpy.int32)
+    positions = numpy.array([[0, 0, 500, 0],
+                             [10, -20, 600, 0],
+                             [0, 5, 700, 0]], numpy.int32)
+    glyphs.setGlyphs(gids, ["a", "b", "c"], clusters, positions, [None, None, None])
+    return glyphs
+
+
+def test_glyphsRun():
+    glyphs = _makeRun()
+    assert len(glyphs) == 3
+    assert glyphs.glyphNames == ["a", "b", "c"]
+    assert [gi.pos for gi in glyphs] == [(0, 0), (510, -20), (1100, 5)]
+    assert glyphs.endPos == (1800, 0)
+    assert repr(glyphs[1]) == "GlyphInfoView(gid=5, name='b', cluster=1, dx=10, dy=-20, ax=600, ay=0)"
+    assert glyphs[-1].name == "c"
+    with pytest.raises(IndexError):
+        glyphs[3]
+
+
+def test_glyphsRun_bounds():
+    glyphs = _makeRun()
+    assert [gi.bounds for gi in glyphs] == [None, None, None]
+    glyphs[1].bounds = (1, 2, 3, 4)
+    assert glyphs[1].bounds == (1, 2, 3, 4)
+    assert glyphs.bounds.shape == (3, 4)
+    glyphs[1].bounds = None
+    assert glyphs[1].bounds is None
+
+
+def test_glyphsRun_empty():
+    glyphs = GlyphsRun(0, 1000, False)
+    assert not glyphs
+    assert list(glyphs) == []
+    assert glyphs.endPos == (0, 0)
+
+
+def test_glyphsRun_mapping():
+    glyphs = _makeRun()
+    assert glyphs.mapCharsToGlyphs([1, 2]) == {1}
+    assert glyphs.mapGlyphsToChars([1]) == {1, 2}
+    assert glyphs.mapGlyphsToChars([0, 2]) == {0, 3}
+    assert glyphs.mapGlyphsToChars([]) == set()
+    assert glyphs.mapCharsToGlyphs(set()) == set()
+
+
+def test_glyphsRun_mapping_rtl():
+    glyphs = GlyphsRun(5, 1000, False)
+    clusters = numpy.array([4, 2, 2, 0], numpy.int32)
+    glyphs.setGlyphs(numpy.arange(4, dtype=numpy.int32), list("abcd"), clusters,
+                     numpy.zeros((4, 4), numpy.int32), [None] * 4)
+    assert glyphs.mapCharsToGlyphs([3]) == {1, 2}
+    assert glyphs.mapCharsToGlyphs({0, 4}) == {0, 3}
+    assert glyphs.mapGlyphsToChars({2}) == {2, 3}
+    assert glyphs.mapGlyphsToChars(range(4)) == {0, 1, 2, 3, 4}
+
+
+def test_glyphsRun_mapping_empty():
+    glyphs = GlyphsRun(3, 1000, False)
+    assert glyphs.mapCharsToGlyphs([0, 1]) == set()
+    assert glyphs.mapGlyphsToChars([]) == set()
+
+
+def test_glyphsRun_mapping_characterGlyphMapping():
+    # The vectorized mapping must match characterGlyphMapping()
+    rnd = numpy.random.default_rng(0)
+    for i in range(100):
+        numChars = int(rnd.integers(1, 40))
+        clusters = numpy.sort(rnd.integers(0, numChars, int(rnd.integers(1, 40))))
+        clusters[0] = 0
+        if i % 2:
+            clusters = clusters[::-1]
+        glyphs = GlyphsRun(numChars, 1000, False)
+        glyphs.setGlyphs(numpy.zeros(len(clusters), numpy.int32), [""] * len(clusters),
+                         clusters.astype(numpy.int32), numpy.zeros((len(clusters), 4), numpy.int32),
+                         [None] * len(clusters))
+        glyphToChars, charToGlyphs = characterGlyphMapping(clusters.tolist(), numChars)
+        for glyphIndex, charIndices in enumerate(glyphToChars):
+            assert glyphs.mapGlyphsToChars([glyphIndex]) == set(charIndices)
+        for charIndex, glyphIndices in enumerate(charToGlyphs):
+            assert glyphs.mapCharsToGlyphs([charIndex]) == set(glyphIndices)
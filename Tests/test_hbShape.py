@@ -1,5 +1,6 @@
+import numpy
 import pytest
-from fontgoggles.misc.hbShape import HBShape, characterGlyphMapping
+from fontgoggles.misc.hbShape import HBShape, ShapedText, characterGlyphMapping
 from testSupport import getFontPath
 
 
@@ -20,6 +21,27 @@ def test_shape_latin(testString, features, expectedGlyphNames):
     assert [g.name for g in glyphs] == expectedGlyphNames
 
 
+def test_shapeMany():
+    s = HBShape.fromPath(getFontPath("IBMPlexSansArabic-Regular.ttf"))
+    segments = [
+        ("fit", None, None, None),
+        ("\u062D\u062A\u0649", "RTL", None, "arab"),
+        ("fit", "LTR", None, "latn"),
+    ]
+    runs = s.shapeMany(segments, features=dict(liga=True))
+    expected = [s.shape(text, features=dict(liga=True), direction=direction, language=language, script=script)
+                for text, direction, language, script in segments]
+    assert [[repr(gi) for gi in run] for run in runs] == [[repr(gi) for gi in run] for run in expected]
+    assert [[gi.name for gi in run] for run in runs] == [["fi", "t"], ["uniFC74", "uniFEA3"], ["fi", "t"]]
+
+
+def test_shape_varLocation():
+    s = HBShape.fromPath(getFontPath("MutatorSans.ttf"))
+    assert [g.ax for g in s.shape("HI")] == [460, 160]
+    assert [g.ax for g in s.shape("HI", varLocation=dict(wght=1000))] == [750, 380]
+    assert [g.ax for g in s.shape("HI")] == [460, 160]
+
+
 def test_shape_GlyphInfo_repr():
     s = HBShape.fromPath(getFontPath("IBMPlexSans-Regular.ttf"))
     glyphs = s.shape("a")
@@ -72,3 +94,38 @@ def test_characterGlyphMapping(clusters, numChars, expectedGlyphToChars, expecte
     glyphToChars, charToGlyphs = characterGlyphMapping(clusters, numChars)
     assert glyphToChars == expectedGlyphToChars
     assert charToGlyphs == expectedCharToGlyphs
+
+
+reshapeTestData = [
+    # font, original text, edited text, shape arguments
+    ("IBMPlexSans-Regular.ttf", "office Wave AVATAR " * 8, "office Wave AVATAR " * 4 + "Tofi " + "office Wave AVATAR " * 4, {}),
+    ("IBMPlexSans-Regular.ttf", "office Wave AVATAR " * 8, "office Wave AVTAR " + "office Wave AVATAR " * 7, {}),
+    ("IBMPlexSans-Regular.ttf", "office Wave AVATAR " * 8, "office Wave AVATAR " * 8 + "!", {}),
+    ("IBMPlexSansArabic-Regular.ttf", "حتى بيت سلام " * 8, "حتى بيت سلام " * 3 + "حتى لا " + "حتى بيت سلام " * 5,
+     dict(direction="RTL")),
+    ("IBMPlexSansArabic-Regular.ttf", "حتى بيت سلام " * 8, "حتى بيت سلام " * 8 + "ب", dict(direction="RTL")),
+    ("Amiri-Regular.ttf", "بِسْمِ اللَّهِ الرَّحْمَٰنِ " * 8, "بِسْمِ اللَّهِ الرَّحْمَٰنِ " * 4 + "لله " + "بِسْمِ اللَّهِ الرَّحْمَٰنِ " * 4,
+     dict(direction="RTL")),
+]
+
+
+@pytest.mark.parametrize("fontName,text,editedText,shapeArguments", reshapeTestData)
+def test_shapedText_reshape(fontName, text, editedText, shapeArguments):
+    s = HBShape.fromPath(getFontPath(fontName))
+    shapedText = ShapedText.fromShaper(s, text, **shapeArguments)
+    reshaped = shapedText.reshape(s, editedText)
+    assert reshaped is not None
+    expected = ShapedText.fromShaper(s, editedText, **shapeArguments)
+    assert reshaped.text == editedText
+    assert numpy.array_equal(reshaped.gids, expected.gids)
+    assert numpy.array_equal(reshaped.clusters, expected.clusters)
+    assert numpy.array_equal(reshaped.positions, expected.positions)
+    assert numpy.array_equal(reshaped.unsafeToBreak, expected.unsafeToBreak)
+
+
+def test_shapedText_reshape_guessedDirection():
+    s = HBShape.fromPath(getFontPath("IBMPlexSansArabic-Regular.ttf"))
+    text = "abc حتى " * 10
+    shapedText = ShapedText.fromShaper(s, text)
+    # The guessed direction changes, so nothing can be reused
+    assert shapedText.reshape(s, "حتى " + text) is None
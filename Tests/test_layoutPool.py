@@ -0,0 +1,107 @@
+import asyncio
+import io
+import sys
+import threading
+import pytest
+from fontgoggles.font import getOpener
+from fontgoggles.misc.layoutPool import LayoutPool, redirectThreadStderr
+from fontgoggles.misc.textInfo import TextInfo
+from testSupport import getFontPath
+
+
+async def _openFont(fileName):
+    fontPath = getFontPath(fileName)
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    return font
+
+
+@pytest.mark.asyncio
+async def test_iterGlyphRuns():
+    fontPlex = await _openFont("IBMPlexSans-Regular.ttf")
+    fontArabic = await _openFont("IBMPlexSansArabic-Regular.ttf")
+    fontMutator = await _openFont("MutatorSans.ttf")
+    fonts = [fontPlex, None, fontArabic, fontMutator, fontArabic] * 10
+    textInfo = TextInfo("abc حتى")
+    pool = LayoutPool(4)
+    results = {}
+    async for index, glyphs, output in pool.iterGlyphRuns(fonts, textInfo, varLocation={"wght": 500}):
+        assert index not in results
+        assert output == ""
+        results[index] = glyphs
+    pool.close()
+    assert sorted(results) == [i for i, font in enumerate(fonts) if font is not None]
+    for index, glyphs in results.items():
+        expected = fonts[index].getGlyphRunFromTextInfo(textInfo, varLocation={"wght": 500})
+        assert glyphs.glyphNames == expected.glyphNames
+        assert glyphs.endPos == expected.endPos
+
+
+@pytest.mark.asyncio
+async def test_skipReloadingFonts():
+    fontPlex = await _openFont("IBMPlexSans-Regular.ttf")
+    fontMutator = await _openFont("MutatorSans.ttf")
+    fontMutator.isReloading = True
+    pool = LayoutPool(2)
+    results = [index async for index, glyphs, output
+               in pool.iterGlyphRuns([fontPlex, fontMutator, fontPlex], TextInfo("abc"))]
+    pool.close()
+    assert sorted(results) == [0, 2]
+
+
+class _BlockingFont:
+
+    # Stands in for a font, its layout calls wait until they're allowed to
+    # proceed
+
+    def __init__(self, event, started):
+        self.event = event
+        self.started = started
+        self.lock = threading.RLock()
+        self.isReloading = False
+
+    def getGlyphRunFromTextInfo(self, textInfo, **kwargs):
+        self.started.set()
+        self.event.wait()
+        return "glyphs"
+
+
+@pytest.mark.asyncio
+async def test_close():
+    event = threading.Event()
+    started = threading.Event()
+    fonts = [_BlockingFont(event, started) for i in range(5)]
+    pool = LayoutPool(1)
+    glyphRuns = pool.iterGlyphRuns(fonts, TextInfo("abc"))
+    task = asyncio.ensure_future(glyphRuns.__anext__())
+    await asyncio.get_running_loop().run_in_executor(None, started.wait)
+    assert len(pool._futures) == 5
+    pool.close()
+    # Only the layout call that is running is left
+    assert len(pool._futures) == 1
+    # The layout calls that didn't start were cancelled
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    event.set()
+
+
+def test_redirectThreadStderr():
+    outputs = [io.StringIO() for i in range(4)]
+    barrier = threading.Barrier(len(outputs))
+
+    def work(output, message):
+        with redirectThreadStderr(output):
+            barrier.wait()
+            print(message, file=sys.stderr)
+
+    stderr = sys.stderr
+    threads = [threading.Thread(target=work, args=(output, f"message {i}"))
+               for i, output in enumerate(outputs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [output.getvalue() for output in outputs] == [f"message {i}\n" for i in range(len(outputs))]
+    # The original stderr is restored once nobody redirects anymore
+    assert sys.stderr is stderr
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from fontgoggles.misc.loadScheduler import LoadScheduler
+from fontgoggles.project import Project
+from testSupport import getFontPath
+
+
+async def _load(scheduler, resource, key, log):
+    async with scheduler.limit(resource, key):
+        log.append(("start", key))
+        await asyncio.sleep(0.01)
+        log.append(("end", key))
+
+
+def _maxConcurrent(log):
+    active = maxActive = 0
+    for event, key in log:
+        active += 1 if event == "start" else -1
+        maxActive = max(maxActive, active)
+    return maxActive
+
+
+@pytest.mark.asyncio
+async def test_loadScheduler_limits():
+    scheduler = LoadScheduler(io=3, parse=1)
+    ioLog = []
+    parseLog = []
+    coros = [_load(scheduler, "io", i, ioLog) for i in range(10)]
+    coros += [_load(scheduler, "parse", i, parseLog) for i in range(10)]
+    await asyncio.gather(*coros)
+    assert _maxConcurrent(ioLog) == 3
+    assert _maxConcurrent(parseLog) == 1
+    assert [key for event, key in parseLog if event == "start"] == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_loadScheduler_priorities():
+    scheduler = LoadScheduler(parse=1)
+    scheduler.setPriorities({3: -1})
+    log = []
+    tasks = [asyncio.create_task(_load(scheduler, "parse", i, log)) for i in range(6)]
+    await asyncio.sleep(0)
+    assert scheduler.getNumWaiting("parse") == 5
+    # Reprioritize while loading
+    scheduler.setPriorities({5: -2, 4: -1})
+    await asyncio.gather(*tasks)
+    assert [key for event, key in log if event == "start"] == [0, 5, 4, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_loadScheduler_cancel():
+    scheduler = LoadScheduler(parse=1)
+    log = []
+    tasks = [asyncio.create_task(_load(scheduler, "parse", i, log)) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks[1].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert [key for event, key in log if event == "start"] == [0, 2]
+    assert scheduler.getNumWaiting("parse") == 0
+    await asyncio.wait_for(_load(scheduler, "parse", 3, log), 1)
+
+
+@pytest.mark.asyncio
+async def test_project_prioritizeFonts():
+    pr = Project()
+    for fileName in ["IBMPlexSans-Regular.ttf", "IBMPlexSans-Regular.otf", "MutatorSans.ttf", "Amiri-Regular.ttf"]:
+        pr.addFont(getFontPath(fileName), 0)
+    pr._fontLoader.scheduler = LoadScheduler(io=1)
+    pr.prioritizeFonts([pr.fonts[3], pr.fonts[2]])
+    await pr.loadFonts()
+    # The first font gets the free slot before the others are even requested
+    expectedOrder = [pr.fonts[i].fontKey for i in [0, 3, 2, 1]]
+    assert list(pr._fontLoader.fonts) == expectedOrder
@@ -0,0 +1,18 @@
+from fontgoggles.misc.lruCache import LRUCache
+
+
+def test_lruCache():
+    cache = LRUCache(3)
+    for i in range(5):
+        cache[i] = str(i)
+    assert len(cache) == 3
+    assert list(cache.keys()) == [2, 3, 4]
+    assert cache.get(0) is None
+    assert cache.get(2) == "2"
+    cache[5] = "5"
+    assert list(cache.keys()) == [4, 2, 5]
+    assert 3 not in cache
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -1,7 +1,10 @@
+import asyncio
+import concurrent.futures
 import pathlib
+import shutil
 import pytest
 from fontgoggles.font import iterFontNumbers
-from fontgoggles.project import Project
+from fontgoggles.project import FontLoader, Project
 from testSupport import getFontPath
 
 
@@ -54,6 +57,99 @@ async def test_project_purgeFonts():
     assert list(pr._fontLoader.fonts) == []
 
 
+@pytest.mark.asyncio
+async def test_project_sharedFontData(tmpdir):
+    fontPath = pathlib.Path(tmpdir / "MutatorSans.ttc")
+    shutil.copy(getFontPath("MutatorSans.ttc"), fontPath)
+    pr = Project()
+    pr.addFont(fontPath, 0)
+    pr.addFont(fontPath, 1)
+    await pr.loadFonts()
+    fontLoader = pr._fontLoader
+    font1, font2 = [fii.font for fii in pr.fonts]
+    assert font1.fontData is font2.fontData
+    assert list(fontLoader.cachedFontData) == [fontPath]
+
+    # The data is kept as long as a font from the file is loaded
+    pr.fonts[0].unload()
+    assert list(fontLoader.cachedFontData) == [fontPath]
+    newFontPath = pathlib.Path(tmpdir / "MutatorSansRenamed.ttc")
+    fontPath.rename(newFontPath)
+    for fii in pr.fonts:
+        fii.fontPath = newFontPath
+    assert list(fontLoader.cachedFontData) == [newFontPath]
+    await pr.fonts[0].load()
+    assert pr.fonts[0].font.fontData is font2.fontData
+    pr.fonts[0].unload()
+    pr.fonts[1].unload()
+    assert list(fontLoader.cachedFontData) == []
+
+
+def test_fontLoader_getDataConcurrently():
+    fontLoader = FontLoader()
+    fontPath = getFontPath("MutatorSans.ttc")
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(fontLoader.getData, [fontPath] * 16))
+    assert all(fontData is results[0] for fontData in results)
+    assert results[0] == fontPath.read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_project_fontFileRewritten(tmpdir):
+    fontPath = pathlib.Path(tmpdir / "MutatorSans.ttc")
+    shutil.copy(getFontPath("MutatorSans.ttc"), fontPath)
+    pr = Project()
+    pr.addFont(fontPath, 0)
+    pr.addFont(fontPath, 1)
+    await pr.loadFonts()
+    font1, font2 = [fii.font for fii in pr.fonts]
+    glyphNames = font2.getGlyphRun("ABC").glyphNames
+
+    # Truncate the file in place: the loaded fonts must not be affected
+    with open(fontPath, "r+b") as f:
+        f.truncate(100)
+    assert font2.getGlyphRun("ABC").glyphNames == glyphNames
+
+    # Rewrite the file in place: a reloading font must get the new data
+    with open(fontPath, "r+b") as f:
+        f.write(getFontPath("MutatorSans.ttc").read_bytes())
+    pr.fonts[0].unload()
+    await pr.fonts[0].load()
+    assert pr.fonts[0].font.fontData is not font2.fontData
+    assert pr.fonts[0].font.fontData == font2.fontData
+
+
+@pytest.mark.asyncio
+async def test_project_reloadMarksFont():
+    pr = Project()
+    pr.addFont(getFontPath("IBMPlexSans-Regular.ttf"), 0)
+    await pr.loadFonts()
+    fii = pr.fonts[0]
+    font = fii.font
+    load = font.load
+    statesDuringLoad = []
+
+    def canUseFont():
+        if not font.lock.acquire(blocking=False):
+            return False
+        font.lock.release()
+        return True
+
+    async def checkedLoad(outputWriter):
+        # Layout threads must not be blocked by the reload, but should know
+        # to leave the font alone
+        loop = asyncio.get_running_loop()
+        statesDuringLoad.append((font.isReloading, await loop.run_in_executor(None, canUseFont)))
+        await load(outputWriter)
+
+    font.load = checkedLoad
+    fii.wantsReload = True
+    await fii.load()
+    assert fii.font is font
+    assert statesDuringLoad == [(True, True)]
+    assert not font.isReloading
+
+
 def test_project_dump_load(tmpdir):
     destPath = pathlib.Path(tmpdir / "test.gggls")
     pr = Project()
@@ -74,3 +170,48 @@ async def test_project_load_ttc():
     for fontPath, fontNumber, getSortInfo in iterFontNumbers(fontPath):
         pr.addFont(fontPath, fontNumber)
     await pr.loadFonts()
+
+
+@pytest.mark.asyncio
+async def test_project_shapeLines(tmpdir):
+    pr = Project()
+    fontPath1 = getFontPath("IBMPlexSans-Regular.ttf")
+    pr.addFont(fontPath1, 0)
+    fontPath2 = getFontPath("IBMPlexSansArabic-Regular.ttf")
+    pr.addFont(fontPath2, 0)
+    pr.addFont(fontPath2, 0)
+    textPath = tmpdir / "text.txt"
+    textPath.write_text("fit\nKofi\nحتى abc\n", encoding="utf-8")
+    pr.textSettings.textFilePath = str(textPath)
+    results = {}
+
+    def consumer(fontItemInfo, lineIndex, glyphs):
+        results[fontItemInfo.identifier, lineIndex] = glyphs.glyphNames
+
+    await pr.shapeLines(consumer)
+    assert len(results) == 9
+    assert results["fontItem_0", 0] == ["fi", "t"]
+    assert results["fontItem_1", 0] == ["fi", "t"]
+    assert results["fontItem_1", 2] == ["a", "b", "c", "space", "uniFC74", "uniFEA3"]
+    assert results["fontItem_1", 2] == results["fontItem_2", 2]
+
+
+@pytest.mark.asyncio
+async def test_project_renderImages():
+    pr = Project()
+    pr.addFont(getFontPath("IBMPlexSans-Regular.ttf"), 0)
+    pr.addFont(getFontPath("MutatorSans.designspace"), 0)
+    pr.addFont(getFontPath("IBMPlexSans-Regular.ttf"), 0)
+    results = {}
+
+    def consumer(fontItemInfo, image):
+        results[fontItemInfo.identifier] = image
+
+    await pr.renderImages(consumer, ["ABC", "abc"], fontSize=20, margin=2)
+    assert sorted(results) == ["fontItem_0", "fontItem_1", "fontItem_2"]
+    assert results["fontItem_0"] is results["fontItem_2"]
+    for image in results.values():
+        height, width, numChannels = image.shape
+        assert numChannels == 4
+        assert 40 < height < 60
+        assert (image[..., 0] < 128).any()
@@ -0,0 +1,84 @@
+import re
+import zlib
+import xml.etree.ElementTree as ET
+import pytest
+from fontgoggles.misc.proofExport import PDFProofWriter, SVGProofWriter, getProofWriterClass
+from fontgoggles.project import Project
+from testSupport import getFontPath
+
+
+svgNS = "{http://www.w3.org/2000/svg}"
+xlinkNS = "{http://www.w3.org/1999/xlink}"
+
+
+def _makeProject():
+    pr = Project()
+    pr.addFont(getFontPath("IBMPlexSans-Regular.ttf"), 0)
+    pr.addFont(getFontPath("MutatorSans.designspace"), 0)
+    return pr
+
+
+def test_getProofWriterClass():
+    assert getProofWriterClass("proof.svg") is SVGProofWriter
+    assert getProofWriterClass("proof.PDF") is PDFProofWriter
+    with pytest.raises(ValueError):
+        getProofWriterClass("proof.png")
+
+
+@pytest.mark.asyncio
+async def test_exportProofSVG(tmpdir):
+    pr = _makeProject()
+    svgPath = tmpdir / "proof.svg"
+    await pr.exportProof(svgPath, ["ABBA", "BAAB"], fontSize=20)
+    # Fonts that were loaded for the proof are unloaded again
+    assert [fii.font for fii in pr.fonts] == [None, None]
+
+    root = ET.parse(str(svgPath)).getroot()
+    width, height = float(root.get("width")), float(root.get("height"))
+    assert root.get("viewBox") == f"0 0 {root.get('width')} {root.get('height')}"
+    assert width > 40 and height > 100
+    fontGroups = root.findall(svgNS + "g")
+    assert len(fontGroups) == 2
+    for fontGroup in fontGroups:
+        assert fontGroup.find(svgNS + "text").text.startswith(("IBMPlexSans", "MutatorSans"))
+        # Each glyph is defined once, and used four times
+        glyphs = fontGroup.find(svgNS + "defs").findall(svgNS + "g")
+        assert len(glyphs) == 2
+        uses = fontGroup.findall(f"{svgNS}g/{svgNS}use")
+        assert len(uses) == 8
+        glyphIDs = {glyph.get("id") for glyph in glyphs}
+        assert {use.get(xlinkNS + "href")[1:] for use in uses} == glyphIDs
+
+
+@pytest.mark.asyncio
+async def test_exportProofPDF(tmpdir):
+    pr = _makeProject()
+    await pr.loadFonts()
+    pdfPath = tmpdir / "proof.pdf"
+    await pr.exportProof(pdfPath, ["ABBA", "BAAB"], fontSize=20)
+    assert all(fii.font is not None for fii in pr.fonts)
+
+    data = pdfPath.read_binary()
+    assert data.startswith(b"%PDF-1.4\n")
+    assert data.endswith(b"%%EOF\n")
+    xrefOffset = int(data.rsplit(b"startxref\n", 1)[1].split()[0])
+    xref = data[xrefOffset:].split(b"trailer")[0].splitlines()
+    assert xref[0] == b"xref"
+    numObjects = int(xref[1].split()[1])
+    offsets = [int(line.split()[0]) for line in xref[3:3 + numObjects - 1]]
+    for objectID, offset in enumerate(offsets, 1):
+        assert data[offset:].startswith(b"%d 0 obj\n" % objectID)
+    assert b"/Type /Pages /Kids [" in data
+    assert b"/Count 2 >>" in data
+
+    pages = re.findall(rb"/Type /Page /Parent .*?/Contents (\d+) 0 R", data)
+    assert len(pages) == 2
+    forms = re.findall(rb"/Subtype /Form", data)
+    assert len(forms) == 4  # two glyphs per font
+    contentID = int(pages[0])
+    contentStart = offsets[contentID - 1]
+    streamStart = data.index(b"stream\n", contentStart) + 7
+    streamEnd = data.index(b"\nendstream", streamStart)
+    content = zlib.decompress(data[streamStart:streamEnd])
+    assert content.count(b" Do Q") == 8
+    assert b"(IBMPlexSans-Regular.ttf) Tj" in content
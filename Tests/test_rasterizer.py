@@ -0,0 +1,108 @@
+import io
+import struct
+import zlib
+from types import SimpleNamespace
+import numpy
+import pytest
+from fontTools.pens.areaPen import AreaPen
+from fontgoggles.font import getOpener
+from fontgoggles.font.glyphDrawing import GlyphDrawing
+from fontgoggles.misc.arrayOutline import ArrayOutline
+from fontgoggles.misc.rasterizer import GlyphsRunRenderer, rasterizeEdges, rasterizeOutline, writePNG
+from testSupport import getFontPath
+
+
+def _rectEdges(xMin, yMin, xMax, yMax, clockwise=True):
+    points = [(xMin, yMin), (xMax, yMin), (xMax, yMax), (xMin, yMax)]
+    if not clockwise:
+        points.reverse()
+    return [(*points[i - 1], *points[i]) for i in range(4)]
+
+
+def test_rasterizeEdges():
+    coverage = rasterizeEdges(_rectEdges(1, 1, 3, 2), 4, 3)
+    assert coverage.tolist() == [[0, 0, 0, 0], [0, 1, 1, 0], [0, 0, 0, 0]]
+    coverage = rasterizeEdges(_rectEdges(0.5, 0, 1.75, 1), 3, 1)
+    assert coverage.tolist() == [[0.5, 0.75, 0]]
+    # Non-zero winding: overlaps in the same direction don't add up...
+    coverage = rasterizeEdges(_rectEdges(0, 0, 2, 1) + _rectEdges(1, 0, 3, 1), 3, 1)
+    assert coverage.tolist() == [[1, 1, 1]]
+    # ...but a contour in the opposite direction makes a hole
+    coverage = rasterizeEdges(_rectEdges(0, 0, 3, 1) + _rectEdges(1, 0, 2, 1, clockwise=False), 3, 1)
+    assert coverage.tolist() == [[1, 0, 1]]
+    # Clipping
+    coverage = rasterizeEdges(_rectEdges(-5, -5, 1.5, 10), 2, 2)
+    assert coverage.tolist() == [[1, 0.5], [1, 0.5]]
+    assert rasterizeEdges(numpy.zeros((0, 4)), 2, 2).tolist() == [[0, 0], [0, 0]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("glyphName", ["O", "a", "period"])
+async def test_rasterizeOutline(glyphName):
+    fontPath = getFontPath("IBMPlexSans-Regular.ttf")
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    outline = font.ftFont.getOutline(glyphName)
+    areaPen = AreaPen()
+    outline.draw(areaPen)
+    scale = 0.1
+    coverage, left, top = rasterizeOutline(outline, scale, 0.25, 0.5)
+    xMin, yMin, xMax, yMax = outline.bounds
+    assert left == int(numpy.floor(xMin * scale + 0.25))
+    assert top == int(numpy.floor(-yMax * scale + 0.5))
+    assert coverage.sum() == pytest.approx(abs(areaPen.value) * scale ** 2, rel=0.02)
+    assert rasterizeOutline(ArrayOutline([], [], []), scale) is None
+
+
+@pytest.mark.asyncio
+async def test_renderGlyphsRun():
+    fontPath = getFontPath("IBMPlexSans-Regular.ttf")
+    numFonts, opener, getSortInfo = getOpener(fontPath)
+    font = opener(fontPath, 0)
+    await font.load(None)
+    glyphsRun = font.getGlyphRun("HOHOHO")
+    renderer = GlyphsRunRenderer()
+    image = renderer.renderGlyphsRun(glyphsRun, 20, margin=3)
+    height, width, numChannels = image.shape
+    assert numChannels == 4
+    assert image.dtype == numpy.uint8
+    assert width == pytest.approx(glyphsRun.endPos[0] / 50 + 6, abs=2)
+    assert (image[..., 3] == 255).all()
+    assert image[:3].tolist() == image[-3:].tolist() == [[[255, 255, 255, 255]] * width] * 3
+    assert (image[..., 0] == 0).any()
+    # Only "H" and "O" are rasterized, at a few subpixel positions
+    assert len(renderer._masks) <= 2 * renderer.subpixelPositions
+    assert renderer.renderGlyphsRun(glyphsRun, 20, margin=3).tolist() == image.tolist()
+    assert renderer._masks.misses == len(renderer._masks)
+
+
+def test_colorLayers():
+    square = ArrayOutline([(0, 0), (0, 100), (100, 100), (100, 0)], [1, 1, 1, 1], [3])
+    smallSquare = ArrayOutline([(0, 0), (0, 50), (50, 50), (50, 0)], [1, 1, 1, 1], [3])
+    glyphDrawing = GlyphDrawing([(square, 0), (smallSquare, None)])
+    glyphsRun = SimpleNamespace(unitsPerEm=100, endPos=(100, 0), colorPalette=[(1, 0, 0, 1)],
+                                glyphDrawings=[glyphDrawing], posX=numpy.array([0]), posY=numpy.array([0]))
+    image = GlyphsRunRenderer().renderGlyphsRun(glyphsRun, 10, foreground=(0, 0, 1, 1))
+    # The image covers one em above and a quarter em below the baseline
+    assert image.shape == (13, 10, 4)
+    assert image[0, 0].tolist() == [255, 0, 0, 255]
+    assert image[9, 0].tolist() == [0, 0, 255, 255]
+    assert image[12, 0].tolist() == [255, 255, 255, 255]
+
+
+def test_writePNG():
+    image = numpy.zeros((3, 2, 4), numpy.uint8)
+    image[1, 1] = (10, 20, 30, 40)
+    f = io.BytesIO()
+    writePNG(image, f)
+    data = f.getvalue()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    length, chunkType = struct.unpack(">I4s", data[8:16])
+    assert chunkType == b"IHDR"
+    assert struct.unpack(">II", data[16:24]) == (2, 3)
+    idatStart = data.index(b"IDAT")
+    idatLength, = struct.unpack(">I", data[idatStart - 4:idatStart])
+    rows = zlib.decompress(data[idatStart + 4:idatStart + 4 + idatLength])
+    assert len(rows) == 3 * (1 + 2 * 4)
+    assert rows[9:18] == bytes([0, 0, 0, 0, 0, 10, 20, 30, 40])
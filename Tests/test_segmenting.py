@@ -124,6 +124,10 @@ testDataDetectScript = [
     ("a(\u0627\u064f\u0633)", ['Latn', 'Latn', 'Arab', 'Arab', 'Arab', 'Arab']),
     ("a(\u0627\u064f\u0633)a", ['Latn', 'Latn', 'Arab', 'Arab', 'Arab', 'Latn', 'Latn']),
     ("\u0627\u064f(a)\u0633", ['Arab', 'Arab', 'Arab', 'Latn', 'Arab', 'Arab']),
+    ("", []),
+    ("  ", ['Zxxx', 'Zxxx']),
+    ("a) \u0627", ['Latn', 'Arab', 'Arab', 'Arab']),
+    ("a\u0301 \u05d0", ['Latn', 'Latn', 'Latn', 'Hebr']),
 ]
 
 
@@ -140,6 +144,7 @@ testDataTextSegments = [
     ("\u0627123\u0627", 1, [("\u0627", "Arab", 1, 0), ("123", "Arab", 2, 1), ("\u0627", "Arab", 1, 4)]),
     ("123\u0627", 1, [("123", "Arab", 2, 0), ("\u0627", "Arab", 1, 3)]),
     ("a123\u0627", 0, [("a123", "Latn", 0, 0), ("\u0627", "Arab", 1, 4)]),
+    ("", 0, []),
 ]
 
 
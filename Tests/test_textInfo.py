@@ -21,3 +21,29 @@ def test_textInfo(text, shouldApplyBiDi, baseLevel, baseDirection, alignment, se
     assert baseDirection == ti.baseDirection
     assert alignment == ti.suggestedAlignment
     assert segments == ti.segments
+
+
+testDataBiDiMapping = [
+    ("", [], []),
+    ("abc", [0, 1, 2], [0, 1, 2]),
+    ("abcحتى", [0, 1, 2, 5, 4, 3], [0, 1, 2, 5, 4, 3]),
+    ("حتى123", [5, 4, 3, 0, 1, 2], [3, 4, 5, 2, 1, 0]),
+]
+
+
+@pytest.mark.parametrize("text,toBiDi,fromBiDi", testDataBiDiMapping)
+def test_textInfo_mapBiDi(text, toBiDi, fromBiDi):
+    ti = TextInfo(text)
+    assert "_toBiDi" not in ti.__dict__
+    assert ti.mapToBiDi(range(len(text))) == toBiDi
+    assert ti.mapFromBiDi(range(len(text))) == fromBiDi
+    assert ti.mapFromBiDi(ti.mapToBiDi(range(len(text)))) == list(range(len(text)))
+    with pytest.raises(IndexError):
+        ti.mapToBiDi([len(text)])
+
+
+def test_textInfo_mapBiDi_textChange():
+    ti = TextInfo("abc")
+    assert ti.mapToBiDi([2]) == [2]
+    ti.text = "حتى"
+    assert ti.mapToBiDi([2]) == [0]
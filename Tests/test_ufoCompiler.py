@@ -1,9 +1,14 @@
 import asyncio
 import os
+import pathlib
+import shutil
 import pytest
 from fontTools.ufoLib import UFOReader
+from fontgoggles.compile.compileCache import ufoCacheMaxSize
 from fontgoggles.compile.ufoCompiler import fetchCharacterMappingAndAnchors
 from fontgoggles.compile.compilerPool import compileUFOToPath
+from fontgoggles.font.ufoFont import UFOFont
+from fontgoggles.misc.diskCache import getDiskCache
 from testSupport import getFontPath
 
 
@@ -60,3 +65,38 @@ async def test_compileUFOToPathMultiple(tmpdir):
     results = await asyncio.gather(*coros)
     assert results == [None] * len(results)
     assert [(os.stat(p).st_size > 0) for p in ttPaths] == [True] * len(results)
+
+
+@pytest.mark.asyncio
+async def test_compileUFOCache(tmpdir):
+    tmpdir = pathlib.Path(tmpdir)
+    sourceFolder = getFontPath("MutatorSansBoldWideMutated.ufo").parent
+    ufoPath = tmpdir / "MutatorSansBoldWideMutated.ufo"
+    shutil.copytree(sourceFolder / ufoPath.name, ufoPath)
+    for feaFileName in ["features_test.fea", "features_test_nested.fea"]:
+        shutil.copy(sourceFolder / feaFileName, tmpdir / feaFileName)
+    cache = getDiskCache("ufo", ufoCacheMaxSize)
+
+    async def loadFont():
+        hits, misses = cache.hits, cache.misses
+        font = UFOFont(ufoPath, 0)
+        await font.load(None)
+        return font, (cache.hits - hits, cache.misses - misses)
+
+    font, stats = await loadFont()
+    assert font.featuresGSUB == {"calt", "ss01"}
+    # Nothing changed: the stat key matches, and we reuse the compiled font
+    font, stats = await loadFont()
+    assert stats == (3, 0)
+    assert font.featuresGSUB == {"calt", "ss01"}
+    assert [g.name for g in font.getGlyphRun("AI")] == ["A", "I"]
+    # A touched glyph file changes the stat key, but not the content key
+    os.utime(ufoPath / "glyphs" / "A_.glif")
+    font, stats = await loadFont()
+    assert stats == (2, 1)
+    # Changing an included feature file forces a recompile
+    feaPath = tmpdir / "features_test_nested.fea"
+    feaPath.write_text(feaPath.read_text() + "\nfeature ss02 { sub J by J.narrow; } ss02;\n")
+    font, stats = await loadFont()
+    assert stats == (0, 3)
+    assert font.featuresGSUB == {"calt", "ss01", "ss02"}
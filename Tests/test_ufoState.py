@@ -38,6 +38,7 @@ def test_getUpdateInfo(tmpdir):
     assert not needsGlyphUpdate
     assert needsInfoUpdate
     assert not needsCmapUpdate
+    assert state.changedGlyphNames == set()
 
     glyph = Glyph("A", None)
     ppen = RecordingPointPen()
@@ -52,6 +53,7 @@ def test_getUpdateInfo(tmpdir):
     assert needsGlyphUpdate
     assert not needsInfoUpdate
     assert not needsCmapUpdate
+    assert state.changedGlyphNames == {"A"}
 
     glyph = Glyph("A", None)
     ppen = RecordingPointPen()
@@ -0,0 +1,43 @@
+import random
+import pytest
+import unicodedata2
+from fontTools.unicodedata import script
+from fontgoggles.misc.unicodeProperties import (RangeTable, bidiClasses, categories, codePointsFromText,
+                                                mirrored, scripts)
+
+
+def _sampleText():
+    rnd = random.Random(42)
+    codePoints = [0, 0x10FFFF] + [rnd.randrange(0x110000) for i in range(5000)]
+    return "".join(chr(c) for c in codePoints if not 0xD800 <= c < 0xE000)
+
+
+testData = [
+    (scripts, script),
+    (categories, unicodedata2.category),
+    (bidiClasses, unicodedata2.bidirectional),
+    (mirrored, unicodedata2.mirrored),
+]
+
+
+@pytest.mark.parametrize("lookupFunc,referenceFunc", testData)
+def test_lookup(lookupFunc, referenceFunc):
+    text = "abc (اُس) 123 אב 一" + _sampleText()
+    assert lookupFunc(text) == [referenceFunc(ch) for ch in text]
+
+
+def test_lookup_empty():
+    assert scripts("") == []
+
+
+def test_rangeTable():
+    table = RangeTable.fromRanges([0, 10, 20, 30], ["a", "b", "a", "c"])
+    assert table.values == ["a", "b", "c"]
+    assert [table[cp] for cp in [0, 9, 10, 19, 20, 29, 30, 1000]] == ["a", "a", "b", "b", "a", "a", "c", "c"]
+    assert table.lookup([0, 9, 10, 19, 20, 29, 30, 1000]) == ["a", "a", "b", "b", "a", "a", "c", "c"]
+    assert table.valueIndex("c") == 2
+    assert table.valueIndex("d") == -1
+
+
+def test_codePointsFromText():
+    assert codePointsFromText("a\U0001F600").tolist() == [0x61, 0x1F600]